@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MyDjango.settings')
+# Serve /graphql/ with the async view
+os.environ.setdefault('CMS_GRAPHQL_ASYNC', '1')
 
 application = get_asgi_application()
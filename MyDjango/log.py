@@ -0,0 +1,154 @@
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+# Production logging: JSON records, sampled, written by a background thread.
+#
+# The development config sends every `django` record to a FileHandler, so each
+# SQL statement is formatted and written to disk on the request thread.
+# `BackgroundHandler` only puts records on a bounded queue; a listener thread
+# formats them and writes them to size-rotated files. When the writer falls
+# behind, records are dropped rather than making requests wait. The thread
+# starts with the first record of each process, as pre-fork servers (gunicorn
+# --preload) configure logging before the workers are forked without it.
+# `SamplingFilter` keeps one record in N from chatty loggers before they are
+# even queued.
+
+# Attributes every LogRecord has, so anything else was passed in `extra`
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', logging.INFO, '', 0, '', (), None))) | {
+    'message', 'asctime', 'taskName',
+}
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line, `extra` values included."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one record in N from the loggers in `rates`, e.g. {'django.db.backends': 100}.
+
+    A logger is sampled at the rate of its closest configured ancestor.
+    Warnings and errors always pass.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get_rate(self, name):
+        while name:
+            if name in self.rates:
+                return name, self.rates[name]
+            name = name.rpartition('.')[0]
+        return None, 1
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        name, rate = self.get_rate(record.name)
+        if rate <= 1:
+            return True
+        with self._lock:
+            count = self._counts.get(name, 0)
+            self._counts[name] = count + 1
+        return count % rate == 0
+
+
+class BackgroundHandler(QueueHandler):
+    """Queue records for a thread that writes them to a rotating file.
+
+    Takes RotatingFileHandler's file options, so LOGGING can configure it like
+    any file handler; its formatter is applied on the writer thread.
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5, queue_size=10000,
+                 encoding='utf-8'):
+        super().__init__(queue.Queue(queue_size))
+        self.target = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count,
+                                          encoding=encoding, delay=True)
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        # The process the listener runs in
+        self._pid = None
+
+    def start(self):
+        """Start the listener thread of this process, unless it runs already."""
+        pid = os.getpid()
+        if self._pid == pid or self.listener is None:
+            return
+        with self.lock:
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                # A forked child: the parent's records are the parent's to write,
+                # and its thread may have held the queue's locks
+                self.queue = queue.Queue(self.queue.maxsize)
+                self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self.listener.start()
+            self._pid = pid
+
+    def running(self):
+        return self.listener is not None and self._pid == os.getpid()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Only what cannot wait: the message arguments and traceback may
+        # change or go away once the caller returns
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait until the records queued so far are written."""
+        if self.running():
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        if self.running():
+            self.listener.stop()
+        self.listener = None
+        self.target.close()
+        super().close()
@@ -18,6 +18,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 #Logging settings
 import logging
+import os
 
 LOGGING = {
     'version': 1,
@@ -38,6 +39,49 @@ LOGGING = {
     },
 }
 
+# CMS_LOG_MODE=production: JSON lines written by a background thread to
+# rotating files (see MyDjango/log.py), with SQL statements and GraphQL
+# profiles sampled
+if os.environ.get('CMS_LOG_MODE') == 'production':
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'json': {'()': 'MyDjango.log.JSONFormatter'},
+        },
+        'filters': {
+            'sample': {
+                '()': 'MyDjango.log.SamplingFilter',
+                'rates': {'django.db.backends': 100, 'cms_content.profiling': 10},
+            },
+        },
+        'handlers': {
+            'file': {
+                'level': 'DEBUG',
+                'class': 'MyDjango.log.BackgroundHandler',
+                'filename': os.environ.get('CMS_LOG_FILE', BASE_DIR / 'cms.log'),
+                'max_bytes': 50 * 1024 * 1024,
+                'backup_count': 10,
+                'formatter': 'json',
+                'filters': ['sample'],
+            },
+        },
+        'loggers': {
+            'django': {
+                'handlers': ['file'],
+                'level': 'INFO',
+            },
+            # Only logged with DEBUG on, then sampled
+            'django.db.backends': {
+                'level': 'DEBUG',
+            },
+            'cms_content': {
+                'handlers': ['file'],
+                'level': 'INFO',
+            },
+        },
+    }
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -103,11 +147,59 @@ WSGI_APPLICATION = 'MyDjango.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Applied to every new SQLite connection: WAL lets readers work alongside
+# the writer, NORMAL sync is safe with WAL, and reads are served from a
+# memory-mapped file and a 32 MB page cache
+SQLITE_INIT_COMMAND = (
+    'PRAGMA journal_mode = WAL; PRAGMA synchronous = NORMAL; PRAGMA mmap_size = 268435456; '
+    'PRAGMA cache_size = -32768; PRAGMA temp_store = MEMORY'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Keep connections between requests, checking them before reuse
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND,
+            # Take the write lock when a transaction starts, and wait up to
+            # 20 seconds for it, instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    },
+    # The same file, query-only, for reads of the content models
+    # (cms_content.routers.ReadReplicaRouter)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': f'{SQLITE_INIT_COMMAND}; PRAGMA query_only = ON',
+            'timeout': 20,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['cms_content.routers.ReadReplicaRouter']
+
+# The default cache (persisted queries, cached responses) is per process. The
+# model version stamps that retire cached content must reach every worker and
+# management commands such as import_content, so they get a cache on disk
+# shared by all processes on the host (see cms_content.versions).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CMS_VERSION_CACHE_DIR', BASE_DIR / 'cache' / 'versions'),
+        'TIMEOUT': None,
+    },
 }
 
 
@@ -154,9 +246,59 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Graphene settings
 GRAPHENE = {
-    'SCHEMA': 'cms_content.schema.schema'
+    'SCHEMA': 'cms_content.schema.schema',
+    # No DjangoDebugMiddleware, which graphene-django adds when DEBUG is on:
+    # the schema has no `_debug` field, so it would wrap the cursors of every
+    # connection and never unwrap them (cms_content.profiling covers its use)
+    'MIDDLEWARE': [],
 }
 
+# CMS GraphQL endpoint settings
+# Accept automatic persisted queries (sha256 hashes stored in the default cache)
+CMS_GRAPHQL_PERSISTED_QUERIES = True
+# Number of parsed and validated query documents kept per process
+CMS_GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+# Cache whole responses to anonymous queries until a model they read changes
+CMS_GRAPHQL_RESPONSE_CACHE = True
+CMS_GRAPHQL_RESPONSE_CACHE_TIMEOUT = 300
+# Give the same queries sent with GET an ETag and Last-Modified, answer
+# If-None-Match / If-Modified-Since with 304, and let browsers and proxies
+# keep them this many seconds before revalidating
+CMS_GRAPHQL_CONDITIONAL_GET = True
+CMS_GRAPHQL_HTTP_MAX_AGE = 0
+# Serve /graphql/ with the async view, resolving top-level fields concurrently
+# (asgi.py turns this on, WSGI servers keep the sync view)
+CMS_GRAPHQL_ASYNC = os.environ.get('CMS_GRAPHQL_ASYNC') == '1'
+# Reject queries nested deeper than this many fields, or able to load more
+# rows than this (see cms_content.complexity for how rows are estimated)
+CMS_GRAPHQL_MAX_DEPTH = 10
+CMS_GRAPHQL_MAX_COST = 10000
+# Rows per parent object of list fields, on top of complexity.FIELD_WEIGHTS
+CMS_GRAPHQL_FIELD_WEIGHTS = {}
+# Let clients ask for `stream`: connection pages are then read this many rows
+# per query and written out as they are read (see cms_content.streaming)
+CMS_GRAPHQL_STREAMING = True
+CMS_GRAPHQL_STREAM_CHUNK_SIZE = 50
+# Dotted path of the function encoding responses as JSON; None picks orjson
+# when it is installed and the json module otherwise (see cms_content.encoders)
+CMS_GRAPHQL_JSON_ENCODER = None
+# Log the queries, repeated queries and resolver timings of each operation,
+# and return them in the response extensions (SQL included, so not in production)
+CMS_GRAPHQL_PROFILE = DEBUG
+CMS_GRAPHQL_PROFILE_EXTENSIONS = DEBUG
+
+# View counter: buffered hits are written every this many seconds by a
+# background thread (None turns it off), or sooner once this many are pending
+CMS_VIEW_COUNTER_FLUSH_INTERVAL = 5.0
+CMS_VIEW_COUNTER_MAX_PENDING = 10000
+
+# Published-content snapshot: JSON files of the published pages, menus and
+# post listings for a web server or CDN, rebuilt with `build_snapshot` and kept
+# current on save (see cms_content.snapshots). Off unless a directory is set.
+CMS_SNAPSHOT_ROOT = os.environ.get('CMS_SNAPSHOT_ROOT')
+# Posts per listing file
+CMS_SNAPSHOT_PAGE_SIZE = 20
+
 # CORS settings
 CORS_ALLOW_ORIGINS = [
     '*',
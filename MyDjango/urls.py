@@ -14,13 +14,23 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
+from cms_content.async_views import AsyncCMSGraphQLView
+from cms_content.views import CMSGraphQLView, record_view, route_view
+
+GraphQLView = AsyncCMSGraphQLView if settings.CMS_GRAPHQL_ASYNC else CMSGraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
     #GraphQL test url
     path('graphql/', GraphQLView.as_view(graphiql=True)),
+
+    #Slug to page/link resolution for the frontend router
+    path('routes/<path:path>', route_view, name='route'),
+
+    #Buffered view counting for pages and posts
+    path('views/<str:kind>/<str:pk>', record_view, name='record_view'),
 ]
@@ -0,0 +1,63 @@
+"""Per-request latency of /graphql/ with and without the document cache.
+
+The response cache and profiling are off for the CMSGraphQLView rows, so
+every request executes the query and only the document cache differs.
+
+    python -m benchmarks.graphql_documents
+"""
+import hashlib
+import json
+
+from benchmarks.utils import benchmark_database, measure, report
+
+# A typical frontend query: small result, comparatively large document
+QUERY = '''
+query Navigation($location: String) {
+  allLinks(location: $location, first: 10) {
+    edges {
+      cursor
+      node { id label slug url location status order page { id title slug metaTitle metaDescription } }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+  allPages(first: 10) {
+    edges { node { id title slug pageStatus order parent { id slug } children { id title slug } } }
+  }
+}
+'''
+
+
+def main():
+    with benchmark_database():
+        from django.test import RequestFactory, override_settings
+        from graphene_django.views import GraphQLView
+        from cms_content.models import Page
+        from cms_content.views import CMSGraphQLView
+
+        for i in range(10):
+            Page.objects.create(title=f"Page {i}", page_link_location='navbar', order=i)
+
+        factory = RequestFactory()
+        variables = {'location': 'navbar'}
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': hashlib.sha256(QUERY.encode()).hexdigest()}}
+
+        def post(view, body):
+            request = factory.post('/graphql/', json.dumps(body), content_type='application/json')
+            response = view(request)
+            assert response.status_code == 200, response.content
+
+        plain_view = GraphQLView.as_view()
+        cached_view = CMSGraphQLView.as_view()
+        with override_settings(CMS_GRAPHQL_RESPONSE_CACHE=False, CMS_GRAPHQL_PROFILE=False):
+            post(cached_view, {'query': QUERY, 'variables': variables, 'extensions': extensions})
+
+            report("GraphQLView, full query", measure(
+                lambda: post(plain_view, {'query': QUERY, 'variables': variables})))
+            report("CMSGraphQLView, full query", measure(
+                lambda: post(cached_view, {'query': QUERY, 'variables': variables})))
+            report("CMSGraphQLView, persisted hash only", measure(
+                lambda: post(cached_view, {'variables': variables, 'extensions': extensions})))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Throughput of /graphql/ under 500 concurrent connections: WSGI with the sync view, ASGI with the async view.
+
+Clients are asyncio tasks sending requests back to back. Under WSGI each
+request waits for one of --threads worker threads, as with a threaded WSGI
+server; under ASGI it is handed to Django's ASGI handler on the event loop,
+as by a single uvicorn worker. Both call the handlers in-process, so socket
+and HTTP parsing costs are left out. The response cache is off so every
+request runs the query; pass --response-cache to measure cache hits instead.
+
+    python -m benchmarks.graphql_load [--concurrency 500] [--requests 5000] [--threads 32]
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from benchmarks.utils import benchmark_database
+
+# A page shell: menu, page list and latest posts, three independent top-level fields
+QUERY = '''{
+  navigation(location: "navbar") { label url children { label url } }
+  allPages(first: 20) { edges { node { title slug children { title slug } } } }
+  allPosts(first: 20) { edges { node { title slug created author { username } } } }
+}'''
+QUERY_STRING = urlencode({'query': QUERY})
+
+
+def create_content():
+    from django.contrib.auth.models import User
+    from cms_content.models import Page, Link, Post
+
+    authors = [User.objects.create(username=f'author-{i}') for i in range(10)]
+    for i in range(50):
+        parent = Page.objects.create(title=f"Section {i}", page_status='published', order=i)
+        for j in range(3):
+            Page.objects.create(title=f"Page {i} {j}", parent=parent, page_status='published', order=j)
+    for i in range(10):
+        Link.objects.create(label=f"Link {i}", url=f"https://example.com/{i}", location='navbar',
+                            status='published', order=i)
+    Post.objects.bulk_create(
+        Post(title=f"Post {i}", slug=f"post-{i}", content="Text " * 200, author=authors[i % 10], status='published')
+        for i in range(500)
+    )
+
+
+def get_environ():
+    return {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': '/graphql/', 'QUERY_STRING': QUERY_STRING, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver', 'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(b''), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+
+
+def call_wsgi(application):
+    status = []
+    body = b''.join(application(get_environ(), lambda code, headers: status.append(code)))
+    return int(status[0].split()[0]), body
+
+
+async def call_asgi(application):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': '/graphql/', 'raw_path': b'/graphql/', 'query_string': QUERY_STRING.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'accept', b'application/json')],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    done = asyncio.Event()
+    sent = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Django listens for a disconnect while the view runs
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+        if message['type'] == 'http.response.body' and not message.get('more_body'):
+            done.set()
+
+    await application(scope, receive, send)
+    return sent[0]['status'], b''.join(message.get('body', b'') for message in sent[1:])
+
+
+async def run_clients(send_request, concurrency, requests):
+    latencies = []
+
+    async def client(count):
+        for _ in range(count):
+            start = time.perf_counter()
+            status, body = await send_request()
+            assert status == 200 and b'"errors"' not in body, body[:500]
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(requests // concurrency + (i < requests % concurrency))
+                           for i in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def run_mode(mode, concurrency, requests, threads, response_cache):
+    with tempfile.TemporaryDirectory() as directory:
+        # A file rather than SQLite's shared in-memory database, so worker
+        # threads read it the way they would in production
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MyDjango.settings')
+        from django.conf import settings
+        settings.DATABASES['default']['TEST'] = {'NAME': os.path.join(directory, 'load.sqlite3')}
+        with benchmark_database():
+            settings.DEBUG = False
+            settings.CMS_GRAPHQL_PROFILE = False
+            settings.CMS_GRAPHQL_RESPONSE_CACHE = response_cache
+            create_content()
+
+            if mode == 'wsgi':
+                from django.core.handlers.wsgi import WSGIHandler
+                application = WSGIHandler()
+                pool = ThreadPoolExecutor(max_workers=threads)
+
+                async def send_request():
+                    return await asyncio.get_running_loop().run_in_executor(pool, call_wsgi, application)
+            else:
+                from django.core.handlers.asgi import ASGIHandler
+                application = ASGIHandler()
+
+                async def send_request():
+                    return await call_asgi(application)
+
+            # Warm up the caches and the URL conf
+            asyncio.run(run_clients(send_request, 10, 50))
+            elapsed, latencies = asyncio.run(run_clients(send_request, concurrency, requests))
+            latencies.sort()
+            print(f"{mode.upper():<5} {requests / elapsed:8.1f} req/s   "
+                  f"median {statistics.median(latencies):8.1f} ms   "
+                  f"p95 {latencies[int(len(latencies) * 0.95) - 1]:8.1f} ms   "
+                  f"p99 {latencies[int(len(latencies) * 0.99) - 1]:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('wsgi', 'asgi'))
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=32, help="WSGI worker threads.")
+    parser.add_argument('--response-cache', action='store_true')
+    options = parser.parse_args()
+
+    if options.mode:
+        run_mode(options.mode, options.concurrency, options.requests, options.threads, options.response_cache)
+        return
+    print(f"{options.concurrency} connections, {options.requests} requests, {os.cpu_count()} CPUs")
+    # One process per mode: the URL conf picks the view once, from CMS_GRAPHQL_ASYNC
+    for mode in ('wsgi', 'asgi'):
+        env = {**os.environ, 'CMS_GRAPHQL_ASYNC': '1' if mode == 'asgi' else '0'}
+        subprocess.run([sys.executable, '-m', 'benchmarks.graphql_load', '--mode', mode, *sys.argv[1:]],
+                       env=env, check=True)
+
+
+if __name__ == '__main__':
+    main()
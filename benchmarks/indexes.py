@@ -0,0 +1,65 @@
+"""Resolver queries on 100k links, pages and posts, without and with the hot path indexes.
+
+    python -m benchmarks.indexes
+"""
+import datetime
+import random
+import uuid
+
+from benchmarks.utils import benchmark_database, measure, report
+
+ROWS = 100_000
+LOCATIONS = ['navbar', 'header', 'footer', 'sidebar', 'unsorted']
+
+
+def main():
+    with benchmark_database():
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from cms_content.management.commands.explain_queries import get_querysets
+        from cms_content.models import Page, Link, Post
+
+        random.seed(1)
+        author = User.objects.create(username='author')
+        start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        # Written in bulk, so no signals, links or search rows; only the tables matter here
+        Page.objects.bulk_create((Page(title=f"Page {i}", slug=f"page-{i}", order=random.randrange(1000))
+                                  for i in range(ROWS)), batch_size=5000)
+        Link.objects.bulk_create((Link(label=f"Link {i}", slug=f"link-{i}", location=random.choice(LOCATIONS),
+                                       status=random.choice(['draft', 'published']), order=random.randrange(1000))
+                                  for i in range(ROWS)), batch_size=5000)
+        Post.objects.bulk_create((Post(id=uuid.uuid4(), title=f"Post {i}", slug=f"post-{i}", author=author,
+                                       status=random.choice(['draft', 'published']))
+                                  for i in range(ROWS)), batch_size=5000)
+        # bulk_create stamps every row with now(); spread them out like real posts
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE cms_content_post SET created = datetime(%s, '+' || (rowid * 37 %% 1000000) || ' minutes')",
+                           [start.strftime('%Y-%m-%d %H:%M:%S')])
+            # Ten children per page and a page behind every other link
+            cursor.execute("UPDATE cms_content_page SET parent_id = rowid / 10 WHERE rowid >= 10")
+            cursor.execute("UPDATE cms_content_link SET page_id = rowid WHERE rowid % 2 = 0")
+
+        indexes = [(model, index) for model in (Page, Link, Post) for index in model._meta.indexes]
+
+        def run(label):
+            print(f"\n{label}")
+            for name, queryset in get_querysets():
+                report(name, measure(lambda: list(queryset.all()), repeat=20, warmup=2))
+
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        run("Without the hot path indexes")
+
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        run("With the hot path indexes")
+
+
+if __name__ == '__main__':
+    main()
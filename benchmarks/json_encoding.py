@@ -0,0 +1,77 @@
+"""Time the JSON encoders of the GraphQL endpoint on response-sized payloads.
+
+The payloads are real allPosts / allPages results for 10, 100 and 1,000
+edges (posts with 2 KB of content), plus rows of post values carrying native
+UUIDs and datetimes, which the encoders handle without a conversion pass.
+
+    python -m benchmarks.json_encoding
+"""
+from benchmarks.utils import benchmark_database, measure, report
+
+POSTS_QUERY = '''query ($first: Int) { allPosts(first: $first) { edges { cursor node {
+    id title slug excerpt content created updated views author { username }
+} } } }'''
+PAGES_QUERY = '''query ($first: Int) { allPages(first: $first) { edges { cursor node {
+    id title slug pageStatus content updated link { label url }
+} } } }'''
+SIZES = (10, 100, 1000)
+
+
+def create_content():
+    from django.contrib.auth.models import User
+    from cms_content.models import Page, Post
+
+    author = User.objects.create(username='author')
+    Post.objects.bulk_create(
+        Post(title=f"Post {i}", slug=f"post-{i}", content="Text " * 400, excerpt="Short text " * 5,
+             author=author, status='published')
+        for i in range(max(SIZES))
+    )
+    for i in range(max(SIZES)):
+        Page.objects.create(title=f"Page {i}", content="Text " * 100, page_status='published')
+
+
+def get_payloads():
+    from django.conf import settings
+    from django.test import override_settings
+    from cms_content.models import Post
+    from cms_content.schema import schema
+
+    payloads = []
+    with override_settings(GRAPHENE={**settings.GRAPHENE, 'RELAY_CONNECTION_MAX_LIMIT': max(SIZES)}):
+        for name, query in (('allPosts', POSTS_QUERY), ('allPages', PAGES_QUERY)):
+            for size in SIZES:
+                result = schema.execute(query, variable_values={'first': size})
+                assert not result.errors, result.errors
+                payloads.append((f"{name} x {size}", {'data': result.data}))
+    rows = list(Post.objects.values('id', 'title', 'slug', 'excerpt', 'created', 'updated', 'views'))
+    payloads.append((f"native post values x {len(rows)}", rows))
+    return payloads
+
+
+def main():
+    with benchmark_database():
+        from cms_content import encoders
+
+        create_content()
+        candidates = [('json', encoders.encode_stdlib)]
+        if encoders.orjson is None:
+            print("orjson is not installed, timing the json module only")
+        else:
+            candidates.append(('orjson', encoders.encode_orjson))
+
+        for label, payload in get_payloads():
+            size = len(encoders.encode_stdlib(payload).encode()) / 1024
+            print(f"{label} ({size:.0f} KB)")
+            means = {}
+            for name, encode in candidates:
+                repeat = max(5, min(200, int(20000 / size)))
+                timings = measure(lambda: encode(payload), repeat=repeat, warmup=2)
+                means[name] = sum(timings) / len(timings)
+                report(f"  {name}", timings)
+            if len(means) > 1:
+                print(f"  orjson is {means['json'] / means['orjson']:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
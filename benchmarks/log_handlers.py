@@ -0,0 +1,78 @@
+"""Time SQL debug records cost the logging thread: FileHandler, queued, queued and sampled.
+
+Each handler writes to a fast local file, then to one that stalls for 5 ms
+every 200 writes, like a busy disk or network volume.
+
+    python -m benchmarks.log_handlers
+"""
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.utils import measure, report
+from MyDjango.log import BackgroundHandler, JSONFormatter, SamplingFilter
+
+SQL = ('SELECT "cms_content_page"."id", "cms_content_page"."title", "cms_content_page"."slug" '
+       'FROM "cms_content_page" WHERE "cms_content_page"."parent_id" IN (%s) ORDER BY "cms_content_page"."order"')
+
+
+class StallingStream:
+    """A file that blocks now and then, as writes to a busy disk do."""
+
+    def __init__(self, stream, every=200, stall=0.005):
+        self.stream = stream
+        self.every = every
+        self.stall = stall
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        if self.writes % self.every == 0:
+            time.sleep(self.stall)
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def get_handlers(directory, slow):
+    file_handler = logging.FileHandler(directory / 'debug.log')
+    background = BackgroundHandler(directory / 'cms.log', max_bytes=50 * 1024 * 1024)
+    sampled = BackgroundHandler(directory / 'sampled.log', max_bytes=50 * 1024 * 1024)
+    sampled.addFilter(SamplingFilter({'django.db.backends': 100}))
+    for handler in (background, sampled):
+        handler.setFormatter(JSONFormatter())
+    if slow:
+        file_handler.stream = StallingStream(file_handler._open())
+        for handler in (background, sampled):
+            handler.target.stream = StallingStream(handler.target._open())
+    return (("FileHandler", file_handler), ("BackgroundHandler", background),
+            ("BackgroundHandler, sampled 1/100", sampled))
+
+
+def main():
+    log = logging.getLogger('django.db.backends')
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+
+    def log_queries():
+        # What CursorDebugWrapper logs for every statement when DEBUG is on
+        for i in range(100):
+            log.debug("(%.3f) %s; args=%s; alias=%s", 0.0004, SQL, (i,), 'default',
+                      extra={'duration': 0.0004, 'sql': SQL, 'params': (i,), 'alias': 'default'})
+
+    for slow in (False, True):
+        print("\nStalling disk" if slow else "Fast disk")
+        with tempfile.TemporaryDirectory() as directory:
+            for label, handler in get_handlers(Path(directory), slow):
+                log.handlers = [handler]
+                report(f"{label}, 100 records", measure(log_queries, repeat=200, warmup=10))
+                handler.flush()
+                if isinstance(handler, BackgroundHandler):
+                    print(f"    dropped {handler.dropped}")
+                handler.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Post search over 100k rows: LIKE scans against the FTS5 index.
+
+    python -m benchmarks.search
+"""
+import random
+import time
+import uuid
+
+from benchmarks.utils import benchmark_database, measure, report
+
+POSTS = 100_000
+WORDS = [f"word{i}" for i in range(5000)]
+
+
+def main():
+    with benchmark_database():
+        from django.contrib.auth.models import User
+        from django.db.models import Q
+        from cms_content import search
+        from cms_content.models import Post
+
+        random.seed(1)
+        author = User.objects.create(username='author')
+        posts = (
+            Post(id=uuid.uuid4(), title=f"Post {i} {random.choice(WORDS)}", slug=f"post-{i}", author=author,
+                 status='published', content=' '.join(random.choices(WORDS, k=80)))
+            for i in range(POSTS)
+        )
+        start = time.perf_counter()
+        batch = []
+        for post in posts:
+            batch.append(post)
+            if len(batch) == 1000:
+                Post.objects.bulk_create(batch)
+                search.index(batch, created=True)
+                batch = []
+        print(f"Created and indexed {POSTS} posts in {time.perf_counter() - start:.1f}s")
+        # A rare word: LIMIT cannot cut a LIKE scan short
+        Post.objects.create(title="Zephyr", content="A rare zephyrs post", author=author, status='published')
+
+        for term in ('word1234', 'zephyr'):
+            def like_count():
+                # What the admin changelist runs before showing a page of results
+                Post.objects.filter(Q(title__icontains=term) | Q(content__icontains=term)).count()
+
+            def like_first_page():
+                list(Post.objects.filter(Q(title__icontains=term) | Q(content__icontains=term))
+                     .values_list('id', flat=True)[:10])
+
+            def full_text():
+                search.search(term, kinds=['post'], limit=10)
+
+            def full_text_count():
+                Post.objects.filter(pk__in=search.matching_ids(Post, term)).count()
+
+            print(f"\n'{term}': {len(search.search(term, kinds=['post'], limit=POSTS))} matches")
+            report("LIKE count", measure(like_count, repeat=10, warmup=1))
+            report("LIKE first 10", measure(like_first_page, repeat=10, warmup=1))
+            report("FTS5 count", measure(full_text_count, repeat=20, warmup=2))
+            report("FTS5 ranked top 10 with snippets", measure(full_text, repeat=20, warmup=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Time a full snapshot build against the incremental updates of single saves.
+
+1,000 published pages in a three-level tree, 2,000 posts, written to a
+temporary directory.
+
+    python -m benchmarks.snapshots
+"""
+import tempfile
+import time
+
+from benchmarks.utils import benchmark_database, measure, report
+
+
+def create_content():
+    from django.contrib.auth.models import User
+    from cms_content.models import Page, Post
+
+    author = User.objects.create(username='author')
+    for i in range(10):
+        section = Page.objects.create(title=f"Section {i}", page_status='published', page_link_location='navbar')
+        for j in range(10):
+            parent = Page.objects.create(title=f"Page {i} {j}", parent=section, page_status='published')
+            for k in range(9):
+                Page.objects.create(title=f"Page {i} {j} {k}", parent=parent, page_status='published')
+    Post.objects.bulk_create(
+        Post(title=f"Post {i}", slug=f"post-{i}", content="Text " * 200, author=author, status='published')
+        for i in range(2000)
+    )
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory, benchmark_database():
+        from django.conf import settings
+        from django.db import transaction
+        from cms_content import snapshots
+        from cms_content.models import Page, Post
+
+        create_content()
+        settings.CMS_SNAPSHOT_ROOT = directory
+        start = time.perf_counter()
+        count = snapshots.build()
+        print(f"Full build: {count} files in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        page = Page.objects.get(title="Page 5 5 5")
+        post = Post.objects.order_by('created')[1000]
+        edits = iter(range(10 ** 6))
+
+        def edit(instance, field):
+            setattr(instance, field, f"Edit {next(edits)}")
+            with transaction.atomic():
+                instance.save()
+
+        report("Save page content + update", measure(lambda: edit(page, 'content'), repeat=50))
+        report("Save post excerpt + update", measure(lambda: edit(post, 'excerpt'), repeat=50))
+
+        def publish():
+            with transaction.atomic():
+                Post.objects.create(title=f"New post {next(edits)}", content="Text " * 200, author=post.author,
+                                    status='published')
+
+        report("Publish post + update", measure(publish, repeat=50))
+        report("Full build", measure(snapshots.build, repeat=5, warmup=1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Reads and writes per second on a file database from concurrent threads: stock SQLite settings vs the tuned ones.
+
+Reader threads list posts back to back while writer threads edit them, each
+edit reading the post and saving it in one transaction, as the admin does.
+"stock" is Django's SQLite defaults: rollback journal, deferred
+transactions, a 5 second busy timeout, no replica. "tuned" is DATABASES as
+configured: WAL and the PRAGMAs, immediate transactions and reads routed to
+the replica connection. Failed operations ("database is locked") are counted,
+not retried.
+
+    python -m benchmarks.sqlite_tuning [--readers 8] [--writers 2] [--seconds 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.utils import benchmark_database
+
+
+def configure_stock(settings):
+    default = settings.DATABASES['default']
+    default['OPTIONS'] = {}
+    default['CONN_MAX_AGE'] = 0
+    del settings.DATABASES['replica']
+
+
+def create_content():
+    from django.contrib.auth.models import User
+    from cms_content.models import Post
+
+    author = User.objects.create(username='author')
+    Post.objects.bulk_create(
+        Post(title=f"Post {i}", slug=f"post-{i}", content="Text " * 200, author=author, status='published')
+        for i in range(500)
+    )
+    return list(Post.objects.values_list('pk', flat=True))
+
+
+def read(pks, i):
+    from cms_content.models import Post
+
+    list(Post.objects.filter(status='published').order_by('-created').values('title', 'slug', 'content')[:20])
+
+
+def write(pks, i):
+    from django.db import transaction
+    from cms_content.models import Post
+
+    with transaction.atomic():
+        post = Post.objects.get(pk=pks[i % len(pks)])
+        post.content = f"Edit {i} " * 200
+        post.save()
+
+
+def run_workers(operations, pks, seconds):
+    """Run (name, function) pairs in threads of their own; return {name: (latencies, errors)}."""
+    from django.db import OperationalError, connections
+
+    results = {name: ([], []) for name, _ in operations}
+    deadline = time.perf_counter() + seconds
+
+    def worker(name, function):
+        latencies, errors = results[name]
+        i = 0
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    function(pks, i)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except OperationalError:
+                    errors.append(time.perf_counter() - start)
+                i += 1
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=operation) for operation in operations]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_mode(mode, readers, writers, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MyDjango.settings')
+        from django.conf import settings
+        settings.DATABASES['default']['TEST'] = {'NAME': os.path.join(directory, 'tuning.sqlite3')}
+        if mode == 'stock':
+            configure_stock(settings)
+        with benchmark_database():
+            settings.DEBUG = False
+            pks = create_content()
+            results = run_workers([('read', read)] * readers + [('write', write)] * writers, pks, seconds)
+            for name, (latencies, errors) in results.items():
+                latencies.sort()
+                p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else float('nan')
+                print(f"{mode:<6} {name:<6} {len(latencies) / seconds:8.1f} /s   "
+                      f"median {statistics.median(latencies) if latencies else float('nan'):8.2f} ms   "
+                      f"p95 {p95:8.2f} ms   failed {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('stock', 'tuned'))
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    options = parser.parse_args()
+
+    if options.mode:
+        run_mode(options.mode, options.readers, options.writers, options.seconds)
+        return
+    print(f"{options.readers} readers, {options.writers} writers, {options.seconds:g} s, {os.cpu_count()} CPUs")
+    # One process per mode, as connections read DATABASES once
+    for mode in ('stock', 'tuned'):
+        subprocess.run([sys.executable, '-m', 'benchmarks.sqlite_tuning', '--mode', mode, *sys.argv[1:]],
+                       check=True)
+
+
+if __name__ == '__main__':
+    main()
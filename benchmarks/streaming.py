@@ -0,0 +1,71 @@
+"""Peak memory and time of a large allPosts page: the usual response vs a streamed one.
+
+500 posts with 200 KB of content each (about 100 MB of rows), asked for in one
+page with the page size limit raised to match. Memory is traced with
+tracemalloc from the request to the last byte of the body, which is read and
+dropped as a WSGI server would.
+
+    python -m benchmarks.streaming [--posts 500] [--content-kb 200] [--chunk-size 50]
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.utils import benchmark_database
+
+QUERY = '{ allPosts { edges { cursor node { id title content created author { username } } } } }'
+
+
+def create_content(posts, content_kb):
+    from django.contrib.auth.models import User
+    from cms_content.models import Post
+
+    author = User.objects.create(username='author')
+    for start in range(0, posts, 50):
+        Post.objects.bulk_create(
+            Post(title=f"Post {i}", slug=f"post-{i}", content=f"Text {i} ".ljust(content_kb * 1024, 'x'),
+                 author=author, status='published')
+            for i in range(start, min(start + 50, posts))
+        )
+
+
+def run(client, stream):
+    """Return (peak MB, seconds, body MB) of one request, reading the body as it comes."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.post('/graphql/?stream=1' if stream else '/graphql/', {'query': QUERY},
+                           content_type='application/json')
+    size = 0
+    for part in (response.streaming_content if response.streaming else [response.content]):
+        size += len(part)
+    response.close()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20, elapsed, size / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--content-kb', type=int, default=200)
+    parser.add_argument('--chunk-size', type=int, default=50)
+    options = parser.parse_args()
+
+    with benchmark_database():
+        from django.conf import settings
+        from django.test import Client, override_settings
+
+        create_content(options.posts, options.content_kb)
+        client = Client()
+        with override_settings(DEBUG=False, CMS_GRAPHQL_PROFILE=False, CMS_GRAPHQL_RESPONSE_CACHE=False,
+                               CMS_GRAPHQL_STREAM_CHUNK_SIZE=options.chunk_size,
+                               GRAPHENE={**settings.GRAPHENE, 'RELAY_CONNECTION_MAX_LIMIT': options.posts}):
+            for label, stream in (("usual", False), ("streamed", True)):
+                run(client, stream)
+                peak, elapsed, size = run(client, stream)
+                print(f"{label:<9} peak {peak:8.1f} MB   {elapsed * 1000:8.0f} ms   body {size:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
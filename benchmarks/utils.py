@@ -0,0 +1,53 @@
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+# Shared helpers for the benchmark scripts. Run a benchmark from the project
+# root with `python -m benchmarks.<name>`; each one works on a throwaway test
+# database so db.sqlite3 is never touched.
+
+
+@contextmanager
+def benchmark_database():
+    """Set up Django and yield with a freshly migrated test database."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MyDjango.settings')
+    django.setup()
+    from django.db import connection, connections
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+    # Aliases mirroring the default one, like the read replica, must read the
+    # test database too
+    for alias in connections:
+        if connections[alias].settings_dict['TEST']['MIRROR'] == connection.alias:
+            connections[alias].close()
+            connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat=200, warmup=10):
+    """Call `func` repeatedly and return the per-call timings in milliseconds."""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<40} mean {statistics.mean(timings):8.3f} ms   "
+          f"median {statistics.median(timings):8.3f} ms   p95 {p95:8.3f} ms")
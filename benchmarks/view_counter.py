@@ -0,0 +1,53 @@
+"""Cost of counting a page view: save() per hit, F() UPDATE per hit, buffered.
+
+    python -m benchmarks.view_counter
+"""
+import random
+import time
+
+from benchmarks.utils import benchmark_database, measure, report
+
+HITS = 5000
+PAGES = 100
+
+
+def main():
+    with benchmark_database():
+        from django.db.models import F
+        from cms_content.counters import ViewCounter
+        from cms_content.models import Page
+
+        Page.objects.bulk_create(Page(title=f"Page {i}", slug=f"page-{i}") for i in range(PAGES))
+        ids = list(Page.objects.values_list('id', flat=True))
+
+        def save_per_hit():
+            page = Page.objects.get(pk=random.choice(ids))
+            page.views += 1
+            page.save(update_fields=['views'])
+
+        def update_per_hit():
+            Page.objects.filter(pk=random.choice(ids)).update(views=F('views') + 1)
+
+        counter = ViewCounter()
+
+        def buffered_hit():
+            counter.hit(Page, random.choice(ids))
+
+        report("save() per hit", measure(save_per_hit, repeat=500))
+        report("F() UPDATE per hit", measure(update_per_hit, repeat=500))
+        report("buffered hit", measure(buffered_hit, repeat=HITS))
+        counter.flush()
+
+        # Throughput including the flushes of the buffered writes
+        Page.objects.update(views=0)
+        start = time.perf_counter()
+        for _ in range(HITS):
+            buffered_hit()
+        counter.flush()
+        seconds = time.perf_counter() - start
+        assert sum(Page.objects.values_list('views', flat=True)) == HITS
+        print(f"{HITS} buffered hits with flush: {HITS / seconds:,.0f} hits/s")
+
+
+if __name__ == '__main__':
+    main()
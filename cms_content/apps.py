@@ -5,3 +5,7 @@ class CmsContentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cms_content'
     verbose_name = 'Web Content'
+
+    def ready(self):
+        # Connects the signals keeping the search index and the snapshot current
+        from . import search, snapshots  # noqa: F401
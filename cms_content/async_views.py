@@ -0,0 +1,139 @@
+import copy
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import ensure_csrf_cookie
+from graphene_django.views import HttpError
+from graphql import OperationType
+from graphql.execution import ExecutionContext
+
+from . import profiling
+from .views import CMSGraphQLView
+
+
+# The GraphQL endpoint for ASGI.
+#
+# Under ASGI a sync view holds a thread for the whole request, top-level
+# fields included, which run one after the other. The async view holds a
+# thread only to look the request up (persisted query, document cache,
+# response cache) and to store the response. Each top-level field of a query
+# is resolved in a worker thread of its own, so `{ navigation allPosts search }`
+# takes as long as its slowest field rather than the sum of them.
+#
+# The fields below a top-level field stay synchronous and batched by the
+# loaders. Django's async ORM would not make them concurrent: on SQLite
+# `aget()` and `aiterator()` hand every query to the one thread the request
+# shares, so the fields would queue on it again.
+
+
+class FieldContext:
+    """The request as seen from one top-level field, with loaders of its own."""
+
+    def __init__(self, request):
+        self.request = request
+
+    def __getattr__(self, name):
+        return getattr(self.request, name)
+
+
+class ConcurrentExecutionContext(ExecutionContext):
+    """Resolve the top-level fields of a query concurrently, each in a worker thread."""
+
+    def execute_operation(self, operation, root_value):
+        # Mutations must run in order, in the request's thread
+        self.concurrent = operation.operation == OperationType.QUERY
+        return super().execute_operation(operation, root_value)
+
+    def execute_field(self, parent_type, source, field_nodes, path):
+        if path.prev is not None or not self.concurrent:
+            return super().execute_field(parent_type, source, field_nodes, path)
+        return sync_to_async(self.execute_top_level_field, thread_sensitive=False)(
+            parent_type, source, field_nodes, path)
+
+    def execute_top_level_field(self, parent_type, source, field_nodes, path):
+        # A copy sharing everything but the context, so loaders are not used
+        # from two threads at once; errors still go to the shared list
+        context = copy.copy(self)
+        context.context_value = FieldContext(self.context_value)
+        context.concurrent = False
+        try:
+            return ExecutionContext.execute_field(context, parent_type, source, field_nodes, path)
+        finally:
+            close_old_connections()
+
+
+async def iterate_in_thread(iterator):
+    """Read a sync iterator one item at a time, in the thread the request's queries run in."""
+    next_item = sync_to_async(next)
+    done = object()
+    while (item := await next_item(iterator, done)) is not done:
+        yield item
+
+
+class AsyncCMSGraphQLView(CMSGraphQLView):
+    """CMSGraphQLView as an async view, resolving top-level query fields concurrently.
+
+    GraphiQL, batches, streamed and profiled requests are handed to
+    CMSGraphQLView in a thread, as profiles follow one thread's queries and
+    streams read their rows from it.
+    """
+
+    view_is_async = True
+
+    @method_decorator(ensure_csrf_cookie)
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() in ('get', 'post'):
+                data = self.parse_body(request)
+                if not (self.batch or profiling.is_enabled() or self.wants_stream(request, data)
+                        or (self.graphiql and self.can_display_graphiql(request, data))):
+                    result, status_code = await self.aget_response(request, data)
+                    response = HttpResponse(status=status_code, content=result, content_type='application/json')
+                    return self.make_conditional(request, response)
+        except HttpError as e:
+            response = e.response
+            response['Content-Type'] = 'application/json'
+            response.content = self.json_encode(request, {'errors': [self.format_error(e)]})
+            return response
+        response = await sync_to_async(super().dispatch)(request, *args, **kwargs)
+        if response.streaming and not response.is_async:
+            # Django would read a sync stream whole before sending any of it
+            response.streaming_content = iterate_in_thread(response.streaming_content)
+        return response
+
+    def start_response(self, request, data):
+        """Return the response cache key, and the cached response or the pending execution result."""
+        self.prepare_conditional(request, data)
+        key, response = self.lookup_response(request, data)
+        if response is not None:
+            return key, response, None
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+        result = self.execute_cached_document(request, data, query, variables, operation_name,
+                                              execution_context_class=ConcurrentExecutionContext)
+        return key, None, result
+
+    async def aget_response(self, request, data):
+        key, response, execution_result = await sync_to_async(self.start_response)(request, data)
+        if response is not None:
+            return response
+        if inspect.isawaitable(execution_result):
+            execution_result = await execution_result
+        request.graphql_errors = bool(execution_result.errors)
+
+        # Mirrors GraphQLView.get_response, less batching
+        response = {}
+        status_code = 200
+        if execution_result.errors:
+            response['errors'] = [self.format_error(e) for e in execution_result.errors]
+        if execution_result.errors and any(not getattr(e, 'path', None) for e in execution_result.errors):
+            status_code = 400
+        else:
+            response['data'] = execution_result.data
+        result = self.json_encode(request, response)
+
+        if key is not None:
+            await sync_to_async(self.store_response)(request, key, result, status_code)
+        return result, status_code
@@ -0,0 +1,442 @@
+import csv
+import json
+import time
+import uuid
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Length
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import search
+from .models import Page, Link, Post, PAGE_LINK_FIELDS, subtree_filter
+from .slugs import allocate_slugs
+from .versions import bump_version
+
+
+# Bulk import and export of content.
+#
+# Rows are plain dicts streamed in chunks. Imports skip Model.save() and the
+# Page/Link signals: hierarchical slugs and the Link of every page are worked
+# out in memory and written with bulk_create()/bulk_update(), a few statements
+# per chunk. Rows matching an existing page (by title), link (by slug) or post
+# (by id or slug) update it in place, writing only the columns the rows have;
+# a page given a new parent moves with its subtree. Slugs and titles another
+# row already holds are reported as a BulkImportError before anything is
+# written. The search index is written alongside. Exports walk the table with
+# .iterator(), so memory stays flat.
+#
+# Pages refer to their parent by slug, which must already exist or come in
+# the same or an earlier chunk; exports put every parent first. Links of pages travel with their pages, so only links
+# without a page are exported and imported as links.
+
+DEFAULT_CHUNK_SIZE = 1000
+
+FIELDS = {
+    'pages': ['title', 'slug', 'url', 'content', 'parent', 'page_status', 'page_link_location',
+              'show_in_position', 'order', 'meta_title', 'meta_description', 'meta_keywords'],
+    'links': ['label', 'slug', 'url', 'location', 'status', 'order'],
+    'posts': ['id', 'title', 'slug', 'content', 'excerpt', 'author', 'created', 'updated', 'status', 'views',
+              'meta_title', 'meta_description', 'meta_keywords'],
+}
+
+# Relations are exported as natural keys
+NATURAL_KEYS = {'parent': 'parent__slug', 'author': 'author__username'}
+
+
+class BulkImportError(ValueError):
+    pass
+
+
+class BulkResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.seconds = 0.0
+
+    @property
+    def rows(self):
+        return self.created + self.updated
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.rows} rows ({self.created} created, {self.updated} updated) "
+                f"in {self.seconds:.2f}s, {self.rows_per_second:.0f} rows/s")
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def clean_row(model, row, fields, number):
+    """Convert the raw (possibly CSV string) values of `row` to Python values.
+
+    Empty values become NULL where the column allows it and are otherwise
+    left to the field default. `number` is the row's position in the input,
+    for the BulkImportError of a value the column cannot hold.
+    """
+    values = {}
+    for name in fields:
+        if name in NATURAL_KEYS or row.get(name) in ('', None):
+            if name not in NATURAL_KEYS and name in row and model._meta.get_field(name).null:
+                values[name] = None
+            continue
+        try:
+            values[name] = model._meta.get_field(name).to_python(row[name])
+        except ValidationError as error:
+            raise BulkImportError(f"Row {number}: invalid {name} {row[name]!r}: {' '.join(error.messages)}")
+    return values
+
+
+def update_instance(instance, values, row, fields):
+    """Set the columns `row` has onto an existing instance, and return their names.
+
+    Columns the row leaves out keep their values. Empty ones go back to the
+    field default, as they would for a new row, or keep their values when
+    the field has none (e.g. `created`).
+    """
+    supplied = []
+    for name in fields:
+        if name in NATURAL_KEYS or name not in row:
+            continue
+        if name in values:
+            value = values[name]
+        else:
+            value = instance._meta.get_field(name).get_default()
+            if value is None:
+                continue
+        setattr(instance, name, value)
+        supplied.append(name)
+    return supplied
+
+
+def build_page_slug(title, parent_slug):
+    return f"{parent_slug}/{slugify(title)}" if parent_slug else slugify(title)
+
+
+class PageImporter:
+    def __init__(self):
+        # slug -> id of every page seen so far, to resolve parents
+        self.page_ids = {}
+
+    def resolve_parents(self, parent_slugs):
+        missing = {slug for slug in parent_slugs if slug and slug not in self.page_ids}
+        if missing:
+            self.page_ids.update(Page.objects.filter(slug__in=missing).values_list('slug', 'id'))
+        for slug in missing - self.page_ids.keys():
+            raise BulkImportError(f"Unknown parent page '{slug}'.")
+
+    def match_pages(self, rows, first):
+        """Return (page, values, row) for each row, the page loaded from the table if it exists.
+
+        Pages are matched by their unique title, and failing that by the slug
+        the row would give them, which lets a row change the case of a title.
+        `first` is the number of the first row in the input.
+        """
+        cleaned = []
+        for number, row in enumerate(rows, first):
+            values = clean_row(Page, row, FIELDS['pages'], number)
+            values.pop('slug', None)
+            if not values.get('title'):
+                raise BulkImportError("Every page needs a title.")
+            cleaned.append((values, row, build_page_slug(values['title'], row.get('parent') or None)))
+
+        existing = list(Page.objects.filter(
+            Q(title__in=[values['title'] for values, _, _ in cleaned]) | Q(slug__in=[slug for _, _, slug in cleaned])
+        ).annotate(parent_slug=F('parent__slug')))
+        by_title = {page.title: page for page in existing}
+        by_slug = {page.slug: page for page in existing}
+
+        matched = []
+        for values, row, slug in cleaned:
+            page = by_title.get(values['title']) or by_slug.get(slug)
+            # A page moved by the row must not land on another page's slug
+            other = by_slug.get(slug) if 'parent' in row else None
+            if other is not None and other is not page:
+                raise BulkImportError(f"Page '{values['title']}' would take the slug of page '{other.title}'.")
+            matched.append((page, values, row))
+        return matched
+
+    def import_chunk(self, rows, result):
+        pages = {}
+        parent_slugs = {}
+        titles = set()
+        # Rows of earlier chunks are all counted in the result
+        for page, values, row in self.match_pages(rows, result.rows + 1):
+            if page is None:
+                page = Page(**values)
+                page.imported_fields = None
+                page.old_slug = None
+                page.keeps_parent = False
+                parent_slug = row.get('parent') or None
+            else:
+                # Only the columns the row has are written
+                page.imported_fields = update_instance(page, values, row, FIELDS['pages'])
+                page.old_slug = page.slug
+                page.keeps_parent = 'parent' not in row
+                parent_slug = page.parent_slug if page.keeps_parent else row.get('parent') or None
+            page.slug = build_page_slug(page.title, parent_slug)
+            if page.slug in pages or page.title in titles:
+                raise BulkImportError(f"Page '{page.slug}' appears twice in one chunk.")
+            pages[page.slug] = page
+            parent_slugs[page.slug] = parent_slug
+            titles.add(page.title)
+        self.check_moves(pages.values(), parent_slugs)
+        self.check_link_slugs(pages.values())
+
+        # Write one tree level at a time so parents in this chunk get their ids first
+        levels = {}
+        for page in pages.values():
+            levels.setdefault(page.slug.count('/'), []).append(page)
+        for depth in sorted(levels):
+            level = levels[depth]
+            self.resolve_parents([parent_slugs[page.slug] for page in level])
+            for page in level:
+                parent_slug = parent_slugs[page.slug]
+                page.parent_id = self.page_ids[parent_slug] if parent_slug else None
+            self.write_pages(level, result)
+
+    def check_moves(self, pages, parent_slugs):
+        # A page keeping its parent takes the parent's slug from the table,
+        # which is out of date once a page above it moves in the same chunk
+        moved = [page.old_slug for page in pages if page.old_slug and page.old_slug != page.slug]
+        for page in pages:
+            parent_slug = parent_slugs[page.slug]
+            if page.old_slug in moved and parent_slug and (
+                    parent_slug == page.old_slug or parent_slug.startswith(f'{page.old_slug}/')):
+                raise BulkImportError(f"Page '{page.title}' cannot move below itself.")
+            if not (page.keeps_parent and parent_slug):
+                continue
+            for old_slug in moved:
+                if parent_slug == old_slug or parent_slug.startswith(f'{old_slug}/'):
+                    raise BulkImportError(f"Page '{page.title}' is below page '{old_slug}', which moves in the "
+                                          "same chunk; give it a parent.")
+
+    def check_link_slugs(self, pages):
+        # New and moved pages take slugs for their links, which links without
+        # a page may already hold
+        condition = Q(slug__in=[page.slug for page in pages if page.old_slug is None])
+        for page in pages:
+            if page.old_slug is not None and page.old_slug != page.slug:
+                condition |= Q(slug=page.slug) | subtree_filter(page.slug)
+        taken = Link.objects.filter(condition).exclude(
+            page__in=[page.pk for page in pages if page.old_slug is not None]).values_list('slug', flat=True)
+        for slug in taken[:1]:
+            raise BulkImportError(f"Link slug '{slug}' is already taken.")
+
+    def write_pages(self, pages, result):
+        new_pages = [page for page in pages if page.pk is None]
+        old_pages = [page for page in pages if page.pk is not None]
+
+        Page.objects.bulk_create(new_pages)
+        # bulk_update() leaves auto_now fields alone
+        now = timezone.now()
+        for page in old_pages:
+            page.updated = now
+        imported_fields = {name for page in old_pages for name in page.imported_fields}
+        update_fields = [name for name in FIELDS['pages'] if name in imported_fields and name not in ('slug', 'parent')]
+        Page.objects.bulk_update(old_pages, update_fields + ['slug', 'parent', 'updated'])
+        for page in old_pages:
+            if page.old_slug != page.slug:
+                page.reslug_descendants(page.old_slug)
+                # Slugs under the old one are gone
+                for slug in [slug for slug in self.page_ids if slug == page.old_slug
+                             or slug.startswith(f'{page.old_slug}/')]:
+                    del self.page_ids[slug]
+        self.page_ids.update((page.slug, page.pk) for page in pages)
+
+        # The Link of every page, mirrored the same way Page.sync_link does
+        def mirror(link, page):
+            for page_field, link_field in PAGE_LINK_FIELDS.items():
+                setattr(link, link_field, getattr(page, page_field))
+            link.updated = now
+            return link
+
+        Link.objects.bulk_create([mirror(Link(page_id=page.pk), page) for page in new_pages])
+        links = {link.page_id: link for link in Link.objects.filter(page_id__in=[page.pk for page in old_pages])}
+        Link.objects.bulk_create([mirror(Link(page_id=page.pk), page) for page in old_pages
+                                  if page.pk not in links])
+        Link.objects.bulk_update([mirror(links[page.pk], page) for page in old_pages if page.pk in links],
+                                 [*PAGE_LINK_FIELDS.values(), 'updated'])
+        search.index(new_pages, created=True)
+        search.index(old_pages)
+        result.created += len(new_pages)
+        result.updated += len(old_pages)
+
+
+class LinkImporter:
+    def import_chunk(self, rows, result):
+        links = []
+        for number, row in enumerate(rows, result.rows + 1):
+            if row.get('page'):
+                raise BulkImportError("Links of pages are imported with their pages.")
+            links.append((clean_row(Link, row, FIELDS['links'], number), row))
+
+        given = [values['slug'] for values, _ in links if values.get('slug')]
+        existing = {link.slug: link for link in Link.objects.filter(slug__in=given, page__isnull=True)}
+        new_links = []
+        old_links = []
+        imported_fields = set()
+        for values, row in links:
+            link = existing.get(values.get('slug'))
+            if link is None:
+                new_links.append(Link(**values))
+            else:
+                # Only the columns the row has are written
+                imported_fields.update(update_instance(link, values, row, FIELDS['links']))
+                old_links.append(link)
+        for link, slug in zip(new_links, allocate_slugs(Link, [link.slug or slugify(link.label) for link in new_links])):
+            link.slug = slug
+
+        Link.objects.bulk_create(new_links)
+        now = timezone.now()
+        for link in old_links:
+            link.updated = now
+        Link.objects.bulk_update(old_links, [name for name in FIELDS['links']
+                                             if name in imported_fields and name != 'slug'] + ['updated'])
+        result.created += len(new_links)
+        result.updated += len(old_links)
+
+
+class PostImporter:
+    def import_chunk(self, rows, result):
+        usernames = {row['author'] for row in rows if row.get('author')}
+        authors = dict(get_user_model().objects.filter(username__in=usernames).values_list('username', 'id'))
+        for username in usernames - authors.keys():
+            raise BulkImportError(f"Unknown author '{username}'.")
+
+        # Match on id when the row has one, otherwise on slug
+        cleaned = [(clean_row(Post, row, FIELDS['posts'], number), row)
+                   for number, row in enumerate(rows, result.rows + 1)]
+        given_ids = {values['id'] for values, row in cleaned if row.get('id')}
+        by_id = Post.objects.in_bulk(given_ids)
+        slugs = [values['slug'] for values, row in cleaned if values.get('slug') and values.get('id') not in by_id]
+        by_slug = {post.slug: post for post in Post.objects.filter(slug__in=slugs)}
+
+        new_posts = []
+        old_posts = []
+        imported_fields = set()
+        for values, row in cleaned:
+            post = by_id.get(values.get('id')) or by_slug.get(values.get('slug'))
+            if post is None:
+                if not row.get('author'):
+                    raise BulkImportError(f"Post '{values.get('title')}' needs an author.")
+                post = Post(**values)
+                new_posts.append(post)
+            else:
+                # Only the columns the row has are written
+                imported_fields.update(name for name in update_instance(post, values, row, FIELDS['posts'])
+                                       if name != 'id')
+                old_posts.append(post)
+            if row.get('author'):
+                post.author_id = authors[row['author']]
+                imported_fields.add('author')
+        self.check_titles(new_posts, old_posts)
+        for post, slug in zip(new_posts, allocate_slugs(Post, [post.slug or slugify(post.title) for post in new_posts])):
+            post.slug = slug
+
+        timestamps = [name for name in ('created', 'updated') if any(row.get(name) for row in rows)]
+        # bulk_create() stamps auto_now(_add) fields onto the instances, but
+        # bulk_update() leaves them alone, so imported timestamps are put back
+        stamped = [(post, [getattr(post, name) for name in timestamps]) for post in new_posts]
+        Post.objects.bulk_create(new_posts)
+        if timestamps:
+            for post, values in stamped:
+                for name, value in zip(timestamps, values):
+                    if value is not None:
+                        setattr(post, name, value)
+            Post.objects.bulk_update(new_posts, timestamps)
+        Post.objects.bulk_update(old_posts, [name for name in FIELDS['posts'] if name in imported_fields])
+        search.index(new_posts, created=True)
+        search.index(old_posts)
+        result.created += len(new_posts)
+        result.updated += len(old_posts)
+
+    def check_titles(self, new_posts, old_posts):
+        # Titles are unique, and rows are matched on id or slug rather than title
+        posts = {post.title: post for post in [*new_posts, *old_posts]}
+        if len(posts) < len(new_posts) + len(old_posts):
+            raise BulkImportError("A post title appears twice in one chunk.")
+        for title, pk in Post.objects.filter(title__in=posts).values_list('title', 'pk'):
+            if posts[title]._state.adding or posts[title].pk != pk:
+                raise BulkImportError(f"Post title '{title}' is already taken.")
+
+
+IMPORTERS = {'pages': PageImporter, 'links': LinkImporter, 'posts': PostImporter}
+MODELS = {'pages': (Page, Link), 'links': (Link,), 'posts': (Post,)}
+
+
+def import_rows(kind, rows, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Import an iterable of row dicts as `kind` ('pages', 'links' or 'posts').
+
+    Each chunk is written in its own transaction. `progress` is called with
+    the BulkResult after every chunk.
+    """
+    importer = IMPORTERS[kind]()
+    result = BulkResult()
+    start = time.perf_counter()
+    try:
+        for chunk in chunked(rows, chunk_size):
+            with transaction.atomic():
+                importer.import_chunk(chunk, result)
+            result.seconds = time.perf_counter() - start
+            if progress is not None:
+                progress(result)
+    finally:
+        # Bulk writes send no signals, so retire cached content by hand
+        bump_version(*MODELS[kind])
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def export_rows(kind, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the rows of `kind` as dicts, reading the table in chunks."""
+    if kind == 'pages':
+        # Shorter slugs first, which puts every parent before its children
+        queryset = Page.objects.order_by(Length('slug'), 'id')
+    elif kind == 'links':
+        queryset = Link.objects.filter(page__isnull=True).order_by('id')
+    else:
+        queryset = Post.objects.order_by('created', 'id')
+    fields = FIELDS[kind]
+    columns = [NATURAL_KEYS.get(name, name) for name in fields]
+    for values in queryset.values_list(*columns).iterator(chunk_size=chunk_size):
+        yield dict(zip(fields, values))
+
+
+def encode(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def read_rows(stream, format):
+    if format == 'csv':
+        return csv.DictReader(stream)
+    return (json.loads(line) for line in stream if line.strip())
+
+
+def write_rows(stream, rows, format, fields):
+    count = 0
+    if format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({name: '' if value is None else encode(value) for name, value in row.items()})
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps({name: encode(value) for name, value in row.items()}) + '\n')
+            count += 1
+    return count
@@ -0,0 +1,185 @@
+from django.conf import settings
+from graphene.relay import Connection
+from graphql import GraphQLError, get_named_type, get_nullable_type, is_composite_type, is_list_type
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode, IntValueNode
+from graphql.validation import ValidationRule
+
+from .pagination import get_max_page_size
+
+
+# Depth and cost limits for GraphQL queries, checked while validating.
+#
+# `PageType.children`, `Link.page` and `Page.link` let one small query nest
+# relations without end, each level multiplying the rows loaded by the one
+# above. The cost of a query is the number of rows it can load: every field
+# returning an object counts its weight (rows per parent object) times the
+# rows of its parent. Connections weigh their `first` / `last` argument, or the
+# maximum page size when it is not a literal, and their edges and page info
+# pass the rows through for free. Queries over either limit fail validation,
+# so they are rejected before a resolver runs.
+
+# Rows per parent object of list fields without a page size argument, other
+# fields returning an object weigh 1
+FIELD_WEIGHTS = {
+    'Query.navigation': 20,
+    'Query.search': 10,
+    'NavigationItemType.children': 10,
+    'PageType.children': 10,
+    'PageType.ancestors': 5,
+    'PageType.breadcrumbs': 5,
+    'PageType.descendants': 20,
+}
+DEFAULT_LIST_WEIGHT = 10
+
+
+def get_max_depth():
+    return getattr(settings, 'CMS_GRAPHQL_MAX_DEPTH', 10)
+
+
+def get_max_cost():
+    return getattr(settings, 'CMS_GRAPHQL_MAX_COST', 10000)
+
+
+def get_field_weights():
+    """Return FIELD_WEIGHTS updated with CMS_GRAPHQL_FIELD_WEIGHTS."""
+    return {**FIELD_WEIGHTS, **getattr(settings, 'CMS_GRAPHQL_FIELD_WEIGHTS', {})}
+
+
+def is_connection(graphql_type):
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+    return isinstance(graphene_type, type) and issubclass(graphene_type, Connection)
+
+
+def get_page_size(node):
+    """Return the rows a `first` / `last` argument asks for, None without one."""
+    for argument in node.arguments:
+        if argument.name.value in ('first', 'last'):
+            if isinstance(argument.value, IntValueNode):
+                return max(0, min(int(argument.value.value), get_max_page_size()))
+            # A variable can be anything up to the maximum
+            return get_max_page_size()
+    return None
+
+
+class OverLimit(Exception):
+    """Raised while measuring an operation that is over one of the limits, to stop walking it."""
+
+
+class QueryComplexityRule(ValidationRule):
+    """Reject operations nested deeper than CMS_GRAPHQL_MAX_DEPTH or costing more than CMS_GRAPHQL_MAX_COST.
+
+    Fragments are measured once per type they are spread on and scaled by the
+    rows of each spread, and the walk stops at the first limit it passes, so
+    the cost of validating does not grow with what the query could load.
+    """
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.weights = get_field_weights()
+        self.edge_types = set()
+        # (fragment name, type name) -> (cost per object, depth)
+        self.fragment_costs = {}
+        self.max_depth, self.max_cost = get_max_depth(), get_max_cost()
+        self.cost = self.depth = 0
+
+    def enter_operation_definition(self, node, *args):
+        root_type = self.context.schema.get_root_type(node.operation)
+        if root_type is None:
+            return
+        self.cost = self.depth = 0
+        try:
+            self.measure(node.selection_set, root_type, 1, 1, frozenset())
+        except OverLimit:
+            pass
+        if self.depth > self.max_depth:
+            self.report_error(GraphQLError(
+                f"Query is nested {self.depth} levels deep, the maximum is {self.max_depth}.",
+                node, extensions={'code': 'QUERY_TOO_DEEP', 'depth': self.depth, 'maxDepth': self.max_depth}))
+        elif self.cost > self.max_cost:
+            self.report_error(GraphQLError(
+                f"Query could load {self.cost} rows or more, the maximum is {self.max_cost}.",
+                node, extensions={'code': 'QUERY_TOO_COMPLEX', 'cost': self.cost, 'maxCost': self.max_cost}))
+
+    def add_cost(self, cost):
+        self.cost += cost
+        if self.cost > self.max_cost:
+            raise OverLimit
+
+    def reach_depth(self, depth):
+        if depth > self.depth:
+            self.depth = depth
+            if depth > self.max_depth:
+                raise OverLimit
+
+    def get_weight(self, parent_type, field_type, node):
+        """Return the rows per parent object a field loads, None for fields passing their parent's through."""
+        if parent_type.name in self.edge_types or is_connection(parent_type):
+            return None
+        named_type = get_named_type(field_type)
+        if is_connection(named_type):
+            self.edge_types.add(get_named_type(named_type.fields['edges'].type).name)
+            page_size = get_page_size(node)
+            return get_max_page_size() if page_size is None else page_size
+        key = f'{parent_type.name}.{node.name.value}'
+        if not is_list_type(get_nullable_type(field_type)):
+            return self.weights.get(key, 1)
+        page_size = get_page_size(node)
+        if page_size is not None:
+            return page_size
+        return self.weights.get(key, DEFAULT_LIST_WEIGHT)
+
+    def measure(self, selection_set, parent_type, rows, level, fragment_names):
+        """Return the (cost per object, depth) of a selection set on `rows` objects of `parent_type`.
+
+        Its fields are `level` deep in the operation. The running totals are
+        kept in `self.cost` and `self.depth`, and OverLimit is raised as soon
+        as either passes its limit. A fragment is not expanded again inside
+        itself, so cycles end; they are reported by the standard rules.
+        """
+        cost = depth = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                # Introspection reads the schema, not the database
+                if selection.name.value.startswith('__'):
+                    continue
+                field = getattr(parent_type, 'fields', {}).get(selection.name.value)
+                if field is None:
+                    continue
+                self.reach_depth(level)
+                field_depth = 1
+                if is_composite_type(get_named_type(field.type)) and selection.selection_set is not None:
+                    weight = self.get_weight(parent_type, field.type, selection)
+                    if weight is None:
+                        weight = 1
+                    else:
+                        cost += weight
+                        self.add_cost(rows * weight)
+                    child_cost, child_depth = self.measure(
+                        selection.selection_set, get_named_type(field.type), rows * weight, level + 1, fragment_names)
+                    cost += weight * child_cost
+                    field_depth += child_depth
+                depth = max(depth, field_depth)
+                continue
+            if isinstance(selection, InlineFragmentNode):
+                child_cost, child_depth = self.measure(
+                    selection.selection_set, parent_type, rows, level, fragment_names)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.context.get_fragment(name)
+                # Unknown fragments are reported by the standard rules
+                if fragment is None or name in fragment_names:
+                    continue
+                key = (name, parent_type.name)
+                if key in self.fragment_costs:
+                    child_cost, child_depth = self.fragment_costs[key]
+                    self.add_cost(rows * child_cost)
+                    self.reach_depth(level - 1 + child_depth)
+                else:
+                    child_cost, child_depth = self.measure(
+                        fragment.selection_set, parent_type, rows, level, fragment_names | {name})
+                    self.fragment_costs[key] = child_cost, child_depth
+            else:
+                continue
+            cost += child_cost
+            depth = max(depth, child_depth)
+        return cost, depth
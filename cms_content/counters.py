@@ -0,0 +1,141 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+# Write-behind view counting.
+#
+# Saving a row per hit would put every read behind a row lock, and the usual
+# read-increment-save loses updates under concurrency. Hits are instead added
+# up in process memory and written every few seconds by a background thread
+# with one `UPDATE ... SET views = views + n` per distinct n, so a flush costs a
+# handful of statements however many hits it carries. The thread starts with
+# the first hit of each process, forked workers included, and a request only
+# writes when the buffer is full. Hits still in the buffer when the process
+# dies are lost, which is acceptable for view counts.
+#
+# Flushes do not bump the version stamps: counts are approximate anyway, and
+# bumping would rebuild every cached response and menu every few seconds.
+
+
+class ViewCounter:
+    """Buffers view hits per model and row and flushes them with F() updates."""
+
+    field = 'views'
+    # Rows per UPDATE, inside SQLite's limit on query parameters
+    batch_size = 500
+
+    def __init__(self):
+        self._pending = defaultdict(Counter)
+        self._count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # The process the flush thread runs in
+        self._pid = None
+
+    @property
+    def flush_interval(self):
+        """Seconds between background flushes, None for no background thread."""
+        return getattr(settings, 'CMS_VIEW_COUNTER_FLUSH_INTERVAL', 5.0)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'CMS_VIEW_COUNTER_MAX_PENDING', 10000)
+
+    def hit(self, model, pk, count=1):
+        """Record `count` views of the `model` row `pk`."""
+        with self._lock:
+            self._pending[model][pk] += count
+            self._count += count
+            full = self._count >= self.max_pending
+        if full:
+            self.try_flush()
+        else:
+            self.start()
+
+    def start(self):
+        """Start the background flush thread of this process, unless it runs already."""
+        pid = os.getpid()
+        if self._pid == pid or self.flush_interval is None:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+        threading.Thread(target=self.run, name='view-counter-flush', daemon=True).start()
+
+    def run(self):
+        """Flush every flush_interval seconds, until the interval is set to None."""
+        while (interval := self.flush_interval) is not None:
+            time.sleep(interval)
+            self.try_flush()
+            close_old_connections()
+        self._pid = None
+
+    def pending(self, model, pk):
+        """Return the views of a row that have not been written yet."""
+        with self._lock:
+            return self._pending[model][pk] if model in self._pending else 0
+
+    def flush(self):
+        """Write the buffered hits and return the number of rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(Counter)
+                self._count = 0
+                self._last_flush = time.monotonic()
+            updated = 0
+            if not pending:
+                return updated
+            try:
+                with transaction.atomic():
+                    for model, counts in pending.items():
+                        updated += self.write(model, counts)
+            except Exception:
+                # Put the hits back so the next flush tries again
+                with self._lock:
+                    for model, counts in pending.items():
+                        self._pending[model].update(counts)
+                        self._count += sum(counts.values())
+                raise
+            return updated
+
+    def try_flush(self):
+        """Flush, logging a failure instead of raising it; the hits stay buffered for the next flush."""
+        try:
+            return self.flush()
+        except Exception:
+            logger.exception("Could not flush the view counter")
+            return 0
+
+    def write(self, model, counts):
+        by_count = defaultdict(list)
+        for pk, count in counts.items():
+            by_count[count].append(pk)
+        updated = 0
+        for count, pks in by_count.items():
+            for start in range(0, len(pks), self.batch_size):
+                rows = model._default_manager.filter(pk__in=pks[start:start + self.batch_size])
+                updated += rows.update(**{self.field: F(self.field) + count})
+        return updated
+
+    def clear(self):
+        """Drop the buffered hits without writing them."""
+        with self._lock:
+            self._pending = defaultdict(Counter)
+            self._count = 0
+
+
+view_counter = ViewCounter()
+
+
+atexit.register(view_counter.try_flush)
@@ -0,0 +1,49 @@
+import datetime
+import json
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# JSON encoders for the GraphQL endpoint.
+#
+# An encoder is a function `encode(value, pretty=False)` returning a str.
+# CMS_GRAPHQL_JSON_ENCODER names one by dotted path; left unset, responses are
+# encoded with orjson when it is installed and with the standard library
+# otherwise. Both write UUIDs as strings and dates and times in ISO 8601 with
+# their microseconds, so switching between them changes no value in a
+# response (orjson leaves non-ASCII characters unescaped).
+
+
+def encode_default(value):
+    """Encode the values the standard library has no JSON for, as orjson does."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_stdlib(value, pretty=False):
+    if pretty:
+        return json.dumps(value, sort_keys=True, indent=2, separators=(',', ': '), default=encode_default)
+    return json.dumps(value, separators=(',', ':'), default=encode_default)
+
+
+def encode_orjson(value, pretty=False):
+    option = orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS if pretty else 0
+    return orjson.dumps(value, option=option).decode()
+
+
+def get_encoder():
+    """Return the encoder set in CMS_GRAPHQL_JSON_ENCODER, or the fastest one installed."""
+    path = getattr(settings, 'CMS_GRAPHQL_JSON_ENCODER', None)
+    if path:
+        return import_string(path)
+    return encode_stdlib if orjson is None else encode_orjson
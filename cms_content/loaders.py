@@ -0,0 +1,183 @@
+from collections import defaultdict
+
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth import get_user_model
+
+from .models import Page, Link, Post, ancestor_slugs, subtree_filter
+
+
+# Per-request batching of relation lookups for the GraphQL schema.
+#
+# graphene-django resolves `fields = '__all__'` relations one row at a time, so
+# `allLinks { page { parent { title } } }` costs one query per link per level.
+# The loaders below collect the keys of every object a request has fetched so
+# far (priming) and load each relation for all of them with one `IN (...)`
+# query the first time any of them asks for it.
+
+
+class DataLoader:
+    """Cache and batch the lookups of one relation for a single request."""
+
+    # Value returned for keys the batch function did not find
+    default = None
+
+    def __init__(self, loaders):
+        self.loaders = loaders
+        self._cache = {}
+        self._queue = {}
+
+    def batch_load(self, keys):
+        """Return a dict mapping each found key to its value."""
+        raise NotImplementedError
+
+    def prime(self, keys):
+        # Queue keys so the next cache miss fetches them in the same query
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._queue[key] = None
+
+    def load(self, key):
+        if key is None:
+            return self.default
+        if key not in self._cache:
+            self._queue[key] = None
+            self.dispatch()
+        return self._cache[key]
+
+    def dispatch(self):
+        keys = list(self._queue)
+        self._queue.clear()
+        if not keys:
+            return
+        results = self.batch_load(keys)
+        for key in keys:
+            self._cache[key] = results.get(key, self.default)
+        self.loaders.register(v for value in results.values()
+                              for v in (value if isinstance(value, list) else [value]))
+
+
+class PageLoader(DataLoader):
+    """Page by id, used for `Page.parent` and `Link.page`."""
+
+    def batch_load(self, keys):
+        return {page.id: page for page in Page.objects.filter(id__in=keys)}
+
+
+class PageChildrenLoader(DataLoader):
+    """Child pages by parent id, used for `Page.children`."""
+
+    @property
+    def default(self):
+        return []
+
+    def batch_load(self, keys):
+        children = defaultdict(list)
+        for page in Page.objects.filter(parent_id__in=keys):
+            children[page.parent_id].append(page)
+        return children
+
+
+class PageLinkLoader(DataLoader):
+    """Link by page id, used for `Page.link`."""
+
+    def batch_load(self, keys):
+        return {link.page_id: link for link in Link.objects.filter(page_id__in=keys)}
+
+
+class PageAncestorsLoader(DataLoader):
+    """Pages above a page, root first, by the page's slug."""
+
+    @property
+    def default(self):
+        return []
+
+    def batch_load(self, keys):
+        wanted = {slug for key in keys for slug in ancestor_slugs(key)}
+        pages = {page.slug: page for page in Page.objects.filter(slug__in=wanted)}
+        return {key: [pages[slug] for slug in ancestor_slugs(key) if slug in pages] for key in keys}
+
+
+class PageDescendantsLoader(DataLoader):
+    """Pages below a page, each after its parent, by the page's slug."""
+
+    batch_size = 100
+
+    @property
+    def default(self):
+        return []
+
+    def batch_load(self, keys):
+        descendants = defaultdict(list)
+        keys = sorted(keys)
+        wanted = set(keys)
+        pages = {}
+        # One range per key, in batches that keep the OR chain short for SQLite
+        for start in range(0, len(keys), self.batch_size):
+            condition = reduce(or_, map(subtree_filter, keys[start:start + self.batch_size]))
+            pages.update((page.pk, page) for page in Page.objects.filter(condition))
+        for page in sorted(pages.values(), key=lambda page: (len(page.slug), page.slug)):
+            # A page sits below every requested slug it has as an ancestor
+            for slug in ancestor_slugs(page.slug):
+                if slug in wanted:
+                    descendants[slug].append(page)
+        return descendants
+
+
+class UserLoader(DataLoader):
+    """User by id, used for `Post.author`."""
+
+    def batch_load(self, keys):
+        return {user.id: user for user in get_user_model().objects.filter(id__in=keys)}
+
+
+class Loaders:
+    """The set of loaders belonging to one GraphQL request."""
+
+    def __init__(self):
+        self.page = PageLoader(self)
+        self.page_children = PageChildrenLoader(self)
+        self.page_link = PageLinkLoader(self)
+        self.page_ancestors = PageAncestorsLoader(self)
+        self.page_descendants = PageDescendantsLoader(self)
+        self.user = UserLoader(self)
+
+    def register(self, instances):
+        """Prime the loaders with the relation keys of freshly fetched objects."""
+        for instance in instances:
+            # Read through __dict__ so columns deferred by .only() stay unloaded
+            values = vars(instance)
+            if isinstance(instance, Page):
+                self.page.prime([values.get('parent_id')])
+                self.page_children.prime([instance.pk])
+                self.page_link.prime([instance.pk])
+                if 'slug' in values:
+                    self.page_ancestors.prime([values['slug']])
+                    self.page_descendants.prime([values['slug']])
+            elif isinstance(instance, Link):
+                self.page.prime([values.get('page_id')])
+            elif isinstance(instance, Post):
+                self.user.prime([values.get('author_id')])
+        return instances
+
+
+def get_loaders(info):
+    """Return the loaders for the request being resolved, creating them once."""
+    context = info.context
+    if context is None:
+        # No request to hang the cache on, so nothing can be shared
+        return Loaders()
+    loaders = getattr(context, 'cms_loaders', None)
+    if loaders is None:
+        loaders = Loaders()
+        setattr(context, 'cms_loaders', loaders)
+    return loaders
+
+
+def renew_loaders(info):
+    """Give the request being resolved empty loaders, dropping everything the old ones cached."""
+    loaders = Loaders()
+    if info.context is not None:
+        setattr(info.context, 'cms_loaders', loaders)
+    return loaders
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cms_content import snapshots
+
+
+class Command(BaseCommand):
+    help = "Write the published pages, menus and post listings to the snapshot directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help="Directory to write, defaults to CMS_SNAPSHOT_ROOT.")
+
+    def handle(self, root=None, **options):
+        root = root or snapshots.get_root()
+        if root is None:
+            raise CommandError("Set CMS_SNAPSHOT_ROOT or pass --root.")
+        start = time.perf_counter()
+        count = snapshots.build(root)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} files to {root} in {time.perf_counter() - start:.2f}s"))
@@ -0,0 +1,84 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Length
+
+from cms_content.models import Page, Link, Post, subtree_filter
+from cms_content.pagination import keyset_filter
+from cms_content.schema import LINK_ORDERINGS, PAGE_ORDERING, POST_ORDERING
+
+
+# Plan lines that are fine however big the table: lookups through an index,
+# and the FTS5 table, whose scans are index reads of its own
+INDEXED = ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY KEY', 'USING PRIMARY KEY',
+           'VIRTUAL TABLE')
+
+
+def get_querysets():
+    """Yield (label, queryset) for the query shapes the resolvers and caches run."""
+    page_size = 100 + 1
+
+    def keyset(queryset, ordering, values):
+        return queryset.filter(keyset_filter(ordering, values, forward=True)).order_by(*ordering)[:page_size]
+
+    yield 'allPages', Page.objects.order_by(*PAGE_ORDERING)[:page_size]
+    yield 'allPages after cursor', keyset(Page.objects.all(), PAGE_ORDERING, [0, 1])
+    for order, ordering in LINK_ORDERINGS.items():
+        links = Link.objects.filter(location='navbar')
+        cursor = [{'order': 0, 'label': 'a', 'id': 1}[name.lstrip('-')] for name in ordering]
+        yield f'allLinks({order.name})', Link.objects.order_by(*ordering)[:page_size]
+        yield f'allLinks(location, {order.name})', links.order_by(*ordering)[:page_size]
+        yield f'allLinks(location, {order.name}) after cursor', keyset(links, ordering, cursor)
+    yield 'allPosts', Post.objects.order_by(*POST_ORDERING)[:page_size]
+    created = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    yield 'allPosts after cursor', keyset(Post.objects.all(), POST_ORDERING, [created, 'a' * 32])
+    yield 'published posts', Post.objects.filter(status='published').order_by(*POST_ORDERING)[:page_size]
+    yield 'navigation', Link.objects.filter(location='navbar', status='published').order_by('order', 'id')
+    yield 'page children', Page.objects.filter(parent_id__in=[1, 2])
+    yield 'page link', Link.objects.filter(page_id__in=[1, 2])
+    yield 'post authors', get_user_model().objects.filter(id__in=[1, 2])
+    yield 'page by slug', Page.objects.filter(slug='about/team')
+    yield 'page ancestors', Page.objects.filter(slug__in=['about', 'about/team']).order_by(Length('slug'))
+    yield 'page descendants', Page.objects.filter(subtree_filter('about')).order_by(Length('slug'), 'slug')
+
+
+def get_full_scans(plan, limited=False):
+    """Return the lines of an EXPLAIN QUERY PLAN that read a whole table.
+
+    With `limited`, the query has a LIMIT: a scan without a sort then walks
+    the table in the requested order and stops early, while a sort still
+    reads every matching row and is flagged instead.
+    """
+    lines = [line.split(' ', 3)[-1] if line[:1].isdigit() else line for line in plan.splitlines()]
+    sorts = [detail for detail in lines if 'TEMP B-TREE' in detail]
+    if limited and not sorts:
+        return []
+    flagged = [detail for detail in lines
+               if detail.startswith('SCAN') and not any(marker in detail for marker in INDEXED)]
+    return flagged + sorts if limited else flagged
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN QUERY PLAN over the GraphQL resolver queries and flag full scans and sorts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan, not just flagged ones.")
+        parser.add_argument('--strict', action='store_true', help="Fail when any query is flagged.")
+
+    def handle(self, verbose_plans=False, strict=False, **options):
+        flagged = 0
+        for label, queryset in get_querysets():
+            plan = queryset.explain()
+            problems = get_full_scans(plan, limited=queryset.query.high_mark is not None)
+            if problems:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"{label}: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(f"{label}: ok")
+            if verbose_plans or problems:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+        if flagged and strict:
+            raise CommandError(f"{flagged} queries scan or sort whole tables.")
+        self.stdout.write(self.style.SUCCESS(f"{flagged} flagged queries."))
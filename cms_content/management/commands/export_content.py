@@ -0,0 +1,33 @@
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from cms_content.bulk import DEFAULT_CHUNK_SIZE, FIELDS, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = "Stream pages, links or posts out to a JSONL or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['pages', 'links', 'posts'])
+        parser.add_argument('path', help="File to write, or - for stdout.")
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help="Defaults to csv for .csv files and jsonl otherwise.")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, kind, path, format=None, chunk_size=DEFAULT_CHUNK_SIZE, **options):
+        format = format or ('csv' if path.endswith('.csv') else 'jsonl')
+        start = time.perf_counter()
+        stream = sys.stdout if path == '-' else Path(path).open('w', newline='', encoding='utf-8')
+        try:
+            count = write_rows(stream, export_rows(kind, chunk_size), format, FIELDS[kind])
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        seconds = time.perf_counter() - start
+        rate = count / seconds if seconds else 0.0
+        # Keep the report out of the data when it goes to stdout
+        report = self.stderr if path == '-' else self.stdout
+        report.write(self.style.SUCCESS(f"Exported {count} {kind} in {seconds:.2f}s, {rate:.0f} rows/s"))
@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from cms_content import snapshots
+from cms_content.bulk import DEFAULT_CHUNK_SIZE, BulkImportError, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import pages, links or posts from a JSONL or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['pages', 'links', 'posts'])
+        parser.add_argument('path', help="File to read, or - for stdin.")
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help="Defaults to csv for .csv files and jsonl otherwise.")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, kind, path, format=None, chunk_size=DEFAULT_CHUNK_SIZE, **options):
+        format = format or ('csv' if path.endswith('.csv') else 'jsonl')
+
+        def progress(result):
+            if options['verbosity'] > 1:
+                self.stdout.write(str(result))
+
+        stream = sys.stdin if path == '-' else Path(path).open(newline='', encoding='utf-8')
+        try:
+            result = import_rows(kind, read_rows(stream, format), chunk_size, progress)
+        except (BulkImportError, IntegrityError, ValueError) as error:
+            raise CommandError(error)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(f"Imported {kind}: {result}"))
+        # Imports send no signals, so the snapshot is rebuilt as a whole
+        if snapshots.get_root() is not None:
+            count = snapshots.build()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt the snapshot: {count} files"))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cms_content import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of pages and posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, chunk_size=1000, **options):
+        if not search.is_available():
+            raise CommandError("Full-text search needs SQLite with FTS5.")
+        start = time.perf_counter()
+        count = search.rebuild(chunk_size)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} pages and posts in {time.perf_counter() - start:.2f}s"))
@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def rebuild_page_slugs(apps, schema_editor):
+    # Page slugs are the materialized path of the page tree. Renames and moves
+    # made before the subtree cascade existed can have left them stale.
+    Page = apps.get_model('cms_content', 'Page')
+    Link = apps.get_model('cms_content', 'Link')
+    pages = {page.pk: page for page in Page.objects.only('title', 'slug', 'parent')}
+
+    def build_slug(page, seen=()):
+        parent = pages.get(page.parent_id)
+        if parent is None or parent.pk in seen:
+            return slugify(page.title)
+        return f"{build_slug(parent, (*seen, page.pk))}/{slugify(page.title)}"
+
+    changed = []
+    for page in pages.values():
+        slug = build_slug(page)
+        if page.slug != slug:
+            page.slug = slug
+            changed.append(page)
+    Page.objects.bulk_update(changed, ['slug'])
+    links = list(Link.objects.filter(page__in=changed).only('slug', 'page'))
+    for link in links:
+        link.slug = pages[link.page_id].slug
+    Link.objects.bulk_update(links, ['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms_content', '0003_rename_page_link_location_link_location_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_page_slugs, migrations.RunPython.noop),
+    ]
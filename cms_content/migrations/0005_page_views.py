@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms_content', '0004_rebuild_page_slugs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; elsewhere search falls back to the admin's LIKE lookups
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE cms_content_search USING fts5("
+        "kind UNINDEXED, object_id UNINDEXED, status UNINDEXED, title, content, meta, "
+        "tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO cms_content_search (kind, object_id, status, title, content, meta) "
+        "SELECT 'page', id, page_status, title, content, meta_keywords FROM cms_content_page"
+    )
+    schema_editor.execute(
+        "INSERT INTO cms_content_search (kind, object_id, status, title, content, meta) "
+        "SELECT 'post', post.id, post.status, post.title, post.excerpt || char(10) || post.content, "
+        "author.username || ' ' || post.meta_keywords "
+        "FROM cms_content_post post JOIN auth_user author ON author.id = post.author_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS cms_content_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('cms_content', '0005_page_views'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms_content', '0006_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['order'], name='link_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['location', 'order'], name='link_location_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='page',
+            index=models.Index(fields=['order'], name='page_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created', 'id'], name='post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'created', 'id'], name='post_status_created_idx'),
+        ),
+    ]
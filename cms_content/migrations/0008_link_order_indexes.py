@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms_content', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['label'], name='link_label_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['location', 'label'], name='link_location_label_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['location'], name='link_location_idx'),
+        ),
+    ]
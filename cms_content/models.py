@@ -1,13 +1,20 @@
 import uuid
+from functools import partial
 from typing import Optional
 
-from django.db import models
-from django.db.models import Manager
-from django.db.models.signals import post_save
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Manager, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Concat, Length, Substr
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 
+from .slugs import save_with_unique_slug
+from .versions import bump_version
+
 # Helper functions for the models:
 
 # Status choices:
@@ -26,6 +33,29 @@ LINK_LOCATION_CHOICES = [
     ('unsorted', 'Unsorted'),
 ]
 
+# Page fields mirrored onto the page's Link, and the Link fields they map to:
+PAGE_LINK_FIELDS = {
+    'title': 'label',
+    'slug': 'slug',
+    'page_link_location': 'location',
+    'page_status': 'status',
+    'order': 'order',
+}
+
+
+# The page tree is indexed by the hierarchical slugs themselves: a page's slug
+# is its materialized path ("about/team/jobs"), kept current on save and move
+# by Page.reslug_descendants().
+def ancestor_slugs(slug):
+    """Return the slugs of the pages above `slug`, root first."""
+    parts = slug.split('/')
+    return ['/'.join(parts[:depth]) for depth in range(1, len(parts))]
+
+
+def subtree_filter(slug, field='slug'):
+    # "/" < "0", so this range is every slug under `slug` and can use the index
+    return Q(**{f'{field}__gt': f'{slug}/', f'{field}__lt': f'{slug}0'})
+
 
 # The Page Model:
 class Page(models.Model):
@@ -38,6 +68,9 @@ class Page(models.Model):
     page_link_location = models.CharField(max_length=10, choices=LINK_LOCATION_CHOICES, default='unsorted')
     show_in_position = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
+    # Written in batches by cms_content.counters.view_counter
+    views = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
 
     # TODO metadata integration: metadata should be optional for each page. Here are only 3 simple fields.
     # SEO optimization idea: django-meta package.
@@ -45,25 +78,109 @@ class Page(models.Model):
     meta_description = models.TextField(blank=True)
     meta_keywords = models.CharField(max_length=255, blank=True)
 
+    class Meta:
+        indexes = [
+            # allPages pages through (order, id); the rowid makes up the id part
+            models.Index(fields=['order'], name='page_order_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
-    def save(self, *args, **kwargs):
+    def get_ancestors(self):
+        """Return the pages above this one, root first."""
+        return Page.objects.filter(slug__in=ancestor_slugs(self.slug)).order_by(Length('slug'))
+
+    def get_descendants(self):
+        """Return every page below this one, each after its parent."""
+        return Page.objects.filter(subtree_filter(self.slug)).order_by(Length('slug'), 'slug')
+
+    def get_breadcrumbs(self):
+        """Return the pages from the root down to and including this one."""
+        return Page.objects.filter(slug__in=[*ancestor_slugs(self.slug), self.slug]).order_by(Length('slug'))
+
+    def build_slug(self):
         if self.parent:
-            self.slug = f"{self.parent.slug}/{slugify(self.title)}"
-        else:
-            self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
+            return f"{self.parent.slug}/{slugify(self.title)}"
+        return slugify(self.title)
 
-        if not getattr(self, '_skip_link_update', False):
-            # Update or create the associated Link object
-            link, created = Link.objects.get_or_create(page=self)
-            link.label = self.title
-            link.slug = self.slug  # Use the page's slug for the link as well
-            link.location = self.page_link_location
-            link.status = self.page_status
-            link.order = self.order
-            link.save()
+    def moves_below_itself(self):
+        """Return whether the parent is this page or a page below it, which would make the tree a cycle."""
+        if self._state.adding or self.parent_id is None:
+            return False
+        if self.parent_id == self.pk:
+            return True
+        # The slugs as stored, the ones in memory may be stale
+        slug = Page.objects.filter(pk=self.pk).values('slug')[:1]
+        return Page.objects.filter(
+            pk=self.parent_id, slug__startswith=Concat(Subquery(slug), Value('/'), output_field=models.CharField()),
+        ).exists()
+
+    def clean(self):
+        super().clean()
+        if self.moves_below_itself():
+            raise ValidationError({'parent': "A page cannot move below itself."})
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if (update_fields is None or 'parent' in update_fields) and self.moves_below_itself():
+            raise ValidationError(f"Page '{self.title}' cannot move below itself.")
+        old_slug = self.slug
+        self.slug = self.build_slug()
+        if update_fields is not None and {'title', 'parent'} & set(update_fields):
+            kwargs['update_fields'] = update_fields = {*update_fields, 'slug'}
+        created = self._state.adding
+        # The page and its link are written together or not at all
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if not getattr(self, '_skip_link_update', False):
+                self.sync_link(created, update_fields)
+            if (not created and old_slug and old_slug != self.slug
+                    and (update_fields is None or 'slug' in update_fields)):
+                self.reslug_descendants(old_slug)
+
+    def reslug_descendants(self, old_slug):
+        """Move the slugs of every page below this one, and of their links, from `old_slug` to `self.slug`.
+
+        Descendant slugs all start with "<old_slug>/", so the whole subtree is
+        rewritten by two UPDATE statements however deep or wide it is.
+        Returns the number of pages updated.
+        """
+        descendants = Page.objects.filter(subtree_filter(old_slug))
+        now = timezone.now()
+        count = descendants.update(slug=Concat(Value(self.slug), Substr('slug', len(old_slug) + 1)), updated=now)
+        if count:
+            Link.objects.filter(subtree_filter(self.slug, 'page__slug')).update(
+                slug=Subquery(Page.objects.filter(pk=OuterRef('page_id')).values('slug')[:1]), updated=now)
+            # update() sends no signals
+            bump_version(Page, Link)
+        return count
+
+    def sync_link(self, created=False, update_fields=None):
+        """Create or update the associated Link, writing only the fields that changed."""
+        fields = {page_field: link_field for page_field, link_field in PAGE_LINK_FIELDS.items()
+                  if update_fields is None or page_field in update_fields}
+        if not fields:
+            return
+        # A page that was just inserted cannot have a link yet
+        link = None if created else Link.objects.filter(page=self).first()
+        if link is None:
+            link = Link(page=self, **{link_field: getattr(self, page_field)
+                                      for page_field, link_field in PAGE_LINK_FIELDS.items()})
+            changed = None
+        else:
+            changed = [link_field for page_field, link_field in fields.items()
+                       if getattr(link, link_field) != getattr(self, page_field)]
+            if not changed:
+                return
+            for page_field, link_field in fields.items():
+                setattr(link, link_field, getattr(self, page_field))
+        # The link already matches this page, so it must not write back to it
+        link._skip_page_update = True
+        try:
+            link.save(update_fields=changed)
+        finally:
+            link._skip_page_update = False
 
 
 class Link(models.Model):
@@ -74,20 +191,34 @@ class Link(models.Model):
     location = models.CharField(max_length=10, choices=LINK_LOCATION_CHOICES, default='unsorted')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
     order = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
 
     objects: Manager
 
+    class Meta:
+        indexes = [
+            # One index per LinkOrder sort key, with and without a location
+            # filter; the rowid supplies the id tie-breaker. The menus read
+            # links in (order, id) order too.
+            models.Index(fields=['order'], name='link_order_idx'),
+            models.Index(fields=['location', 'order'], name='link_location_order_idx'),
+            models.Index(fields=['label'], name='link_label_idx'),
+            models.Index(fields=['location', 'label'], name='link_location_label_idx'),
+            models.Index(fields=['location'], name='link_location_idx'),
+        ]
+
     def __str__(self):
         return self.label
 
     def save(self, *args, **kwargs):
         if not self.label:  # Only set the label if it's not already set
             self.label = self.page.title if self.page else ''
-        if not self.slug:  # Only generate the slug if it's not already set
-            self.slug = slugify(self.label)
-            while Link.objects.filter(slug=self.slug).exists():
-                self.slug = f"{slugify(self.label)}-{uuid.uuid4().hex[:8]}"
-        super().save(*args, **kwargs)
+        # Keeps the page update made by update_page_from_link in the same transaction
+        with transaction.atomic(savepoint=False):
+            if not self.slug:  # Only generate the slug if it's not already set
+                save_with_unique_slug(self, slugify(self.label), partial(super().save, *args, **kwargs))
+            else:
+                super().save(*args, **kwargs)
 
 
 # The Post Model:
@@ -109,7 +240,7 @@ class Post(models.Model):
     #feature_image = models.ImageField(upload_to='uploads/%Y/%m/%d/', blank=True, null=True)
     #TODO Think about tags implementation
     #tags = models.ManyToManyField('Tag', blank=True)
-    #TODO Implement views counter (global in this model and reuse it in other models)
+    # Written in batches by cms_content.counters.view_counter
     views = models.PositiveIntegerField(default=0)
 
     # TODO metadata integration: metadata should be optional for each post. Here are only 3 simple fields.
@@ -118,6 +249,13 @@ class Post(models.Model):
     meta_description = models.TextField(blank=True)
     meta_keywords = models.CharField(max_length=255, blank=True)
 
+    class Meta:
+        indexes = [
+            # Posts are listed newest first; the id is a UUID, so it is spelled out
+            models.Index(fields=['created', 'id'], name='post_created_idx'),
+            models.Index(fields=['status', 'created', 'id'], name='post_status_created_idx'),
+        ]
+
     #Function to get the string representation of the post by its title
     def __str__(self):
         return self.title
@@ -129,21 +267,45 @@ class Post(models.Model):
     #Function to save the post with a slug if it does not have one
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.title)
-            while Post.objects.filter(slug=self.slug).exists():
-                self.slug = f"{slugify(self.title)}-{str(uuid.uuid4().hex[:8])}"
-        super().save(*args, **kwargs)
+            save_with_unique_slug(self, slugify(self.title), partial(super().save, *args, **kwargs))
+        else:
+            super().save(*args, **kwargs)
 
 
 @receiver(post_save, sender=Link)
-def update_page_from_link(sender, instance, **kwargs):
-    if instance.page:
-        instance.page.title = instance.label
-        instance.page.slug = instance.slug
-        if not instance.page.page_link_location:
-            instance.page.page_link_location = instance.location
-        if not instance.page.page_status:
-            instance.page.page_status = instance.status
-        instance.page.order = instance.order
-        instance.page._skip_link_update = True
-        instance.page.save()
+def update_page_from_link(sender, instance, update_fields=None, **kwargs):
+    if getattr(instance, '_skip_page_update', False) or instance.page_id is None:
+        return
+    if update_fields is not None and not {'label', 'order', 'location', 'status', 'page'} & set(update_fields):
+        return
+    page = instance.page
+    values = {'title': instance.label, 'order': instance.order}
+    if not page.page_link_location:
+        values['page_link_location'] = instance.location
+    if not page.page_status:
+        values['page_status'] = instance.status
+    changed = [field for field, value in values.items() if getattr(page, field) != value]
+    if not changed:
+        return
+    for field in changed:
+        setattr(page, field, values[field])
+    page._skip_link_update = True
+    try:
+        page.save(update_fields=changed)
+    finally:
+        page._skip_link_update = False
+    if instance.slug != page.slug:
+        # A new title moved the page, and the link follows its slug
+        instance.slug = page.slug
+        Link.objects.filter(pk=instance.pk).update(slug=page.slug, updated=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Page)
+@receiver([post_save, post_delete], sender=Link)
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender='auth.User')
+def bump_content_version(sender, **kwargs):
+    # Bump right away so this process stops serving stale data, and again on
+    # commit so nothing cached from the old rows in between survives
+    bump_version(sender)
+    transaction.on_commit(lambda: bump_version(sender))
@@ -0,0 +1,78 @@
+import threading
+from collections import namedtuple
+
+from django.db.models import F
+
+from .models import Page, Link, LINK_LOCATION_CHOICES, ancestor_slugs
+from .versions import get_versions
+
+
+# Materialized navigation menus.
+#
+# Each link location (navbar, header, ...) is turned into a tree of published
+# links, nested along the Page hierarchy, and kept in process memory. A tree is
+# tagged with the Page and Link version stamps it was built from; saving or
+# deleting either model bumps those stamps (see models.py), so the next read
+# rebuilds just the location being asked for. Serving a menu costs a version
+# check in the cache and no queries.
+
+NavigationItem = namedtuple('NavigationItem', ('id', 'label', 'slug', 'url', 'order', 'page_id', 'children'))
+
+LINK_LOCATIONS = [location for location, _ in LINK_LOCATION_CHOICES]
+
+
+def build_navigation(location):
+    """Return the top-level NavigationItems of the published links in `location`."""
+    # A page's slug is its path, so the ancestors of the linked pages are known
+    # without reading the rest of the Page table
+    links = list(
+        Link.objects.filter(location=location, status='published')
+        .only('id', 'label', 'slug', 'url', 'order', 'page_id')
+        .annotate(page_slug=F('page__slug'))
+        .order_by('order', 'id')
+    )
+    items = {}
+    page_items = {}
+    for link in links:
+        items[link.id] = NavigationItem(link.id, link.label, link.slug, link.url, link.order, link.page_id, [])
+        if link.page_slug is not None:
+            page_items[link.page_slug] = items[link.id]
+
+    roots = []
+    for link in links:
+        # Nest under the closest ancestor page that has a link in this menu
+        parent_item = None
+        if link.page_slug is not None:
+            for slug in reversed(ancestor_slugs(link.page_slug)):
+                parent_item = page_items.get(slug)
+                if parent_item is not None:
+                    break
+        (parent_item.children if parent_item is not None else roots).append(items[link.id])
+    return roots
+
+
+class NavigationTrees:
+    """The navigation trees of this process, one per link location."""
+
+    def __init__(self):
+        self._trees = {}
+        self._lock = threading.Lock()
+
+    def get(self, location):
+        if location not in LINK_LOCATIONS:
+            raise ValueError(f"Unknown link location: {location}")
+        version = tuple(get_versions([Page, Link]))
+        tree = self._trees.get(location)
+        if tree is not None and tree[0] == version:
+            return tree[1]
+        with self._lock:
+            items = build_navigation(location)
+            self._trees[location] = (version, items)
+        return items
+
+    def clear(self):
+        with self._lock:
+            self._trees.clear()
+
+
+navigation_trees = NavigationTrees()
@@ -0,0 +1,121 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.registry import get_global_registry
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+# Selection-set driven queryset optimisation for the GraphQL resolvers.
+#
+# The fields a client asks for are mapped back onto the model: plain columns
+# become `.only()`, forward foreign keys are joined with `select_related()`, and
+# reverse relations get a `Prefetch` whose queryset is optimised the same way
+# for the nested selection. Reverse one-to-ones are prefetched rather than
+# joined because Django mixes up the `.only()` masks when the same model shows
+# up twice in one join (`Link -> page -> link`). Computed fields load the
+# columns their type lists for them in `field_columns`.
+
+
+def get_computed_columns(model, name):
+    """Return the columns a computed field of `model`'s GraphQL type reads."""
+    graphene_type = get_global_registry().get_type_for_model(model)
+    return getattr(graphene_type, 'field_columns', {}).get(name, ())
+
+
+def get_field_nodes(selection_set, fragments):
+    """Yield the field nodes of a selection set, expanding any fragments."""
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments[selection.name.value]
+            yield from get_field_nodes(fragment.selection_set, fragments)
+        elif isinstance(selection, InlineFragmentNode):
+            yield from get_field_nodes(selection.selection_set, fragments)
+
+
+class Scope:
+    """The model reached at `prefix` and the queryset options collected for it."""
+
+    def __init__(self, model, only=(), via=None, parent=None):
+        self.model = model
+        self.prefix = ''
+        self.only = set(only)
+        self.select = set()
+        self.prefetch = []
+        # The relation followed to get here and the scope it was followed from
+        self.via = via
+        self.parent = parent
+
+    def enter(self, field):
+        """Return the scope of a relation joined into this queryset."""
+        scope = Scope(field.related_model, via=field, parent=self)
+        scope.prefix = self.prefix + field.name + '__'
+        scope.only, scope.select, scope.prefetch = self.only, self.select, self.prefetch
+        return scope
+
+
+class QueryOptimizer:
+    def __init__(self, fragments):
+        self.fragments = fragments
+
+    def optimize(self, queryset, field_nodes, scope=None):
+        scope = scope or Scope(queryset.model)
+        self.plan(scope, field_nodes)
+        if scope.select:
+            queryset = queryset.select_related(*sorted(scope.select))
+        if scope.prefetch:
+            queryset = queryset.prefetch_related(*scope.prefetch)
+        if scope.only:
+            queryset = queryset.only(*sorted(scope.only))
+        return queryset
+
+    def plan(self, scope, field_nodes):
+        for node in field_nodes:
+            for child in get_field_nodes(node.selection_set, self.fragments):
+                self.plan_field(scope, child)
+
+    def plan_field(self, scope, node):
+        name = to_snake_case(node.name.value)
+        try:
+            field = scope.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Computed fields and __typename have no column behind them
+            scope.only.update(scope.prefix + column for column in get_computed_columns(scope.model, name))
+            return
+        if field.one_to_one and scope.via is not None and field.remote_field is scope.via:
+            # Following a one-to-one back leads to the object we came from,
+            # which Django has already cached, so its columns belong out there
+            self.plan(scope.parent, [node])
+            return
+        path = scope.prefix + field.name
+        if not field.is_relation:
+            scope.only.add(path)
+        elif field.auto_created or field.many_to_many:
+            queryset = field.related_model._default_manager.all()
+            # The prefetch needs the foreign key back to us to match rows up
+            required = [] if field.many_to_many else [field.field.name]
+            inner = Scope(queryset.model, only=required, via=field, parent=scope)
+            scope.prefetch.append(Prefetch(path, queryset=self.optimize(queryset, [node], inner)))
+        else:
+            scope.select.add(path)
+            scope.only.add(path)
+            self.plan(scope.enter(field), [node])
+
+
+def optimize(queryset, info, path=(), required=()):
+    """Restrict and join `queryset` to what the field being resolved selects.
+
+    `path` names the fields between the resolved field and the objects of
+    `queryset`, e.g. ('edges', 'node') for a connection. `required` columns are
+    always loaded.
+    """
+    field_nodes = info.field_nodes
+    for name in path:
+        field_nodes = [child for node in field_nodes
+                       for child in get_field_nodes(node.selection_set, info.fragments)
+                       if child.name.value == name]
+    scope = Scope(queryset.model, only=required)
+    return QueryOptimizer(info.fragments).optimize(queryset, field_nodes, scope)
@@ -0,0 +1,171 @@
+import base64
+import binascii
+import datetime
+import json
+import math
+import uuid
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from graphene.relay import PageInfo
+from graphene_django import settings as graphene_django_settings
+from graphql import GraphQLError
+
+
+# Keyset (cursor) pagination for the Relay connections in the schema.
+#
+# A cursor holds the values of the ordering columns of the last row a client
+# has seen, so the next page is a `WHERE (order, id) > (...) LIMIT n` query that
+# costs the same however deep into the table it starts.
+
+
+def get_max_page_size():
+    # Looked up through the module because override_settings swaps the object
+    return graphene_django_settings.graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+
+
+def parse_ordering(ordering):
+    """Turn ('-created', 'id') into [('created', True), ('id', False)]."""
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        # Full precision, DjangoJSONEncoder would cut microseconds off
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(instance, ordering):
+    return encode_key([getattr(instance, name) for name, _ in parse_ordering(ordering)])
+
+
+def encode_key(values):
+    """Return the cursor of the row with the given ordering values."""
+    values = [encode_value(value) for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, ordering, model):
+    """Return the ordering values in `cursor`, as the Python values of `model`'s fields."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise GraphQLError(f"Invalid cursor: {cursor}")
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise GraphQLError(f"Invalid cursor: {cursor}")
+    fields = [model._meta.get_field(name) for name, _ in parse_ordering(ordering)]
+    # A cursor that decodes can still hold values the columns cannot take,
+    # which would surface as a database or validation error in the query
+    # json.loads() reads Infinity and NaN, which no column holds
+    if not all(isinstance(value, (str, int, float)) and (not isinstance(value, float) or math.isfinite(value))
+               for value in values):
+        raise GraphQLError(f"Invalid cursor: {cursor}")
+    try:
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, OverflowError, TypeError):
+        raise GraphQLError(f"Invalid cursor: {cursor}")
+
+
+def keyset_filter(ordering, values, forward, inclusive=False):
+    """Match the rows after (or before) the row with the given ordering values, and that row if `inclusive`."""
+    condition = Q()
+    equal = {}
+    columns = parse_ordering(ordering)
+    for index, ((name, descending), value) in enumerate(zip(columns, values)):
+        lookup = 'lt' if descending == forward else 'gt'
+        if inclusive and index == len(columns) - 1:
+            lookup += 'e'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+class StreamedEdges:
+    """The edges of a page, reading its rows `chunk_size` at a time as they are iterated.
+
+    `keys` are the ordering values of the page's rows, in order, so the rows
+    are the ones between its first and its last key.
+    """
+
+    def __init__(self, queryset, connection_type, ordering, keys, chunk_size, on_fetch=None):
+        self.queryset = queryset
+        self.connection_type = connection_type
+        self.ordering = ordering
+        self.keys = keys
+        self.chunk_size = chunk_size
+        self.on_fetch = on_fetch
+
+    def __iter__(self):
+        if not self.keys:
+            return
+        queryset = self.queryset.filter(
+            keyset_filter(self.ordering, self.keys[0], forward=True, inclusive=True),
+            keyset_filter(self.ordering, self.keys[-1], forward=False, inclusive=True),
+        ).order_by(*self.ordering)
+        rows = queryset[:len(self.keys)].iterator(chunk_size=self.chunk_size)
+        while chunk := list(islice(rows, self.chunk_size)):
+            if self.on_fetch is not None:
+                self.on_fetch(chunk)
+            for row in chunk:
+                yield self.connection_type.Edge(node=row, cursor=encode_cursor(row, self.ordering))
+
+
+def paginate(queryset, connection_type, ordering, first=None, after=None, last=None, before=None,
+             on_fetch=None, chunk_size=None):
+    """Return one page of `queryset` as an instance of `connection_type`.
+
+    `ordering` must end in a unique column so every row has a distinct cursor.
+    With `chunk_size` only the ordering values of the page are read here, and
+    its edges are StreamedEdges.
+    """
+    if first is not None and last is not None:
+        raise GraphQLError("Pass either first or last, not both.")
+    for name, value in (('first', first), ('last', last)):
+        if value is not None and value < 0:
+            raise GraphQLError(f"Argument '{name}' must be a non-negative integer.")
+
+    max_page_size = get_max_page_size()
+    size = last if last is not None else first
+    limit = max_page_size if size is None else min(size, max_page_size)
+    backward = last is not None
+
+    page = queryset
+    if after:
+        page = page.filter(keyset_filter(ordering, decode_cursor(after, ordering, queryset.model), forward=True))
+    if before:
+        page = page.filter(keyset_filter(ordering, decode_cursor(before, ordering, queryset.model), forward=False))
+    if backward:
+        # Walk backwards from `before` and flip the page round afterwards
+        page = page.order_by(*[name[1:] if name.startswith('-') else f'-{name}' for name in ordering])
+    else:
+        page = page.order_by(*ordering)
+    if chunk_size is not None:
+        # Prefetches need model instances, and the rows are read later anyway
+        page = page.prefetch_related(None).values_list(*[name for name, _ in parse_ordering(ordering)])
+
+    # One extra row tells us whether there is another page
+    rows = list(page[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+
+    if chunk_size is not None:
+        edges = StreamedEdges(queryset, connection_type, ordering, rows, chunk_size, on_fetch)
+        cursors = [encode_key(rows[0]), encode_key(rows[-1])] if rows else [None, None]
+    else:
+        if on_fetch is not None:
+            on_fetch(rows)
+        edges = [connection_type.Edge(node=row, cursor=encode_cursor(row, ordering)) for row in rows]
+        cursors = [edges[0].cursor, edges[-1].cursor] if edges else [None, None]
+    page_info = PageInfo(
+        start_cursor=cursors[0],
+        end_cursor=cursors[-1],
+        has_previous_page=has_more if backward else bool(after),
+        has_next_page=bool(before) if backward else has_more,
+    )
+    return connection_type(edges=edges, page_info=page_info)
@@ -0,0 +1,150 @@
+import logging
+import time
+from collections import defaultdict, namedtuple
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from graphql import get_named_type, is_leaf_type
+
+logger = logging.getLogger(__name__)
+
+
+# Per-operation SQL and resolver profiling for the GraphQL endpoint.
+#
+# While an operation runs, every statement sent to any database goes through
+# `OperationProfile.record_query` (a connection execute wrapper) and every
+# field returning objects through `ProfilingMiddleware`, which keeps track of
+# the field being resolved so each query is charged to it. The same SQL sent
+# more than once is reported as repeated: with the loaders batching every
+# relation that should not happen, so a repeat usually means an N+1 crept in.
+# Scalar fields are not timed, as most just read an attribute.
+
+RecordedQuery = namedtuple('RecordedQuery', ('sql', 'params', 'duration', 'field'))
+
+# Charged with the queries run outside any resolver, e.g. by the response cache
+OPERATION_FIELD = '(operation)'
+
+
+def is_enabled():
+    return getattr(settings, 'CMS_GRAPHQL_PROFILE', settings.DEBUG)
+
+
+def exposes_extensions():
+    """Whether profiles, SQL included, go out in the response `extensions`."""
+    return getattr(settings, 'CMS_GRAPHQL_PROFILE_EXTENSIONS', settings.DEBUG)
+
+
+def get_field_path(path):
+    """Turn a response path into 'allPages.edges.node.children', leaving list indices out."""
+    return '.'.join(key for key in path.as_list() if isinstance(key, str))
+
+
+def to_ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+class OperationProfile:
+    """The queries and resolver timings of one GraphQL operation."""
+
+    def __init__(self, operation_name=None):
+        self.operation_name = operation_name
+        self.cached = False
+        self.queries = []
+        # Field path -> [calls, seconds, queries]
+        self.fields = defaultdict(lambda: [0, 0.0, 0])
+        self._stack = []
+        self._start = time.perf_counter()
+        self._end = None
+
+    @property
+    def duration(self):
+        return (self._end or time.perf_counter()) - self._start
+
+    @contextmanager
+    def capture(self):
+        """Record the queries sent to every database while the block runs."""
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self.record_query))
+            try:
+                yield self
+            finally:
+                self._end = time.perf_counter()
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            field = self._stack[-1] if self._stack else OPERATION_FIELD
+            self.queries.append(RecordedQuery(sql, params, time.perf_counter() - start, field))
+            self.fields[field][2] += 1
+
+    @contextmanager
+    def resolving(self, field):
+        self._stack.append(field)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            stats = self.fields[field]
+            stats[0] += 1
+            stats[1] += time.perf_counter() - start
+
+    def get_repeated_queries(self):
+        """Return the SQL sent more than once, most repeated first."""
+        groups = defaultdict(list)
+        for query in self.queries:
+            groups[query.sql].append(query)
+        repeated = [
+            {
+                'sql': sql,
+                'count': len(queries),
+                # Same parameters too, so the rows were already at hand
+                'identical': len(queries) - len({repr(query.params) for query in queries}),
+                'time': to_ms(sum(query.duration for query in queries)),
+                'fields': sorted({query.field for query in queries}),
+            }
+            for sql, queries in groups.items() if len(queries) > 1
+        ]
+        return sorted(repeated, key=lambda group: -group['count'])
+
+    def summary(self):
+        return {
+            'operation': self.operation_name,
+            'cached': self.cached,
+            'duration': to_ms(self.duration),
+            'sql': {
+                'count': len(self.queries),
+                'time': to_ms(sum(query.duration for query in self.queries)),
+                'repeated': self.get_repeated_queries(),
+            },
+            'fields': [
+                {'path': path, 'calls': calls, 'time': to_ms(seconds), 'queries': queries}
+                for path, (calls, seconds, queries) in sorted(self.fields.items(), key=lambda item: -item[1][1])
+            ],
+        }
+
+    def log(self, summary=None):
+        summary = summary or self.summary()
+        sql = summary['sql']
+        logger.info("GraphQL %s: %d queries, %.1f ms SQL, %.1f ms total",
+                    self.operation_name or 'operation', sql['count'], sql['time'], summary['duration'],
+                    extra={'graphql_profile': summary})
+        for group in sql['repeated']:
+            logger.warning("GraphQL %s: query ran %d times from %s: %s",
+                           self.operation_name or 'operation', group['count'], ', '.join(group['fields']),
+                           group['sql'], extra={'graphql_repeated_query': group})
+
+
+class ProfilingMiddleware:
+    """Graphene middleware timing the fields that return objects into the request's profile."""
+
+    def resolve(self, next, root, info, **kwargs):
+        profile = getattr(info.context, 'graphql_profile', None)
+        if profile is None or is_leaf_type(get_named_type(info.return_type)):
+            return next(root, info, **kwargs)
+        with profile.resolving(get_field_path(info.path)):
+            return next(root, info, **kwargs)
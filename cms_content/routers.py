@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Read/write splitting for the content models.
+#
+# `replica` is a second, query-only connection to the same SQLite file (see
+# DATABASES). With WAL, readers on it never wait for the writer on `default`
+# and see every write committed before their query starts, so sending reads
+# there keeps long list queries from queueing behind editors' saves. Reads in
+# a transaction on `default` stay there, as they must see its own writes.
+
+
+class ReadReplicaRouter:
+    """Route reads of the CMS models to the `replica` connection when it is configured."""
+
+    replica = 'replica'
+    app_labels = frozenset({'cms_content'})
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.app_labels or self.replica not in settings.DATABASES:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return self.replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both connections open the same database
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, self.replica}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        return False if db == self.replica else None
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import threading
+from collections import namedtuple
+
+from .models import Page, Link
+from .versions import get_versions
+
+
+# In-memory route table.
+#
+# Maps the slug of every published page and published link to what it points
+# at, so resolving a URL path is a dict lookup. Like the navigation trees, the
+# table is tagged with the Page and Link version stamps it was built from and
+# rebuilt on the first lookup after a save or delete bumps them.
+
+Route = namedtuple('Route', ('type', 'id', 'slug', 'title', 'url', 'page_id', 'etag'))
+
+
+def normalize_path(path):
+    """Turn a URL path like '/about/team/' into the slug 'about/team'."""
+    return path.strip('/')
+
+
+def route_payload(route):
+    return {'type': route.type, 'id': route.id, 'slug': route.slug, 'title': route.title, 'url': route.url}
+
+
+def make_route(type, id, slug, title, url, page_id):
+    route = Route(type, id, slug, title, url, page_id, None)
+    payload = json.dumps(route_payload(route), sort_keys=True)
+    return route._replace(etag=hashlib.md5(payload.encode()).hexdigest())
+
+
+def build_routes():
+    """Return a dict of slug -> Route for the published pages and links."""
+    routes = {}
+    # Standalone links first so a page always wins over a link with its slug
+    links = (Link.objects.filter(status='published', page__isnull=True)
+             .values_list('id', 'slug', 'label', 'url'))
+    for id, slug, label, url in links.iterator():
+        routes[slug] = make_route('link', id, slug, label, url, None)
+    pages = Page.objects.filter(page_status='published').values_list('id', 'slug', 'title', 'url')
+    for id, slug, title, url in pages.iterator():
+        routes[slug] = make_route('page', id, slug, title, url, id)
+    return routes
+
+
+class RouteTable:
+    """The slug routes of this process."""
+
+    def __init__(self):
+        self._routes = None
+        self._lock = threading.Lock()
+
+    def get_routes(self):
+        version = tuple(get_versions([Page, Link]))
+        routes = self._routes
+        if routes is not None and routes[0] == version:
+            return routes[1]
+        with self._lock:
+            routes = (version, build_routes())
+            self._routes = routes
+        return routes[1]
+
+    def get(self, path):
+        """Return the Route published at `path`, or None."""
+        return self.get_routes().get(normalize_path(path))
+
+    def clear(self):
+        with self._lock:
+            self._routes = None
+
+
+route_table = RouteTable()
@@ -1,63 +1,225 @@
 import graphene
+from django.contrib.auth import get_user_model
 from graphene_django import DjangoObjectType
+from graphql import GraphQLError
+from .loaders import get_loaders, renew_loaders
 from .models import Page, Link, Post
+from . import search
+from .navigation import LINK_LOCATIONS, navigation_trees
+from .optimizer import optimize
+from .pagination import get_max_page_size, paginate, parse_ordering
+from .routes import route_table
+from .streaming import get_stream_chunk_size
 
 
 # Define the types for the models
+class UserType(DjangoObjectType):
+    class Meta:
+        model = get_user_model()
+        fields = ('id', 'username', 'first_name', 'last_name')
+
+
 class PageType(DjangoObjectType):
     class Meta:
         model = Page
         fields = '__all__'
 
+    ancestors = graphene.List(graphene.NonNull(lambda: PageType), required=True)
+    descendants = graphene.List(graphene.NonNull(lambda: PageType), required=True)
+    breadcrumbs = graphene.List(graphene.NonNull(lambda: PageType), required=True)
+
+    # Columns the optimizer must load for the computed fields
+    field_columns = {name: ('slug',) for name in ('ancestors', 'descendants', 'breadcrumbs')}
+
+    # Relations already joined or prefetched by the optimizer are used as-is,
+    # anything else goes through the request's loaders so it is fetched in batches
+    def resolve_parent(self, info):
+        if Page.parent.is_cached(self):
+            return self.parent
+        return get_loaders(info).page.load(self.parent_id)
+
+    def resolve_children(self, info):
+        if 'children' in getattr(self, '_prefetched_objects_cache', {}):
+            return self.children.all()
+        return get_loaders(info).page_children.load(self.id)
+
+    def resolve_link(self, info):
+        if Page.link.is_cached(self):
+            return getattr(self, 'link', None)
+        return get_loaders(info).page_link.load(self.id)
+
+    # The tree fields read the slug index, batched across the request's pages
+    def resolve_ancestors(self, info):
+        return get_loaders(info).page_ancestors.load(self.slug)
+
+    def resolve_descendants(self, info):
+        return get_loaders(info).page_descendants.load(self.slug)
+
+    def resolve_breadcrumbs(self, info):
+        return [*get_loaders(info).page_ancestors.load(self.slug), self]
+
 
 class LinkType(DjangoObjectType):
     class Meta:
         model = Link
         fields = '__all__'
 
+    def resolve_page(self, info):
+        if Link.page.is_cached(self):
+            return self.page
+        return get_loaders(info).page.load(self.page_id)
+
 
 class PostType(DjangoObjectType):
     class Meta:
         model = Post
         fields = '__all__'
 
+    def resolve_author(self, info):
+        if Post.author.is_cached(self):
+            return self.author
+        return get_loaders(info).user.load(self.author_id)
 
-# Define the query class
-def resolve_all_pages(info, **kwargs):
-    return Page.objects.all()
 
+class NavigationItemType(graphene.ObjectType):
+    # Read from Link and Page rows, which the response cache needs to know
+    source_models = (Link, Page)
+
+    id = graphene.ID(required=True)
+    label = graphene.String(required=True)
+    slug = graphene.String(required=True)
+    url = graphene.String()
+    order = graphene.Int(required=True)
+    page_id = graphene.ID()
+    children = graphene.List(graphene.NonNull(lambda: NavigationItemType), required=True)
 
-def resolve_all_links(info, **kwargs):
-    return Link.objects.all()
 
+class SearchResultType(graphene.ObjectType):
+    source_models = (Page, Post)
 
-def resolve_all_posts(info, **kwargs):
-    return Post.objects.all()
+    kind = graphene.String(required=True)
+    rank = graphene.Float(required=True)
+    snippet = graphene.String(required=True)
+    page = graphene.Field(PageType)
+    post = graphene.Field(PostType)
 
 
+# Define the connections for the list fields
+class PageConnection(graphene.relay.Connection):
+    class Meta:
+        node = PageType
+
+
+class LinkConnection(graphene.relay.Connection):
+    class Meta:
+        node = LinkType
+
+
+class PostConnection(graphene.relay.Connection):
+    class Meta:
+        node = PostType
+
+
+# Keyset orderings, each ending in a unique column so cursors are stable
+PAGE_ORDERING = ('order', 'id')
+LINK_ORDERING = ('order', 'id')
+POST_ORDERING = ('-created', '-id')
+
+
+def resolve_connection(info, queryset, connection_type, ordering, **kwargs):
+    required = [name for name, _ in parse_ordering(ordering)]
+    queryset = optimize(queryset, info, path=('edges', 'node'), required=required)
+    if getattr(info.context, 'graphql_stream', False):
+        # Each chunk of a streamed page gets loaders of its own, so the
+        # relations cached for the page stay as small as a chunk
+        return paginate(queryset, connection_type, ordering, chunk_size=get_stream_chunk_size(),
+                        on_fetch=lambda rows: renew_loaders(info).register(rows), **kwargs)
+    return paginate(queryset, connection_type, ordering, on_fetch=get_loaders(info).register, **kwargs)
+
+
+class LinkOrder(graphene.Enum):
+    """Sort keys of allLinks, each backed by an index with and without a location filter."""
+
+    ORDER_ASC = 'ORDER_ASC'
+    ORDER_DESC = 'ORDER_DESC'
+    LABEL_ASC = 'LABEL_ASC'
+    LABEL_DESC = 'LABEL_DESC'
+    ID_ASC = 'ID_ASC'
+    ID_DESC = 'ID_DESC'
+
+
+# Keyset orderings of the LinkOrder values, with the id as tie-breaker
+LINK_ORDERINGS = {
+    LinkOrder.ORDER_ASC: LINK_ORDERING,
+    LinkOrder.ORDER_DESC: ('-order', '-id'),
+    LinkOrder.LABEL_ASC: ('label', 'id'),
+    LinkOrder.LABEL_DESC: ('-label', '-id'),
+    LinkOrder.ID_ASC: ('id',),
+    LinkOrder.ID_DESC: ('-id',),
+}
+
+
+# Define the query class
 class Query(graphene.ObjectType):
-    all_pages = graphene.List(PageType)
-    all_links = graphene.List(
-        LinkType,
+    all_pages = graphene.relay.ConnectionField(PageConnection)
+    all_links = graphene.relay.ConnectionField(
+        LinkConnection,
         location=graphene.String(),
-        orderBy=graphene.String(),
+        orderBy=LinkOrder(default_value=LinkOrder.ORDER_ASC),
+    )
+    all_posts = graphene.relay.ConnectionField(PostConnection)
+    navigation = graphene.List(graphene.NonNull(NavigationItemType), location=graphene.String(required=True))
+    page_by_slug = graphene.Field(PageType, path=graphene.String(required=True))
+    search = graphene.List(
+        graphene.NonNull(SearchResultType),
+        query=graphene.String(required=True),
+        first=graphene.Int(),
     )
-    all_posts = graphene.List(PostType)
 
     def resolve_all_pages(root, info, **kwargs):
-        return Page.objects.all()
+        return resolve_connection(info, Page.objects.all(), PageConnection, PAGE_ORDERING, **kwargs)
 
-    def resolve_all_links(root, info, location=None, orderBy=None, **kwargs):
+    def resolve_all_links(root, info, location=None, orderBy=LinkOrder.ORDER_ASC, **kwargs):
         qs = Link.objects.all()
         if location:
             qs = qs.filter(location=location)
-        if orderBy:
-            qs = qs.order_by(orderBy)
-        return qs
-
+        return resolve_connection(info, qs, LinkConnection, LINK_ORDERINGS[orderBy], **kwargs)
 
     def resolve_all_posts(root, info, **kwargs):
-        return Post.objects.all()
+        return resolve_connection(info, Post.objects.all(), PostConnection, POST_ORDERING, **kwargs)
+
+    def resolve_navigation(root, info, location):
+        if location not in LINK_LOCATIONS:
+            raise GraphQLError(f"Unknown link location '{location}'.")
+        return navigation_trees.get(location)
+
+    def resolve_page_by_slug(root, info, path):
+        # The route table finds the page, so only its row is read
+        route = route_table.get(path)
+        if route is None or route.page_id is None:
+            return None
+        pages = get_loaders(info).register(list(optimize(Page.objects.filter(pk=route.page_id), info)))
+        return pages[0] if pages else None
+
+
+    def resolve_search(root, info, query, first=None):
+        if first is not None and first < 0:
+            raise GraphQLError("Argument 'first' must be a non-negative integer.")
+        limit = min(10 if first is None else first, get_max_page_size())
+        hits = search.search(query, limit=limit)
+        # The matched rows, one query per kind, shaped by what `page` / `post` select
+        objects = {}
+        for kind, model in search.MODELS.items():
+            object_ids = [hit.object_id for hit in hits if hit.kind == kind]
+            if object_ids:
+                queryset = optimize(model.objects.filter(pk__in=object_ids), info, path=(kind,))
+                objects.update(((kind, search.get_object_id(instance)), instance)
+                               for instance in get_loaders(info).register(list(queryset)))
+        return [
+            SearchResultType(kind=hit.kind, rank=hit.rank, snippet=hit.snippet,
+                             **{hit.kind: objects.get((hit.kind, hit.object_id))})
+            for hit in hits if (hit.kind, hit.object_id) in objects
+        ]
 
 
 # Define the schema
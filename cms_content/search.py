@@ -0,0 +1,174 @@
+import re
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Page, Post
+
+
+# Full-text search over pages and posts.
+#
+# On SQLite the text of every page and post lives in an FTS5 table as well
+# (created by migration 0006), kept current by the signals below and by the
+# bulk importer. A search is then an index lookup ranked with bm25, title
+# matches weighing most, instead of `LIKE '%term%'` over every TEXT column.
+
+TABLE = 'cms_content_search'
+
+# Indexed models and the kind stored for their rows
+KINDS = {Page: 'page', Post: 'post'}
+MODELS = {kind: model for model, kind in KINDS.items()}
+
+# bm25 weights of the title, content and meta columns
+WEIGHTS = (10.0, 1.0, 2.0)
+SNIPPET_TOKENS = 16
+# Query parameters per statement, below SQLite's limit of 999
+BATCH_SIZE = 900
+
+SearchHit = namedtuple('SearchHit', ('kind', 'object_id', 'rank', 'snippet'))
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(text):
+    """Turn free text into an FTS5 query matching every word, the last as a prefix.
+
+    Each word is quoted, so operators and punctuation in the input are
+    searched for rather than parsed.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def get_documents(model, instances):
+    """Return the (status, title, content, meta) indexed for each page or post."""
+    if model is Page:
+        return [(page.page_status, page.title, page.content, page.meta_keywords) for page in instances]
+    # Posts are also found by their author's username
+    authors = dict(get_user_model().objects.filter(pk__in={post.author_id for post in instances})
+                   .values_list('pk', 'username'))
+    return [(post.status, post.title, f"{post.excerpt}\n{post.content}",
+             f"{authors.get(post.author_id, '')} {post.meta_keywords}") for post in instances]
+
+
+def get_object_id(instance):
+    # Stored the way the table column holds it, so `pk IN (SELECT object_id ...)` matches
+    return instance._meta.pk.get_db_prep_value(instance.pk, connection)
+
+
+def unindex(model, object_ids):
+    if not object_ids or not is_available():
+        return
+    object_ids = list(object_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(object_ids), BATCH_SIZE):
+            chunk = object_ids[start:start + BATCH_SIZE]
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE kind = %s AND object_id IN ({', '.join(['%s'] * len(chunk))})",
+                [KINDS[model], *chunk])
+
+
+def index(instances, created=False):
+    """Add or replace the index rows of `instances`, which share one model.
+
+    Pass `created` for rows that were just inserted and cannot be indexed yet.
+    """
+    instances = list(instances)
+    if not instances or not is_available():
+        return
+    model = type(instances[0])
+    object_ids = [get_object_id(instance) for instance in instances]
+    if not created:
+        unindex(model, object_ids)
+    rows = [(KINDS[model], object_id, *document)
+            for object_id, document in zip(object_ids, get_documents(model, instances))]
+    with connection.cursor() as cursor:
+        # Multi-row INSERTs, each within SQLite's limit on query parameters
+        for start in range(0, len(rows), BATCH_SIZE // 6):
+            chunk = rows[start:start + BATCH_SIZE // 6]
+            cursor.execute(
+                f"INSERT INTO {TABLE} (kind, object_id, status, title, content, meta) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(chunk))}",
+                [value for row in chunk for value in row])
+
+
+def rebuild(chunk_size=1000):
+    """Reindex every page and post, returning the number of rows indexed."""
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+    count = 0
+    for model in KINDS:
+        batch = []
+        for instance in model._default_manager.order_by('pk').iterator(chunk_size=chunk_size):
+            batch.append(instance)
+            if len(batch) == chunk_size:
+                index(batch)
+                count += len(batch)
+                batch = []
+        index(batch)
+        count += len(batch)
+    return count
+
+
+def search(text, kinds=None, published=True, limit=10):
+    """Return the best SearchHits for `text`, best first."""
+    match = build_match(text)
+    if not match or not is_available():
+        return []
+    conditions = [f"{TABLE} MATCH %s"]
+    params = [match]
+    if kinds:
+        conditions.append(f"kind IN ({', '.join(['%s'] * len(kinds))})")
+        params.extend(kinds)
+    if published:
+        conditions.append("status = 'published'")
+    # bm25 takes a weight for every column, the unindexed ones included
+    weights = ', '.join(map(str, (0.0, 0.0, 0.0, *WEIGHTS)))
+    sql = (f"SELECT kind, object_id, bm25({TABLE}, {weights}) AS rank, "
+           f"snippet({TABLE}, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) "
+           f"FROM {TABLE} WHERE {' AND '.join(conditions)} ORDER BY rank LIMIT %s")
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return [SearchHit(*row) for row in cursor.fetchall()]
+
+
+def matching_ids(model, text):
+    """Return a subquery of the primary keys of `model` rows matching `text`."""
+    return RawSQL(f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s",
+                  [build_match(text), KINDS[model]])
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_save, sender=Post)
+def index_content(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    # Counter flushes and slug moves write other columns, so nothing to redo
+    if raw or (update_fields is not None and not {'title', 'content', 'excerpt', 'meta_keywords', 'page_status',
+                                                   'status', 'author'} & set(update_fields)):
+        return
+    index([instance], created)
+
+
+@receiver(post_delete, sender=Page)
+@receiver(post_delete, sender=Post)
+def unindex_content(sender, instance, **kwargs):
+    unindex(sender, [get_object_id(instance)])
+
+
+@receiver(post_save, sender='auth.User')
+def reindex_author_posts(sender, instance, created=False, update_fields=None, **kwargs):
+    # The author's username is indexed with their posts
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    index(Post.objects.filter(author=instance))
@@ -0,0 +1,82 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+
+# Unique slug allocation.
+#
+# Instead of probing `exists()` once per candidate, the allocator reads every
+# slug that could clash with a base ("about", "about-2", "about-3", ...) in one
+# query and picks the lowest free numbered suffix in memory. The range
+# `base- < slug < base.` covers exactly the slugs starting with "base-" and
+# can use the slug index, unlike LIKE. A concurrent writer can still take the
+# slug between the read and the insert, which save_with_unique_slug() absorbs
+# with a bounded retry.
+
+# Attempts made by save_with_unique_slug() before giving up
+SLUG_ATTEMPTS = 3
+# Bases per range query, keeping the OR chain well inside SQLite's limits
+RANGE_BATCH_SIZE = 100
+
+
+def clashing(field, base):
+    return Q(**{field: base}) | Q(**{f'{field}__gt': f'{base}-', f'{field}__lt': f'{base}.'})
+
+
+def get_taken_slugs(model, bases, field='slug'):
+    """Return the slugs in the table that any of `bases` or their suffixed forms would clash with."""
+    bases = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(bases), RANGE_BATCH_SIZE):
+        condition = Q()
+        for base in bases[start:start + RANGE_BATCH_SIZE]:
+            condition |= clashing(field, base)
+        taken.update(model._default_manager.filter(condition).values_list(field, flat=True))
+    return taken
+
+
+def allocate_slugs(model, bases, field='slug'):
+    """Return a unique slug for each of `bases`, in order.
+
+    Duplicates within `bases` get distinct slugs too, so the result can go
+    straight into bulk_create().
+    """
+    max_length = model._meta.get_field(field).max_length
+    bases = [(base or model._meta.model_name)[:max_length] for base in bases]
+    if len(bases) > 1:
+        # Most bases are free: one IN query finds the few that need a range lookup
+        seen, repeated = set(), set()
+        for base in bases:
+            (repeated if base in seen else seen).add(base)
+        exact = set(model._default_manager.filter(**{f'{field}__in': seen}).values_list(field, flat=True))
+        taken = get_taken_slugs(model, exact | repeated, field) | exact
+    else:
+        taken = get_taken_slugs(model, bases, field)
+
+    slugs = []
+    for base in bases:
+        slug, number = base, 1
+        while slug in taken:
+            number += 1
+            suffix = f'-{number}'
+            slug = base[:max_length - len(suffix)] + suffix
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def allocate_slug(model, base, field='slug'):
+    return allocate_slugs(model, [base], field)[0]
+
+
+def save_with_unique_slug(instance, base, save, field='slug', attempts=SLUG_ATTEMPTS):
+    """Give `instance` a free slug from `base` and call `save()`, retrying on a lost race."""
+    model = type(instance)
+    for attempt in range(attempts):
+        setattr(instance, field, allocate_slug(model, base, field))
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            clash = model._default_manager.filter(**{field: getattr(instance, field)}).exists()
+            if not clash or attempt == attempts - 1:
+                raise
@@ -0,0 +1,408 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, suppress
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from graphene.utils.str_converters import to_camel_case
+
+from .bulk import chunked
+from .models import Page, Link, Post, ancestor_slugs, subtree_filter
+from .navigation import LINK_LOCATIONS, build_navigation
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are serialized within a process only
+    fcntl = None
+
+
+# Published-content snapshots for static delivery.
+#
+# What anonymous readers see changes far less often than it is read, so it is
+# rendered ahead of time into a directory of JSON files (CMS_SNAPSHOT_ROOT)
+# that a web server or CDN serves without Django:
+#
+#   pages/<slug>.json           a published page, its breadcrumbs and children
+#   navigation/<location>.json  the navigation tree of a link location
+#   posts/<n>.json              published posts, a page of them each, newest first
+#   posts/latest.json           the listing file with the newest posts
+#   manifest.json               the version of every file
+#
+# A file's version is a hash of its data, so clients can tell what changed.
+# Files are written to a temporary file and renamed over the old one, so a
+# reader never sees half a file. `build_snapshot` writes them all; after that
+# saves and deletes rewrite only the files they affect, once their
+# transaction commits. Bulk imports send no signals and rebuild the snapshot
+# when they are done.
+#
+# Listing files are numbered from the oldest post, so the newest file holds
+# from one to a page of posts and publishing a new post rewrites only the
+# newest one or two and `latest.json`, however many posts there are.
+
+# 2: listing files numbered from the oldest post
+SNAPSHOT_FORMAT = 2
+MANIFEST = 'manifest.json'
+# Published pages rendered per query batch in full builds
+CHUNK_SIZE = 500
+
+PAGE_FIELDS = ('id', 'title', 'slug', 'url', 'content', 'page_link_location', 'show_in_position', 'order',
+               'meta_title', 'meta_description', 'meta_keywords')
+POST_FIELDS = ('id', 'title', 'slug', 'excerpt', 'created', 'updated', 'meta_title', 'meta_description')
+# Page fields shown in the files of other pages and in the menus
+PAGE_TREE_FIELDS = ('title', 'slug', 'parent_id', 'page_status', 'order')
+
+# One update at a time per process, the lock file serializes processes
+_lock = threading.Lock()
+
+
+def get_root():
+    """Return the snapshot directory, None when snapshots are off."""
+    root = getattr(settings, 'CMS_SNAPSHOT_ROOT', None)
+    return Path(root) if root else None
+
+
+def get_page_size():
+    return getattr(settings, 'CMS_SNAPSHOT_PAGE_SIZE', 20)
+
+
+def page_path(slug):
+    return f'pages/{slug}.json'
+
+
+def navigation_path(location):
+    return f'navigation/{location}.json'
+
+
+def listing_path(number):
+    return f'posts/{number}.json'
+
+
+LATEST_LISTING = 'posts/latest.json'
+
+
+def write_atomic(target, content):
+    """Write `content` to a temporary file beside `target`, then rename it over `target`."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=target.parent, prefix=f'.{target.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        # mkstemp makes the file private, the web server must read it
+        os.chmod(temp, 0o644)
+        os.replace(temp, target)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(temp)
+        raise
+
+
+def render_fields(instance, fields):
+    return {to_camel_case(name): getattr(instance, name) for name in fields}
+
+
+def render_pages(pages):
+    """Return (path, data) for each of `pages` that is published."""
+    pages = [page for page in pages if page.page_status == 'published']
+    titles = dict(Page.objects.filter(slug__in={slug for page in pages for slug in ancestor_slugs(page.slug)},
+                                      page_status='published').values_list('slug', 'title'))
+    children = defaultdict(list)
+    for parent_id, title, slug in (Page.objects.filter(parent_id__in=[page.pk for page in pages],
+                                                       page_status='published')
+                                   .order_by('order', 'id').values_list('parent_id', 'title', 'slug')):
+        children[parent_id].append({'title': title, 'slug': slug})
+    for page in pages:
+        ancestors = [slug for slug in ancestor_slugs(page.slug) if slug in titles]
+        parent = ancestor_slugs(page.slug)[-1] if page.parent_id is not None else None
+        yield page_path(page.slug), {
+            **render_fields(page, PAGE_FIELDS),
+            'parent': parent if parent in titles else None,
+            'breadcrumbs': [*({'title': titles[slug], 'slug': slug} for slug in ancestors),
+                            {'title': page.title, 'slug': page.slug}],
+            'children': children[page.pk],
+        }
+
+
+def render_navigation(items):
+    return [
+        {'id': item.id, 'label': item.label, 'slug': item.slug, 'url': item.url, 'order': item.order,
+         'pageId': item.page_id, 'children': render_navigation(item.children)}
+        for item in items
+    ]
+
+
+def render_listing(number, posts, newest):
+    """Render listing file `number` of `newest`, its `posts` oldest first.
+
+    `previous` is the file with the newer posts, `next` the one with the
+    older posts, so clients page from latest.json down to 1.
+    """
+    return {
+        'number': number,
+        'previous': number + 1 if number < newest else None,
+        'next': number - 1 if number > 1 else None,
+        'posts': [{**render_fields(post, POST_FIELDS), 'author': post.author.username} for post in reversed(posts)],
+    }
+
+
+def get_listing():
+    """Return the published posts, oldest first."""
+    return (Post.objects.filter(status='published').select_related('author')
+            .only(*POST_FIELDS, 'author__username').order_by('created', 'id'))
+
+
+def get_listing_number(created, pk):
+    """Return the number of the listing file a post with this creation time and id falls in."""
+    older = Post.objects.filter(Q(created__lt=created) | Q(created=created, id__lt=pk), status='published')
+    return older.count() // get_page_size() + 1
+
+
+class SnapshotWriter:
+    """Writes the files of the snapshot in `root`, noting the version of each."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        # Path -> version of the files written, None for those removed
+        self.versions = {}
+
+    @contextmanager
+    def lock(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with _lock, open(self.root / '.lock', 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def write(self, path, data):
+        """Write a file unless it already holds `data`; return its version."""
+        encoded = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+        version = hashlib.sha256(encoded.encode()).hexdigest()[:16]
+        content = f'{{"version":"{version}","data":{encoded}}}'.encode()
+        self.versions[path] = version
+        target = self.root / path
+        with suppress(FileNotFoundError):
+            if target.read_bytes() == content:
+                return version
+        write_atomic(target, content)
+        return version
+
+    def remove(self, path):
+        self.versions[path] = None
+        target = self.root / path
+        target.unlink(missing_ok=True)
+        # Leave no empty directories behind moved subtrees
+        with suppress(OSError):
+            for directory in target.parents:
+                if directory == self.root:
+                    break
+                directory.rmdir()
+
+    def write_pages(self, pages):
+        """Write the files of the published `pages` and remove those of the others."""
+        pages = list(pages)
+        for path, data in render_pages(pages):
+            self.write(path, data)
+        for page in pages:
+            if page.page_status != 'published':
+                self.remove(page_path(page.slug))
+
+    def write_navigation(self):
+        for location in LINK_LOCATIONS:
+            self.write(navigation_path(location), render_navigation(build_navigation(location)))
+
+    def write_listings(self, first=1, last=None):
+        """Write the listing files from number `first` to `last`, or to the newest.
+
+        Writing the newest file also writes latest.json and removes the files
+        past it. The first file is there even with no posts.
+        """
+        size = get_page_size()
+        newest = max(1, -(-get_listing().count() // size))
+        last = newest if last is None else min(last, newest)
+        # A file that is gone past the newest leaves the newest to rewrite
+        first = min(first, last)
+        batches = chunked(get_listing()[(first - 1) * size:last * size].iterator(chunk_size=size * 10), size)
+        for number in range(first, last + 1):
+            data = render_listing(number, next(batches, []), newest)
+            self.write(listing_path(number), data)
+            if number == newest:
+                self.write(LATEST_LISTING, data)
+        if last == newest:
+            for path in (self.root / 'posts').glob('*.json'):
+                if path.stem.isdigit() and int(path.stem) > newest:
+                    self.remove(listing_path(int(path.stem)))
+
+    def remove_stale(self, slugs):
+        """Remove the files of pages that had these slugs, and of the pages below them, unless rewritten."""
+        candidates = set()
+        for slug in slugs:
+            candidates.add(page_path(slug))
+            directory = self.root / 'pages' / slug
+            if directory.is_dir():
+                candidates.update(path.relative_to(self.root).as_posix() for path in directory.rglob('*.json'))
+        candidates -= self.versions.keys()
+        # Another page may have taken one of the slugs since
+        stale_slugs = {path[len('pages/'):-len('.json')] for path in candidates}
+        self.write_pages(Page.objects.filter(slug__in=stale_slugs, page_status='published'))
+        for path in candidates - self.versions.keys():
+            self.remove(path)
+
+    def prune(self):
+        """Remove the files not written by this writer."""
+        for path in self.root.rglob('*.json'):
+            relative = path.relative_to(self.root).as_posix()
+            if relative != MANIFEST and relative not in self.versions:
+                self.remove(relative)
+
+    def save_manifest(self, replace=False):
+        """Record the versions of the files written and removed in the manifest, or replace it with them."""
+        files = {}
+        if not replace:
+            with suppress(FileNotFoundError, ValueError):
+                files = json.loads((self.root / MANIFEST).read_bytes())['files']
+        for path, version in self.versions.items():
+            if version is None:
+                files.pop(path, None)
+            else:
+                files[path] = version
+        manifest = {'format': SNAPSHOT_FORMAT, 'generated': timezone.now(), 'files': dict(sorted(files.items()))}
+        write_atomic(self.root / MANIFEST, json.dumps(manifest, cls=DjangoJSONEncoder, indent=1).encode())
+
+
+def build(root=None):
+    """Write the whole snapshot, removing files left from older ones; return the number of files."""
+    writer = SnapshotWriter(root or get_root())
+    with writer.lock():
+        published = Page.objects.filter(page_status='published').only(*PAGE_FIELDS, 'parent_id', 'page_status')
+        for pages in chunked(published.order_by('pk').iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE):
+            writer.write_pages(pages)
+        writer.write_navigation()
+        writer.write_listings()
+        writer.prune()
+        writer.save_manifest(replace=True)
+    return sum(version is not None for version in writer.versions.values())
+
+
+def update(root, pages=(), subtrees=(), stale=(), navigation=False, posts=(), moved_posts=(), posts_from=None):
+    """Rewrite the files affected by a change.
+
+    `pages` and the pages below `subtrees` (ids) are rendered, the files of
+    `stale` slugs removed. `posts` and `moved_posts` are (created, id) pairs
+    of changed posts: the listing file of each of the first is rewritten, and
+    every file from that of the oldest moved post up to the newest, which is
+    the newest one or two for a new post. Returns the writer.
+    """
+    writer = SnapshotWriter(root)
+    with writer.lock():
+        page_ids = set(pages)
+        slugs = list(Page.objects.filter(pk__in=subtrees).values_list('slug', flat=True))
+        if slugs:
+            subtree = Q()
+            for slug in slugs:
+                subtree |= subtree_filter(slug)
+            page_ids.update(Page.objects.filter(subtree).values_list('pk', flat=True))
+        if page_ids:
+            writer.write_pages(Page.objects.filter(pk__in=page_ids).only(*PAGE_FIELDS, 'parent_id', 'page_status'))
+        if stale:
+            writer.remove_stale(stale)
+        if navigation:
+            writer.write_navigation()
+
+        if moved_posts:
+            first = min(get_listing_number(*post) for post in moved_posts)
+            posts_from = first if posts_from is None else min(first, posts_from)
+        for number in sorted({get_listing_number(*post) for post in posts}):
+            if posts_from is None or number < posts_from:
+                writer.write_listings(number, number)
+        if posts_from is not None:
+            # From the file before, whose link to a newer file may come or go
+            writer.write_listings(max(posts_from - 1, 1))
+        writer.save_manifest()
+    return writer
+
+
+def schedule(**changes):
+    """Update the snapshot once the current transaction commits."""
+    root = get_root()
+    if root is not None:
+        # A failed update must not fail the save, which is committed by then
+        transaction.on_commit(partial(update, root, **changes), robust=True)
+
+
+@receiver(pre_save, sender=Page)
+@receiver(pre_save, sender=Post)
+def remember_snapshot_fields(sender, instance, raw=False, **kwargs):
+    # What a save moves is only known from the row as it was
+    if raw or instance._state.adding or get_root() is None:
+        return
+    fields = (*PAGE_TREE_FIELDS, 'page_link_location') if sender is Page else ('status',)
+    instance._snapshot_previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(post_save, sender=Page)
+def update_page_snapshot(sender, instance, created=False, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_snapshot_previous', None)
+    if raw:
+        return
+    if not created and previous is not None and all(
+            previous[field] == getattr(instance, field) for field in PAGE_TREE_FIELDS):
+        # The link of the page moves with it, see update_navigation_snapshot
+        schedule(pages={instance.pk}, navigation=previous['page_link_location'] != instance.page_link_location)
+        return
+    parents = {instance.parent_id, previous and previous['parent_id']} - {None}
+    stale = {previous['slug']} if previous and previous['slug'] != instance.slug else set()
+    schedule(pages={instance.pk, *parents}, subtrees={instance.pk}, stale=stale, navigation=True)
+
+
+@receiver(post_delete, sender=Page)
+def remove_page_snapshot(sender, instance, **kwargs):
+    schedule(pages={instance.parent_id} - {None}, stale={instance.slug}, navigation=True)
+
+
+@receiver([post_save, post_delete], sender=Link)
+def update_navigation_snapshot(sender, instance, raw=False, origin=None, **kwargs):
+    # Links saved by their page, or deleted with it, are in the page's update
+    if raw or getattr(instance, '_skip_page_update', False) or isinstance(origin, Page):
+        return
+    schedule(navigation=True)
+
+
+@receiver(post_save, sender=Post)
+def update_post_snapshot(sender, instance, created=False, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_snapshot_previous', None)
+    published = instance.status == 'published'
+    was_published = previous is not None and previous['status'] == 'published'
+    if raw or not (published or was_published):
+        return
+    key = (instance.created, instance.pk)
+    if created or published != was_published:
+        schedule(moved_posts=[key])
+    else:
+        schedule(posts=[key])
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_snapshot(sender, instance, **kwargs):
+    if instance.status == 'published':
+        schedule(moved_posts=[(instance.created, instance.pk)])
+
+
+@receiver(post_save, sender='auth.User')
+def update_author_snapshot(sender, instance, created=False, update_fields=None, **kwargs):
+    # Usernames are shown in the post listings
+    if created or (update_fields is not None and 'username' not in update_fields) or get_root() is None:
+        return
+    if instance.posts.filter(status='published').exists():
+        schedule(posts_from=1)
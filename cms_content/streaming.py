@@ -0,0 +1,112 @@
+from django.conf import settings
+from graphql import ExecutionResult, located_error
+from graphql.execution import ExecutionContext
+
+from .pagination import StreamedEdges
+
+
+# Streamed responses for the GraphQL endpoint.
+#
+# A usual response holds a whole page three times over before its first byte
+# goes out: as model instances, as the result dict and as one JSON string.
+# Requests asking for `stream` have their connection fields read only the
+# ordering values of the page up front (see `paginate`); the edges are fetched
+# CMS_GRAPHQL_STREAM_CHUNK_SIZE rows per query, completed and encoded while
+# the response is written, so memory follows the chunk size rather than the
+# page size. The rest of the result is complete before the first byte, as
+# usual.
+#
+# The status goes out before any edge is read, so an error while streaming cuts
+# the list short and is reported in `errors`, which come after `data`.
+
+# Encoded parts are joined into writes of about this many characters
+BUFFER_SIZE = 64 * 1024
+
+
+def is_enabled():
+    return getattr(settings, 'CMS_GRAPHQL_STREAMING', True)
+
+
+def get_stream_chunk_size():
+    return getattr(settings, 'CMS_GRAPHQL_STREAM_CHUNK_SIZE', 50)
+
+
+class StreamedList:
+    """A list field whose items are completed as the response is written."""
+
+    def __init__(self, context, item_type, field_nodes, info, path, items):
+        self.context = context
+        self.item_type = item_type
+        self.field_nodes = field_nodes
+        self.info = info
+        self.path = path
+        self.items = items
+
+    def __iter__(self):
+        # Mirrors ExecutionContext.complete_list_value, one item at a time
+        for index, item in enumerate(self.items):
+            item_path = self.path.add_key(index, None)
+            try:
+                completed = self.context.complete_value(self.item_type, self.field_nodes, self.info, item_path, item)
+            except Exception as raw_error:
+                error = located_error(raw_error, self.field_nodes, item_path.as_list())
+                completed = self.context.handle_field_error(error, self.item_type, item_path)
+            yield completed
+
+    def add_error(self, raw_error):
+        """Report an error that stopped the list, in the errors of the result."""
+        error = located_error(raw_error, self.field_nodes, self.path.as_list())
+        self.context.collected_errors.add(error, self.path)
+
+
+class StreamingExecutionContext(ExecutionContext):
+    """Leave the edges of streamed connections to be completed while the response is written."""
+
+    def complete_list_value(self, return_type, field_nodes, info, path, result):
+        if isinstance(result, StreamedEdges):
+            return StreamedList(self, return_type.of_type, field_nodes, info, path, result)
+        return super().complete_list_value(return_type, field_nodes, info, path, result)
+
+    def build_response(self, data, errors):
+        # The same list even when empty, as streamed lists add to it later
+        return ExecutionResult(data, errors)
+
+
+def iter_value(value, encode):
+    if isinstance(value, dict):
+        yield '{'
+        for index, (key, item) in enumerate(value.items()):
+            yield f',{encode(key)}:' if index else f'{encode(key)}:'
+            yield from iter_value(item, encode)
+        yield '}'
+    elif isinstance(value, StreamedList):
+        yield '['
+        try:
+            for index, item in enumerate(value):
+                yield f',{encode(item)}' if index else encode(item)
+        except Exception as error:
+            value.add_error(error)
+        yield ']'
+    else:
+        yield encode(value)
+
+
+def iter_response(result, format_error, encode):
+    """Yield the JSON of an execution result, its values encoded with `encode`, in parts of about BUFFER_SIZE."""
+    def iter_parts():
+        yield '{"data":'
+        yield from iter_value(result.data, encode)
+        # Complete only now the streamed lists have been read
+        if result.errors:
+            yield f',"errors":{encode([format_error(error) for error in result.errors])}'
+        yield '}'
+
+    buffer, size = [], 0
+    for part in iter_parts():
+        buffer.append(part)
+        size += len(part)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
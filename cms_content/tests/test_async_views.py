@@ -0,0 +1,117 @@
+import json
+import logging
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, RequestFactory, TransactionTestCase, override_settings
+from cms_content import schema
+from cms_content.async_views import AsyncCMSGraphQLView
+from cms_content.models import Page, Link, Post
+from cms_content.views import CMSGraphQLView, document_cache
+
+logger = logging.getLogger(__name__)
+
+QUERY = '''{
+    allPages { edges { node { title children { title } link { label } } } }
+    allPosts { edges { node { title author { username } } } }
+    navigation(location: "navbar") { label children { label } }
+}'''
+
+
+# Worker threads use connections of their own, which only see committed rows
+@override_settings(CMS_GRAPHQL_PROFILE=False)
+class AsyncGraphQLViewTests(TransactionTestCase):
+    # Outside a transaction the router reads content from the replica
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        document_cache.clear()
+        parent = Page.objects.create(title="Parent", page_status='published')
+        Page.objects.create(title="Child", parent=parent, page_status='published')
+        Link.objects.create(label="Docs", url="https://example.com", location='navbar', status='published')
+        author = User.objects.create(username='ada')
+        Post.objects.create(title="Hello", content="World", author=author)
+
+    async def query(self, query, **kwargs):
+        request = AsyncRequestFactory().post('/graphql/', json.dumps({'query': query}),
+                                             content_type='application/json')
+        return await AsyncCMSGraphQLView.as_view(**kwargs)(request)
+
+    async def test_matches_the_sync_view(self):
+        logger.debug("Starting matches_the_sync_view")
+        response = await self.query(QUERY)
+        self.assertEqual(response.status_code, 200)
+        request = RequestFactory().post('/graphql/', json.dumps({'query': QUERY}), content_type='application/json')
+        expected = CMSGraphQLView.as_view()(request)
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        self.assertNotIn('errors', json.loads(response.content))
+        logger.debug("Finished matches_the_sync_view")
+
+    async def test_top_level_fields_run_concurrently(self):
+        logger.debug("Starting top_level_fields_run_concurrently")
+        # Each connection waits for the other, which only returns if both run at once
+        barrier = threading.Barrier(2, timeout=5)
+        resolve_connection = schema.resolve_connection
+
+        def wait_for_each_other(*args, **kwargs):
+            barrier.wait()
+            return resolve_connection(*args, **kwargs)
+
+        with mock.patch.object(schema, 'resolve_connection', wait_for_each_other):
+            response = await self.query('{ allPages { edges { node { title } } } '
+                                        'allPosts { edges { node { title } } } }')
+        data = json.loads(response.content)['data']
+        self.assertEqual(len(data['allPages']['edges']), 2)
+        self.assertEqual(data['allPosts']['edges'][0]['node']['title'], "Hello")
+        logger.debug("Finished top_level_fields_run_concurrently")
+
+    async def test_errors_and_cached_responses(self):
+        logger.debug("Starting errors_and_cached_responses")
+        response = await self.query('{ allPages { edges { node { nope } } } }')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Cannot query field 'nope'", json.loads(response.content)['errors'][0]['message'])
+        response = await self.query('{ navigation(location: "nowhere") { label } }')
+        self.assertEqual(json.loads(response.content)['errors'][0]['path'], ['navigation'])
+        first = await self.query(QUERY)
+        # Served from the response cache without running a resolver
+        with mock.patch.object(schema, 'resolve_connection', side_effect=AssertionError):
+            second = await self.query(QUERY)
+        self.assertEqual(first.content, second.content)
+        logger.debug("Finished errors_and_cached_responses")
+
+    async def test_graphiql_and_profiling_use_the_sync_view(self):
+        logger.debug("Starting graphiql_and_profiling_use_the_sync_view")
+        request = AsyncRequestFactory().get('/graphql/', headers={'Accept': 'text/html'})
+        response = await AsyncCMSGraphQLView.as_view(graphiql=True)(request)
+        self.assertContains(response, 'graphiql')
+        with override_settings(CMS_GRAPHQL_PROFILE=True, CMS_GRAPHQL_PROFILE_EXTENSIONS=True):
+            response = await self.query(QUERY)
+        self.assertGreater(json.loads(response.content)['extensions']['profile']['sql']['count'], 0)
+        logger.debug("Finished graphiql_and_profiling_use_the_sync_view")
+
+    async def test_conditional_get(self):
+        logger.debug("Starting conditional_get")
+        view = AsyncCMSGraphQLView.as_view()
+        response = await view(AsyncRequestFactory().get('/graphql/', {'query': QUERY},
+                                                        headers={'Accept': 'application/json'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        request = AsyncRequestFactory().get('/graphql/', {'query': QUERY},
+                                            headers={'Accept': 'application/json', 'If-None-Match': response['ETag']})
+        self.assertEqual((await view(request)).status_code, 304)
+        logger.debug("Finished conditional_get")
+
+    async def test_streamed_responses(self):
+        logger.debug("Starting streamed_responses")
+        request = AsyncRequestFactory().post('/graphql/?stream=1', json.dumps({'query': QUERY}),
+                                             content_type='application/json')
+        response = await AsyncCMSGraphQLView.as_view()(request)
+        # Read a part at a time from the sync thread, not gathered up front
+        self.assertTrue(response.is_async)
+        body = json.loads(b''.join([part async for part in response.streaming_content]))
+        expected = await self.query(QUERY)
+        self.assertEqual(body, json.loads(expected.content))
+        logger.debug("Finished streamed_responses")
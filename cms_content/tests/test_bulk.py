@@ -0,0 +1,191 @@
+import datetime
+import io
+import json
+import logging
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from cms_content.bulk import BulkImportError, export_rows, import_rows, read_rows, write_rows, FIELDS
+from cms_content.models import Page, Link, Post
+
+logger = logging.getLogger(__name__)
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='testuser')
+
+    def test_pages_get_hierarchical_slugs_and_links(self):
+        logger.debug("Starting pages_get_hierarchical_slugs_and_links")
+        Page.objects.create(title="Existing")
+        rows = [
+            {'title': "About", 'page_status': 'published', 'page_link_location': 'navbar', 'order': 2},
+            {'title': "Team", 'parent': "about"},
+            {'title': "Jobs", 'parent': "about/team", 'order': '5'},
+            {'title': "History", 'parent': "existing"},
+        ]
+        result = import_rows('pages', rows)
+        self.assertEqual((result.created, result.updated), (4, 0))
+        jobs = Page.objects.get(title="Jobs")
+        self.assertEqual(jobs.slug, "about/team/jobs")
+        self.assertEqual(jobs.parent.title, "Team")
+        self.assertEqual(Page.objects.get(title="History").slug, "existing/history")
+        link = Link.objects.get(page=jobs)
+        self.assertEqual((link.label, link.slug, link.order), ("Jobs", "about/team/jobs", 5))
+        self.assertEqual(Link.objects.get(page__title="About").location, 'navbar')
+        logger.debug("Finished pages_get_hierarchical_slugs_and_links")
+
+    def test_existing_pages_are_updated(self):
+        logger.debug("Starting existing_pages_are_updated")
+        page = Page.objects.create(title="About")
+        result = import_rows('pages', [{'title': "About", 'content': "New", 'page_status': 'published'}])
+        self.assertEqual((result.created, result.updated), (0, 1))
+        page.refresh_from_db()
+        self.assertEqual(page.content, "New")
+        self.assertEqual(Link.objects.get(page=page).status, 'published')
+        logger.debug("Finished existing_pages_are_updated")
+
+    def test_partial_rows_keep_the_other_columns(self):
+        logger.debug("Starting partial_rows_keep_the_other_columns")
+        page = Page.objects.create(title="About", content="keep me", order=4, page_status='published')
+        import_rows('pages', [{'title': "About", 'page_status': 'draft'}])
+        page.refresh_from_db()
+        self.assertEqual((page.content, page.order, page.page_status), ("keep me", 4, 'draft'))
+        self.assertEqual((page.link.order, page.link.status), (4, 'draft'))
+
+        link = Link.objects.create(label="Docs", url="https://example.com", order=3)
+        import_rows('links', [{'slug': link.slug, 'label': "Manual"}])
+        link.refresh_from_db()
+        self.assertEqual((link.label, link.url, link.order), ("Manual", "https://example.com", 3))
+
+        post = Post.objects.create(title="Hello", content="keep me", author=self.author)
+        import_rows('posts', [{'id': str(post.pk), 'excerpt': "Hi"}])
+        post.refresh_from_db()
+        self.assertEqual((post.title, post.content, post.excerpt, post.author), ("Hello", "keep me", "Hi", self.author))
+        logger.debug("Finished partial_rows_keep_the_other_columns")
+
+    def test_rows_move_existing_pages(self):
+        logger.debug("Starting rows_move_existing_pages")
+        about = Page.objects.create(title="About")
+        team = Page.objects.create(title="Team", parent=about)
+        Page.objects.create(title="Jobs", parent=team)
+        Page.objects.create(title="Company")
+        # Rows without a parent leave the page where it is
+        import_rows('pages', [{'title': "Jobs", 'content': "Apply"}])
+        self.assertEqual(Page.objects.get(title="Jobs").slug, "about/team/jobs")
+        result = import_rows('pages', [{'title': "Team", 'parent': "company"}])
+        self.assertEqual((result.created, result.updated), (0, 1))
+        self.assertEqual(Page.objects.get(title="Team").slug, "company/team")
+        self.assertEqual(Page.objects.get(title="Jobs").slug, "company/team/jobs")
+        self.assertEqual(Link.objects.get(page__title="Jobs").slug, "company/team/jobs")
+
+        # Slugs held by another page or a link are refused before anything is written
+        Page.objects.create(title="Jobs!", parent=about)
+        with self.assertRaises(BulkImportError):
+            import_rows('pages', [{'title': "Jobs", 'parent': "about"}])
+        Link.objects.create(label="History", slug="company/history")
+        with self.assertRaises(BulkImportError):
+            import_rows('pages', [{'title': "History", 'parent': "company"}])
+        with self.assertRaises(BulkImportError):
+            import_rows('pages', [{'title': "Company", 'parent': "company/team"}])
+        self.assertEqual(Page.objects.get(title="Jobs").slug, "company/team/jobs")
+        logger.debug("Finished rows_move_existing_pages")
+
+    def test_queries_per_chunk_do_not_grow_with_rows(self):
+        logger.debug("Starting queries_per_chunk_do_not_grow_with_rows")
+        # Both sizes fit in one INSERT under SQLite's 999 parameter limit
+        for count, offset in ((10, 0), (70, 10)):
+            rows = [{'title': f"Page {offset + i}"} for i in range(count)]
+            # Savepoint, existing pages, taken link slugs, pages, search rows, links, release
+            with self.assertNumQueries(7):
+                import_rows('pages', rows, chunk_size=1000)
+        self.assertEqual(Link.objects.count(), 80)
+        logger.debug("Finished queries_per_chunk_do_not_grow_with_rows")
+
+    def test_links_get_unique_slugs(self):
+        logger.debug("Starting links_get_unique_slugs")
+        Link.objects.create(label="Contact")
+        import_rows('links', [{'label': "Contact", 'url': 'example.com'}, {'label': "Contact"}])
+        self.assertEqual(Link.objects.filter(label="Contact").values('slug').distinct().count(), 3)
+        with self.assertRaises(BulkImportError):
+            import_rows('links', [{'label': "Team", 'page': "about/team"}])
+        logger.debug("Finished links_get_unique_slugs")
+
+    def test_posts_keep_ids_and_timestamps(self):
+        logger.debug("Starting posts_keep_ids_and_timestamps")
+        created = datetime.datetime(2020, 5, 17, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+        rows = [{'id': '0b0c3b0e-4f0a-4bd5-9a8f-53bd4d6f4f3c', 'title': "Old Post", 'author': 'testuser',
+                 'created': created.isoformat(), 'updated': created.isoformat(), 'views': '7'},
+                {'title': "New Post", 'author': 'testuser'}]
+        import_rows('posts', rows)
+        post = Post.objects.get(title="Old Post")
+        self.assertEqual(str(post.id), rows[0]['id'])
+        self.assertEqual((post.created, post.updated, post.views, post.slug), (created, created, 7, "old-post"))
+        result = import_rows('posts', [dict(rows[0], title="Old Post Renamed")])
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).title, "Old Post Renamed")
+        with self.assertRaises(BulkImportError):
+            import_rows('posts', [{'title': "Orphan", 'author': 'nobody'}])
+        logger.debug("Finished posts_keep_ids_and_timestamps")
+
+
+class BulkExportTests(TestCase):
+    def setUp(self):
+        author = User.objects.create(username='testuser')
+        about = Page.objects.create(title="About", content="About us")
+        Page.objects.create(title="Team", parent=about)
+        Link.objects.create(label="External", url="example.com")
+        Post.objects.create(title="Test Post", content="Test Content", author=author)
+
+    def round_trip(self, kind, format):
+        stream = io.StringIO(newline='')
+        write_rows(stream, export_rows(kind), format, FIELDS[kind])
+        stream.seek(0)
+        return list(read_rows(stream, format))
+
+    def test_export_round_trips_through_import(self):
+        logger.debug("Starting export_round_trips_through_import")
+        for format in ('jsonl', 'csv'):
+            pages = self.round_trip('pages', format)
+            self.assertEqual([(page['title'], page['parent'] or None) for page in pages],
+                             [("About", None), ("Team", "about")])
+            self.assertEqual(import_rows('pages', pages).updated, 2)
+            self.assertEqual(import_rows('links', self.round_trip('links', format)).updated, 1)
+            self.assertEqual(import_rows('posts', self.round_trip('posts', format)).updated, 1)
+        self.assertEqual(Page.objects.get(title="Team").slug, "about/team")
+        self.assertEqual(Post.objects.count(), 1)
+        logger.debug("Finished export_round_trips_through_import")
+
+    def test_commands(self):
+        logger.debug("Starting commands")
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / 'posts.csv')
+            out = io.StringIO()
+            call_command('export_content', 'posts', path, stdout=out)
+            self.assertIn("Exported 1 posts", out.getvalue())
+            call_command('import_content', 'posts', path, stdout=out)
+            self.assertIn("1 updated", out.getvalue())
+
+            path = str(Path(directory) / 'pages.jsonl')
+            Path(path).write_text(json.dumps({'title': "Child", 'parent': "missing"}) + '\n')
+            with self.assertRaises(CommandError):
+                call_command('import_content', 'pages', path, stdout=out)
+        logger.debug("Finished commands")
+
+    def test_values_columns_cannot_hold_are_reported(self):
+        logger.debug("Starting values_columns_cannot_hold_are_reported")
+        with tempfile.TemporaryDirectory() as directory:
+            for kind, rows, message in (
+                    ('pages', [{'title': "A"}, {'title': "B", 'order': "x"}], "Row 2: invalid order 'x'"),
+                    ('posts', [{'title': "Bad", 'author': 'testuser', 'created': "garbage"}],
+                     "Row 1: invalid created 'garbage'")):
+                path = Path(directory) / f'{kind}.jsonl'
+                path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command('import_content', kind, str(path), stdout=io.StringIO())
+        self.assertFalse(Page.objects.filter(title="A").exists())
+        logger.debug("Finished values_columns_cannot_hold_are_reported")
@@ -0,0 +1,92 @@
+import json
+import logging
+import time
+
+from django.test import override_settings
+from graphene_django.utils.testing import GraphQLTestCase
+from graphql import get_introspection_query, parse, validate
+from cms_content.complexity import QueryComplexityRule
+from cms_content.models import Page
+from cms_content.schema import schema
+from cms_content.views import document_cache
+
+logger = logging.getLogger(__name__)
+
+FAN_OUT = '{ allPages { edges { node { children { children { children { title } } } } } } }'
+
+
+class QueryComplexityTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        document_cache.clear()
+        parent = Page.objects.create(title="Parent")
+        Page.objects.create(title="Child", parent=parent)
+
+    def get_error(self, query):
+        # Rejected while validating, so not a single row is read
+        with self.assertNumQueries(0):
+            response = self.query(query)
+        errors = json.loads(response.content)['errors']
+        self.assertEqual(len(errors), 1)
+        return errors[0]
+
+    def test_fan_out_is_rejected(self):
+        logger.debug("Starting fan_out_is_rejected")
+        error = self.get_error(FAN_OUT)
+        # 100 pages, 10 children each, 10 grandchildren each: counting stops there, over the limit
+        self.assertEqual(error['extensions'], {'code': 'QUERY_TOO_COMPLEX', 'cost': 11100, 'maxCost': 10000})
+        self.assertResponseNoErrors(self.query(FAN_OUT.replace('allPages', 'allPages(first: 5)')))
+        logger.debug("Finished fan_out_is_rejected")
+
+    def test_page_size_variables_count_as_the_maximum(self):
+        logger.debug("Starting page_size_variables_count_as_the_maximum")
+        query = FAN_OUT.replace('{ allPages', 'query ($first: Int) { allPages(first: $first)')
+        response = self.query(query, variables={'first': 5})
+        self.assertEqual(json.loads(response.content)['errors'][0]['extensions']['code'], 'QUERY_TOO_COMPLEX')
+        logger.debug("Finished page_size_variables_count_as_the_maximum")
+
+    def test_deep_nesting_is_rejected(self):
+        logger.debug("Starting deep_nesting_is_rejected")
+        # Fragments count where they are spread, and a cycle does not hang the rule
+        query = '''{ allLinks(first: 1) { edges { node { page { ...Page } } } } }
+            fragment Page on PageType { link { page { link { page { link { page { title } } } } } } }'''
+        error = self.get_error(query)
+        self.assertEqual(error['extensions'], {'code': 'QUERY_TOO_DEEP', 'depth': 11, 'maxDepth': 10})
+        error = self.get_error('{ allPages { edges { node { ...Cycle } } } } '
+                               'fragment Cycle on PageType { parent { ...Cycle } }')
+        self.assertIn("Cannot spread fragment 'Cycle' within itself.", error['message'])
+        logger.debug("Finished deep_nesting_is_rejected")
+
+    def test_chained_fragments_are_measured_once(self):
+        logger.debug("Starting chained_fragments_are_measured_once")
+        # Each fragment spreads the one before twice, doubling what it expands to
+        fragments = ['fragment F0 on PageType { title }'] + [
+            f'fragment F{i} on PageType {{ ...F{i - 1} a: parent {{ ...F{i - 1} }} }}' for i in range(1, 31)]
+        query = '{ allPages(first: 1) { edges { node { ...F30 } } } } ' + ' '.join(fragments)
+        start = time.perf_counter()
+        self.assertEqual(self.get_error(query)['extensions']['code'], 'QUERY_TOO_DEEP')
+        self.assertLess(time.perf_counter() - start, 1)
+        # Measured in full when the limits allow it
+        start = time.perf_counter()
+        with override_settings(CMS_GRAPHQL_MAX_DEPTH=100, CMS_GRAPHQL_MAX_COST=2 ** 40):
+            self.assertEqual(validate(schema.graphql_schema, parse(query), [QueryComplexityRule]), [])
+        self.assertLess(time.perf_counter() - start, 1)
+        logger.debug("Finished chained_fragments_are_measured_once")
+
+    def test_limits_and_weights_are_configurable(self):
+        logger.debug("Starting limits_and_weights_are_configurable")
+        query = '{ allPages(first: 10) { edges { node { title children { title } } } } }'
+        self.assertResponseNoErrors(self.query(query))
+        document_cache.clear()
+        with override_settings(CMS_GRAPHQL_FIELD_WEIGHTS={'PageType.children': 1000}):
+            self.assertEqual(self.get_error(query)['extensions']['cost'], 10010)
+        document_cache.clear()
+        with override_settings(CMS_GRAPHQL_MAX_DEPTH=3):
+            self.assertEqual(self.get_error(query)['extensions']['code'], 'QUERY_TOO_DEEP')
+        logger.debug("Finished limits_and_weights_are_configurable")
+
+    def test_introspection_is_not_limited(self):
+        logger.debug("Starting introspection_is_not_limited")
+        self.assertResponseNoErrors(self.query(get_introspection_query()))
+        logger.debug("Finished introspection_is_not_limited")
@@ -0,0 +1,116 @@
+import logging
+import threading
+import uuid
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from cms_content.counters import ViewCounter, view_counter
+from cms_content.models import Page, Post
+
+logger = logging.getLogger(__name__)
+
+
+# The background thread would write through its own connection, outside the test transaction
+@override_settings(CMS_VIEW_COUNTER_FLUSH_INTERVAL=None)
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        self.counter = ViewCounter()
+        self.page = Page.objects.create(title="About")
+        author = User.objects.create(username='testuser')
+        self.posts = [Post.objects.create(title=f"Post {i}", author=author) for i in range(3)]
+        view_counter.clear()
+
+    def tearDown(self):
+        view_counter.clear()
+
+    def test_hits_are_buffered_and_flushed_with_f_updates(self):
+        logger.debug("Starting hits_are_buffered_and_flushed_with_f_updates")
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                self.counter.hit(Page, self.page.pk)
+            for post in self.posts:
+                self.counter.hit(Post, post.pk, count=2)
+        self.assertEqual(self.counter.pending(Page, self.page.pk), 5)
+        # Savepoint, one UPDATE per model and distinct count, release
+        with self.assertNumQueries(4):
+            self.assertEqual(self.counter.flush(), 4)
+        self.page.refresh_from_db()
+        self.assertEqual(self.page.views, 5)
+        self.assertEqual(sorted(Post.objects.values_list('views', flat=True)), [2, 2, 2])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counter.flush(), 0)
+        logger.debug("Finished hits_are_buffered_and_flushed_with_f_updates")
+
+    def test_concurrent_hits_are_not_lost(self):
+        logger.debug("Starting concurrent_hits_are_not_lost")
+
+        def hit():
+            for _ in range(1000):
+                self.counter.hit(Page, self.page.pk)
+
+        threads = [threading.Thread(target=hit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.counter.flush()
+        self.page.refresh_from_db()
+        self.assertEqual(self.page.views, 4000)
+        logger.debug("Finished concurrent_hits_are_not_lost")
+
+    def test_flush_when_due(self):
+        logger.debug("Starting flush_when_due")
+        with override_settings(CMS_VIEW_COUNTER_MAX_PENDING=3):
+            self.counter.hit(Page, self.page.pk)
+            self.counter.hit(Page, self.page.pk, count=2)
+        self.assertEqual((Page.objects.get().views, self.counter.pending(Page, self.page.pk)), (3, 0))
+        logger.debug("Finished flush_when_due")
+
+    def test_background_thread_flushes_on_a_timer(self):
+        logger.debug("Starting background_thread_flushes_on_a_timer")
+        flushed = threading.Event()
+        with mock.patch.object(ViewCounter, 'try_flush', side_effect=lambda: flushed.set()):
+            with override_settings(CMS_VIEW_COUNTER_FLUSH_INTERVAL=0.01):
+                self.counter.hit(Page, self.page.pk)
+                # Flushed without another hit
+                self.assertTrue(flushed.wait(5))
+                threads = [thread for thread in threading.enumerate() if thread.name == 'view-counter-flush']
+                self.counter.hit(Page, self.page.pk)
+                self.assertEqual(len([thread for thread in threading.enumerate()
+                                      if thread.name == 'view-counter-flush']), len(threads))
+            # A None interval stops the thread
+            for thread in threads:
+                thread.join(5)
+        self.assertIsNone(self.counter._pid)
+        logger.debug("Finished background_thread_flushes_on_a_timer")
+
+    def test_failed_flush_keeps_hits(self):
+        logger.debug("Starting failed_flush_keeps_hits")
+        self.counter.hit(Page, self.page.pk)
+        with mock.patch.object(ViewCounter, 'write', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.counter.flush()
+        self.assertEqual(self.counter.pending(Page, self.page.pk), 1)
+        # A hit that fills the buffer logs the failure instead of failing the request
+        with override_settings(CMS_VIEW_COUNTER_MAX_PENDING=2):
+            with mock.patch.object(ViewCounter, 'write', side_effect=RuntimeError):
+                with self.assertLogs('cms_content.counters', 'ERROR'):
+                    self.counter.hit(Page, self.page.pk)
+        self.assertEqual(self.counter.pending(Page, self.page.pk), 2)
+        self.counter.flush()
+        self.assertEqual(Page.objects.get().views, 2)
+        logger.debug("Finished failed_flush_keeps_hits")
+
+    def test_record_view_endpoint(self):
+        logger.debug("Starting record_view_endpoint")
+        with self.assertNumQueries(0):
+            response = self.client.post(f'/views/posts/{self.posts[0].pk}')
+        self.assertEqual(response.status_code, 202)
+        self.client.post(f'/views/pages/{self.page.pk}')
+        self.assertEqual(view_counter.pending(Post, self.posts[0].pk), 1)
+        self.assertEqual(view_counter.pending(Page, self.page.pk), 1)
+        self.assertEqual(self.client.post('/views/links/1').status_code, 404)
+        self.assertEqual(self.client.post('/views/posts/not-a-uuid').status_code, 404)
+        self.assertEqual(self.client.get(f'/views/posts/{uuid.uuid4()}').status_code, 405)
+        logger.debug("Finished record_view_endpoint")
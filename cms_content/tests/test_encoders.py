@@ -0,0 +1,79 @@
+import datetime
+import json
+import logging
+import unittest
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from graphene_django.utils.testing import GraphQLTestCase
+from cms_content import encoders
+from cms_content.models import Page
+
+logger = logging.getLogger(__name__)
+
+VALUE = {
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'created': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+    'published': datetime.date(2024, 5, 1),
+    'at': datetime.time(9, 15),
+    'title': "Café",
+    'tags': [1, 2.5, None, True],
+}
+
+
+class EncoderTests(SimpleTestCase):
+
+    def test_native_values(self):
+        logger.debug("Starting native_values")
+        self.assertEqual(json.loads(encoders.encode_stdlib(VALUE)), {
+            'id': '12345678-1234-5678-1234-567812345678',
+            'created': '2024-05-01T12:30:15.123456+00:00',
+            'published': '2024-05-01',
+            'at': '09:15:00',
+            'title': "Café",
+            'tags': [1, 2.5, None, True],
+        })
+        self.assertEqual(encoders.encode_stdlib({'b': 1, 'a': 2}, pretty=True), '{\n  "a": 2,\n  "b": 1\n}')
+        with self.assertRaises(TypeError):
+            encoders.encode_stdlib({'value': object()})
+        logger.debug("Finished native_values")
+
+    @unittest.skipIf(encoders.orjson is None, "orjson is not installed")
+    def test_orjson_matches_the_standard_library(self):
+        logger.debug("Starting orjson_matches_the_standard_library")
+        self.assertEqual(json.loads(encoders.encode_orjson(VALUE)), json.loads(encoders.encode_stdlib(VALUE)))
+        self.assertEqual(encoders.encode_orjson(VALUE, pretty=True),
+                         encoders.encode_stdlib(VALUE, pretty=True).replace('\\u00e9', 'é'))
+        with self.assertRaises(TypeError):
+            encoders.encode_orjson({'value': object()})
+        logger.debug("Finished orjson_matches_the_standard_library")
+
+    def test_encoder_choice(self):
+        logger.debug("Starting encoder_choice")
+        with mock.patch.object(encoders, 'orjson', None):
+            self.assertIs(encoders.get_encoder(), encoders.encode_stdlib)
+        if encoders.orjson is not None:
+            self.assertIs(encoders.get_encoder(), encoders.encode_orjson)
+        with override_settings(CMS_GRAPHQL_JSON_ENCODER='cms_content.encoders.encode_stdlib'):
+            self.assertIs(encoders.get_encoder(), encoders.encode_stdlib)
+        logger.debug("Finished encoder_choice")
+
+
+@override_settings(CMS_GRAPHQL_PROFILE=False, CMS_GRAPHQL_JSON_ENCODER='cms_content.encoders.encode_stdlib')
+class EndpointEncoderTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def test_responses_use_the_configured_encoder(self):
+        logger.debug("Starting responses_use_the_configured_encoder")
+        Page.objects.create(title="Café")
+        query = '{ allPages { edges { node { title } } } }'
+        with mock.patch.object(encoders, 'encode_stdlib', wraps=encoders.encode_stdlib) as encode:
+            response = self.query(query)
+            self.assertIn(b'Caf\\u00e9', response.content)
+            streamed = self.client.post(f'{self.GRAPHQL_URL}?stream=1', json.dumps({'query': query}),
+                                        content_type='application/json')
+            self.assertEqual(json.loads(b''.join(streamed.streaming_content)), json.loads(response.content))
+        # The whole response, then each part of the stream
+        self.assertGreater(encode.call_count, 2)
+        logger.debug("Finished responses_use_the_configured_encoder")
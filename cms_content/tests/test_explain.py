@@ -0,0 +1,27 @@
+import io
+import logging
+
+from django.core.management import call_command
+from django.test import TestCase
+from cms_content.management.commands.explain_queries import get_full_scans
+
+logger = logging.getLogger(__name__)
+
+
+class ExplainQueriesTests(TestCase):
+    def test_resolver_queries_use_indexes(self):
+        logger.debug("Starting resolver_queries_use_indexes")
+        stdout = io.StringIO()
+        call_command('explain_queries', strict=True, stdout=stdout)
+        self.assertIn("allLinks(location, LABEL_DESC): ok", stdout.getvalue())
+        logger.debug("Finished resolver_queries_use_indexes")
+
+    def test_full_scans_and_sorts_are_flagged(self):
+        logger.debug("Starting full_scans_and_sorts_are_flagged")
+        plan = "4 0 0 SCAN cms_content_post\n27 0 0 USE TEMP B-TREE FOR ORDER BY"
+        self.assertEqual(get_full_scans(plan), ["SCAN cms_content_post"])
+        self.assertEqual(len(get_full_scans(plan, limited=True)), 2)
+        self.assertEqual(get_full_scans("5 0 0 SCAN cms_content_post USING INDEX post_created_idx"), [])
+        # Walking the table in rowid order stops at the LIMIT
+        self.assertEqual(get_full_scans("4 0 0 SCAN cms_content_link", limited=True), [])
+        logger.debug("Finished full_scans_and_sorts_are_flagged")
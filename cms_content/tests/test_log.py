@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import sys
+import unittest
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+from MyDjango.log import BackgroundHandler, JSONFormatter, SamplingFilter
+
+logger = logging.getLogger(__name__)
+
+
+def make_record(name='cms_content', level=logging.INFO, msg="Hello %s", args=('world',), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class LoggingPipelineTests(SimpleTestCase):
+
+    def test_json_records_carry_extra_values(self):
+        logger.debug("Starting json_records_carry_extra_values")
+        record = make_record(graphql_profile={'sql': {'count': 2}})
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual((entry['level'], entry['logger'], entry['message']), ('INFO', 'cms_content', "Hello world"))
+        self.assertEqual(entry['graphql_profile'], {'sql': {'count': 2}})
+        self.assertNotIn('args', entry)
+        logger.debug("Finished json_records_carry_extra_values")
+
+    def test_sampling_follows_the_closest_logger(self):
+        logger.debug("Starting sampling_follows_the_closest_logger")
+        sampler = SamplingFilter({'django.db.backends': 10, 'django.db.backends.schema': 1})
+        kept = [sampler.filter(make_record('django.db.backends')) for _ in range(30)]
+        self.assertEqual(kept.count(True), 3)
+        self.assertTrue(all(sampler.filter(make_record('django.db.backends.schema')) for _ in range(5)))
+        self.assertTrue(sampler.filter(make_record('django.db.backends', logging.WARNING)))
+        self.assertTrue(sampler.filter(make_record('django.request')))
+        logger.debug("Finished sampling_follows_the_closest_logger")
+
+    def test_background_handler_writes_and_rotates(self):
+        logger.debug("Starting background_handler_writes_and_rotates")
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'cms.log'
+            handler = BackgroundHandler(path, max_bytes=2000, backup_count=2)
+            handler.setFormatter(JSONFormatter())
+            try:
+                try:
+                    1 / 0
+                except ZeroDivisionError:
+                    handler.handle(make_record(level=logging.ERROR, exc_info=sys.exc_info()))
+                # Arguments are merged on the caller's thread, so later changes do not show
+                items = ['first']
+                handler.handle(make_record(args=(items,)))
+                items.append('second')
+                handler.flush()
+                error, message = [json.loads(line) for line in path.read_text().splitlines()]
+                self.assertIn('ZeroDivisionError', error['exception'])
+                self.assertEqual(message['message'], "Hello ['first']")
+                for i in range(50):
+                    handler.handle(make_record(args=(i,)))
+                handler.flush()
+            finally:
+                handler.close()
+            logs = sorted(path.parent.iterdir(), reverse=True)
+            self.assertEqual([log.name for log in logs], ['cms.log.2', 'cms.log.1', 'cms.log'])
+            self.assertTrue(all(log.stat().st_size <= 2000 for log in logs))
+            self.assertEqual(json.loads(logs[-1].read_text().splitlines()[-1])['message'], "Hello 49")
+        logger.debug("Finished background_handler_writes_and_rotates")
+
+    def test_full_queue_drops_records(self):
+        logger.debug("Starting full_queue_drops_records")
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'cms.log'
+            handler = BackgroundHandler(path, queue_size=2)
+            handler.setFormatter(JSONFormatter())
+            # A writer that cannot keep up
+            handler.start()
+            handler.listener.stop()
+            for i in range(5):
+                handler.handle(make_record(args=(i,)))
+            self.assertEqual(handler.dropped, 3)
+            handler.listener.start()
+            handler.close()
+            messages = [json.loads(line)['message'] for line in path.read_text().splitlines()]
+            self.assertEqual(messages, ["Hello 0", "Hello 1"])
+        logger.debug("Finished full_queue_drops_records")
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "Needs os.fork()")
+    def test_forked_processes_start_their_own_writer(self):
+        logger.debug("Starting forked_processes_start_their_own_writer")
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'cms.log'
+            handler = BackgroundHandler(path)
+            handler.setFormatter(JSONFormatter())
+            try:
+                handler.handle(make_record(args=('parent',)))
+                handler.flush()
+                pid = os.fork()
+                if pid == 0:
+                    # The child has the handler but not the parent's thread
+                    try:
+                        handler.handle(make_record(args=('child',)))
+                        handler.flush()
+                    finally:
+                        os._exit(0)
+                os.waitpid(pid, 0)
+            finally:
+                handler.close()
+            messages = [json.loads(line)['message'] for line in path.read_text().splitlines()]
+            self.assertEqual(messages, ["Hello parent", "Hello child"])
+        logger.debug("Finished forked_processes_start_their_own_writer")
@@ -71,3 +71,173 @@ class ModelTest(TestCase):
         page.delete()
         self.assertFalse(Link.objects.filter(page_id=page_id).exists())
         logger.debug("Finished page_deletion_deletes_link")
+
+
+class PageLinkSyncQueryTests(TestCase):
+    def test_page_creation_writes_page_and_link_once(self):
+        logger.debug("Starting page_creation_writes_page_and_link_once")
+        # INSERT page, INSERT search row, INSERT link
+        with self.assertNumQueries(3):
+            page = Page.objects.create(title="Test Page", page_link_location='navbar', order=3)
+        link = Link.objects.get(page=page)
+        self.assertEqual((link.location, link.order), ('navbar', 3))
+        page.refresh_from_db()
+        self.assertEqual(page.order, 3)
+        logger.debug("Finished page_creation_writes_page_and_link_once")
+
+    def test_page_update_writes_only_changed_link_fields(self):
+        logger.debug("Starting page_update_writes_only_changed_link_fields")
+        page = create_page()
+        page.title = "Updated Title"
+        # UPDATE page, reindex (DELETE, INSERT), SELECT link, UPDATE link, UPDATE descendants
+        with self.assertNumQueries(6) as queries:
+            page.save()
+        link_update = queries.captured_queries[4]['sql']
+        self.assertIn('"label"', link_update)
+        self.assertNotIn('"location"', link_update)
+        self.assertEqual(Link.objects.get(page=page).label, "Updated Title")
+        logger.debug("Finished page_update_writes_only_changed_link_fields")
+
+    def test_unchanged_page_save_leaves_link_alone(self):
+        logger.debug("Starting unchanged_page_save_leaves_link_alone")
+        page = create_page()
+        page.content = "New content"
+        # UPDATE page, reindex (DELETE, INSERT), SELECT link
+        with self.assertNumQueries(4):
+            page.save()
+        with self.assertNumQueries(1):
+            page.save(update_fields=['show_in_position'])
+        logger.debug("Finished unchanged_page_save_leaves_link_alone")
+
+    def test_link_update_writes_page_once(self):
+        logger.debug("Starting link_update_writes_page_once")
+        page = create_page()
+        link = Link.objects.get(page=page)
+        link.label = "Updated Label"
+        # UPDATE link, SELECT page, UPDATE page, reindex (DELETE, INSERT), UPDATE descendants, UPDATE link slug
+        with self.assertNumQueries(7):
+            link.save()
+        page.refresh_from_db()
+        self.assertEqual((page.title, page.slug), ("Updated Label", "updated-label"))
+        self.assertEqual(Link.objects.get(page=page).slug, "updated-label")
+        logger.debug("Finished link_update_writes_page_once")
+
+    def test_repeated_saves_keep_syncing(self):
+        logger.debug("Starting repeated_saves_keep_syncing")
+        page = create_page()
+        for status in ('published', 'private'):
+            page.page_status = status
+            page.save()
+            self.assertEqual(Link.objects.get(page=page).status, status)
+        logger.debug("Finished repeated_saves_keep_syncing")
+
+
+class PageSlugCascadeTests(TestCase):
+    def setUp(self):
+        self.about = create_page("About")
+        self.team = Page.objects.create(title="Team", parent=self.about)
+        self.jobs = Page.objects.create(title="Jobs", parent=self.team)
+        self.news = create_page("News")
+
+    def assertSlugs(self, expected):
+        slugs = dict(Page.objects.values_list('title', 'slug'))
+        link_slugs = dict(Link.objects.values_list('page__title', 'slug'))
+        for title, slug in expected.items():
+            self.assertEqual((slugs[title], link_slugs[title]), (slug, slug))
+
+    def test_renaming_a_page_reslugs_its_subtree(self):
+        logger.debug("Starting renaming_a_page_reslugs_its_subtree")
+        self.about.title = "Company"
+        self.about.save()
+        self.assertSlugs({"Company": "company", "Team": "company/team", "Jobs": "company/team/jobs",
+                          "News": "news"})
+        logger.debug("Finished renaming_a_page_reslugs_its_subtree")
+
+    def test_moving_a_page_reslugs_its_subtree(self):
+        logger.debug("Starting moving_a_page_reslugs_its_subtree")
+        self.team.parent = self.news
+        self.team.save(update_fields=['parent'])
+        self.assertSlugs({"About": "about", "Team": "news/team", "Jobs": "news/team/jobs"})
+        logger.debug("Finished moving_a_page_reslugs_its_subtree")
+
+    def test_pages_cannot_move_below_themselves(self):
+        logger.debug("Starting pages_cannot_move_below_themselves")
+        for parent in (self.about, self.team, self.jobs):
+            self.about.parent = parent
+            with self.assertRaises(ValidationError):
+                self.about.clean()
+            with self.assertRaises(ValidationError):
+                self.about.save()
+        self.about.parent = self.jobs
+        with self.assertRaises(ValidationError):
+            self.about.save(update_fields=['parent'])
+        self.assertSlugs({"About": "about", "Team": "about/team", "Jobs": "about/team/jobs"})
+        # A sibling subtree is no cycle
+        self.about.parent = self.news
+        self.about.clean()
+        self.about.save()
+        self.assertSlugs({"About": "news/about", "Jobs": "news/about/team/jobs"})
+        logger.debug("Finished pages_cannot_move_below_themselves")
+
+    def test_reslugging_marks_the_subtree_updated(self):
+        logger.debug("Starting reslugging_marks_the_subtree_updated")
+        before = Page.objects.get(pk=self.jobs.pk).updated
+        link_before = Link.objects.get(page=self.jobs).updated
+        self.about.title = "Company"
+        self.about.save()
+        self.assertGreater(Page.objects.get(pk=self.jobs.pk).updated, before)
+        self.assertGreater(Link.objects.get(page=self.jobs).updated, link_before)
+        self.assertEqual(Page.objects.get(pk=self.news.pk).updated, self.news.updated)
+        logger.debug("Finished reslugging_marks_the_subtree_updated")
+
+    def test_renaming_through_the_link_reslugs_the_subtree(self):
+        logger.debug("Starting renaming_through_the_link_reslugs_the_subtree")
+        link = Link.objects.get(page=self.team)
+        link.label = "People"
+        link.save()
+        self.assertSlugs({"People": "about/people", "Jobs": "about/people/jobs"})
+        logger.debug("Finished renaming_through_the_link_reslugs_the_subtree")
+
+    def test_cascade_queries_do_not_grow_with_the_subtree(self):
+        logger.debug("Starting cascade_queries_do_not_grow_with_the_subtree")
+        parent = self.jobs
+        for depth in range(30):
+            parent = Page.objects.create(title=f"Level {depth}", parent=parent)
+            Page.objects.create(title=f"Sibling {depth}", parent=parent.parent)
+        self.about.title = "Company"
+        # UPDATE page, reindex (DELETE, INSERT), SELECT link, UPDATE link, UPDATE pages, UPDATE links
+        with self.assertNumQueries(7):
+            self.about.save()
+        self.assertSlugs({"Level 29": "company/team/jobs/" + "/".join(f"level-{i}" for i in range(30))})
+        self.assertFalse(Page.objects.filter(slug__startswith="about").exists())
+        logger.debug("Finished cascade_queries_do_not_grow_with_the_subtree")
+
+
+class PageTreeTests(TestCase):
+    def setUp(self):
+        self.about = create_page("About")
+        self.team = Page.objects.create(title="Team", parent=self.about)
+        self.jobs = Page.objects.create(title="Jobs", parent=self.team)
+        self.history = Page.objects.create(title="History", parent=self.about)
+        # Shares the "about" prefix without being below it
+        create_page("About Us")
+
+    def test_ancestors_descendants_and_breadcrumbs(self):
+        logger.debug("Starting ancestors_descendants_and_breadcrumbs")
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.jobs.get_ancestors()), [self.about, self.team])
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.about.get_descendants()), [self.team, self.history, self.jobs])
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.jobs.get_breadcrumbs()), [self.about, self.team, self.jobs])
+        self.assertEqual(list(self.about.get_ancestors()), [])
+        logger.debug("Finished ancestors_descendants_and_breadcrumbs")
+
+    def test_tree_follows_moves(self):
+        logger.debug("Starting tree_follows_moves")
+        self.team.parent = self.history
+        self.team.save()
+        self.jobs.refresh_from_db()
+        self.assertEqual(list(self.jobs.get_ancestors()), [self.about, self.history, self.team])
+        self.assertEqual(list(self.history.get_descendants()), [self.team, self.jobs])
+        logger.debug("Finished tree_follows_moves")
@@ -0,0 +1,99 @@
+import json
+import logging
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import override_settings
+from graphene_django.utils.testing import GraphQLTestCase
+from cms_content.models import Page, Link
+from cms_content.navigation import navigation_trees
+from cms_content.versions import get_version_cache, get_version_key, make_version
+
+logger = logging.getLogger(__name__)
+
+QUERY = '''query ($location: String!) {
+    navigation(location: $location) { label slug order children { label slug children { label } } }
+}'''
+
+
+class NavigationTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        cache.clear()
+        navigation_trees.clear()
+        self.about = Page.objects.create(title="About", page_link_location='navbar', page_status='published', order=2)
+        Page.objects.create(title="Home", page_link_location='navbar', page_status='published', order=1)
+        self.team = Page.objects.create(title="Team", parent=self.about, page_link_location='navbar',
+                                        page_status='published')
+        # A draft in the middle of the chain: Jobs nests under Team instead
+        self.hidden = Page.objects.create(title="Hidden", parent=self.team, page_link_location='navbar')
+        Page.objects.create(title="Jobs", parent=self.hidden, page_link_location='navbar', page_status='published')
+        Page.objects.create(title="Imprint", page_link_location='footer', page_status='published')
+
+    def get_navigation(self, location='navbar'):
+        response = self.query(QUERY, variables={'location': location})
+        self.assertResponseNoErrors(response)
+        return json.loads(response.content)['data']['navigation']
+
+    def test_links_are_nested_along_the_page_tree(self):
+        logger.debug("Starting links_are_nested_along_the_page_tree")
+        navigation = self.get_navigation()
+        self.assertEqual([item['label'] for item in navigation], ["Home", "About"])
+        about = navigation[1]
+        self.assertEqual([child['label'] for child in about['children']], ["Team"])
+        self.assertEqual(about['children'][0]['slug'], "about/team")
+        self.assertEqual(about['children'][0]['children'], [{'label': "Jobs"}])
+        self.assertEqual([item['label'] for item in self.get_navigation('footer')], ["Imprint"])
+        logger.debug("Finished links_are_nested_along_the_page_tree")
+
+    def test_built_tree_is_served_without_queries(self):
+        logger.debug("Starting built_tree_is_served_without_queries")
+        # The linked pages' slugs come with the links, unlinked pages are not read
+        Page.objects.bulk_create(Page(title=f"Unlinked {i}", slug=f"unlinked-{i}") for i in range(20))
+        with self.assertNumQueries(1):
+            navigation_trees.get('navbar')
+        with self.assertNumQueries(0):
+            navigation_trees.get('navbar')
+        logger.debug("Finished built_tree_is_served_without_queries")
+
+    def test_saving_pages_and_links_rebuilds_the_tree(self):
+        logger.debug("Starting saving_pages_and_links_rebuilds_the_tree")
+        self.get_navigation()
+        self.hidden.page_status = 'published'
+        self.hidden.save()
+        team = self.get_navigation()[1]['children'][0]
+        self.assertEqual([child['label'] for child in team['children']], ["Hidden"])
+
+        link = Link.objects.get(page=self.team)
+        link.location = 'footer'
+        link.save()
+        self.assertEqual(len(self.get_navigation('footer')), 2)
+        link.delete()
+        self.assertEqual(len(self.get_navigation('footer')), 1)
+        logger.debug("Finished saving_pages_and_links_rebuilds_the_tree")
+
+    def test_bumps_from_other_processes_rebuild_the_tree(self):
+        logger.debug("Starting bumps_from_other_processes_rebuild_the_tree")
+        # A per-process cache would keep the stamps from other workers and commands
+        self.assertNotIsInstance(get_version_cache(), LocMemCache)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        versions = {**settings.CACHES['versions'], 'LOCATION': directory.name}
+        with override_settings(CACHES={**settings.CACHES, 'versions': versions}):
+            self.assertEqual([item.label for item in navigation_trees.get('navbar')], ["Home", "About"])
+            # Written without signals, as import_content does from its own process
+            Link.objects.filter(page=self.about).update(label="Company")
+            self.assertEqual([item.label for item in navigation_trees.get('navbar')], ["Home", "About"])
+            # A second client of the same cache, like the one the command opens
+            other = caches.create_connection('versions')
+            other.set(get_version_key(Link), make_version(), timeout=None)
+            self.assertEqual([item.label for item in navigation_trees.get('navbar')], ["Home", "Company"])
+        logger.debug("Finished bumps_from_other_processes_rebuild_the_tree")
+
+    def test_unknown_location_is_rejected(self):
+        logger.debug("Starting unknown_location_is_rejected")
+        self.assertResponseHasErrors(self.query(QUERY, variables={'location': 'nowhere'}))
+        logger.debug("Finished unknown_location_is_rejected")
@@ -0,0 +1,70 @@
+import json
+import logging
+
+from django.core.cache import cache
+from django.test import override_settings
+from graphene_django.utils.testing import GraphQLTestCase
+from cms_content.models import Page
+from cms_content.views import document_cache
+
+logger = logging.getLogger(__name__)
+
+QUERY = 'query Pages { allPages { edges { node { title children { title } } } } }'
+
+
+@override_settings(CMS_GRAPHQL_PROFILE=True, CMS_GRAPHQL_PROFILE_EXTENSIONS=True)
+class ProfilingTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        cache.clear()
+        document_cache.clear()
+        parent = Page.objects.create(title="Parent")
+        Page.objects.create(title="Child", parent=parent)
+
+    def get_profile(self, query):
+        response = self.query(query)
+        self.assertResponseNoErrors(response)
+        return json.loads(response.content)['extensions']['profile']
+
+    def test_queries_are_charged_to_fields(self):
+        logger.debug("Starting queries_are_charged_to_fields")
+        profile = self.get_profile(QUERY)
+        self.assertEqual(profile['operation'], 'Pages')
+        self.assertFalse(profile['cached'])
+        self.assertEqual(profile['sql']['count'], 2)
+        self.assertEqual(profile['sql']['repeated'], [])
+        fields = {field['path']: field for field in profile['fields']}
+        # The pages and their prefetched children are read by the connection
+        self.assertEqual(fields['allPages']['queries'], 2)
+        self.assertEqual(fields['allPages.edges.node.children']['calls'], 2)
+        self.assertEqual(fields['allPages.edges.node.children']['queries'], 0)
+        self.assertNotIn('allPages.edges.node.title', fields)
+        self.assertEqual(self.get_profile(QUERY)['cached'], True)
+        self.assertEqual(self.get_profile(QUERY)['sql']['count'], 0)
+        logger.debug("Finished queries_are_charged_to_fields")
+
+    def test_repeated_queries_are_reported_and_logged(self):
+        logger.debug("Starting repeated_queries_are_reported_and_logged")
+        query = '{ first: allPages { edges { node { title } } } again: allPages { edges { node { title } } } }'
+        with self.assertLogs('cms_content.profiling', 'INFO') as logs:
+            profile = self.get_profile(query)
+        repeated, = profile['sql']['repeated']
+        self.assertEqual((repeated['count'], repeated['identical'], repeated['fields']), (2, 1, ['again', 'first']))
+        self.assertIn('FROM "cms_content_page"', repeated['sql'])
+        summary, warning = logs.records
+        self.assertEqual(summary.graphql_profile['sql']['count'], 2)
+        self.assertEqual(warning.levelname, 'WARNING')
+        self.assertEqual(warning.graphql_repeated_query, repeated)
+        logger.debug("Finished repeated_queries_are_reported_and_logged")
+
+    def test_extensions_can_be_turned_off(self):
+        logger.debug("Starting extensions_can_be_turned_off")
+        with override_settings(CMS_GRAPHQL_PROFILE_EXTENSIONS=False):
+            with self.assertLogs('cms_content.profiling', 'INFO'):
+                response = self.query(QUERY)
+        self.assertNotIn('extensions', json.loads(response.content))
+        with override_settings(CMS_GRAPHQL_PROFILE=False):
+            response = self.query(QUERY)
+        self.assertNotIn('extensions', json.loads(response.content))
+        logger.debug("Finished extensions_can_be_turned_off")
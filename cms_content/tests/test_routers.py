@@ -0,0 +1,62 @@
+import logging
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+from cms_content.models import Page
+from cms_content.routers import ReadReplicaRouter
+
+logger = logging.getLogger(__name__)
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+
+    def test_content_reads_go_to_the_replica(self):
+        logger.debug("Starting content_reads_go_to_the_replica")
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Page), 'replica')
+        self.assertIsNone(router.db_for_read(User))
+        self.assertEqual(router.db_for_write(Page), 'default')
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(router.db_for_read(Page), 'default')
+        logger.debug("Finished content_reads_go_to_the_replica")
+
+    def test_replica_is_not_migrated(self):
+        logger.debug("Starting replica_is_not_migrated")
+        router = ReadReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica', 'cms_content'))
+        self.assertIsNone(router.allow_migrate('default', 'cms_content'))
+        logger.debug("Finished replica_is_not_migrated")
+
+
+class SQLiteConnectionTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def get_pragma(self, alias, name):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        logger.debug("Starting pragmas_are_applied")
+        self.assertEqual(self.get_pragma('default', 'synchronous'), 1)
+        self.assertEqual(self.get_pragma('default', 'cache_size'), -32768)
+        self.assertEqual(self.get_pragma('default', 'query_only'), 0)
+        self.assertEqual(self.get_pragma('replica', 'query_only'), 1)
+        logger.debug("Finished pragmas_are_applied")
+
+    def test_replica_reads_committed_rows_and_refuses_writes(self):
+        logger.debug("Starting replica_reads_committed_rows_and_refuses_writes")
+        page = Page.objects.create(title="Home")
+        read = Page.objects.get(pk=page.pk)
+        self.assertEqual(read._state.db, 'replica')
+        # Saved through the default connection all the same
+        read.title = "Start"
+        read.save()
+        self.assertEqual(Page.objects.get(pk=page.pk).title, "Start")
+        with transaction.atomic():
+            self.assertEqual(Page.objects.get(pk=page.pk)._state.db, 'default')
+        with self.assertRaises(OperationalError):
+            Page.objects.using('replica').filter(pk=page.pk).update(title="Nope")
+        logger.debug("Finished replica_reads_committed_rows_and_refuses_writes")
@@ -0,0 +1,67 @@
+import json
+import logging
+
+from django.core.cache import cache
+from graphene_django.utils.testing import GraphQLTestCase
+from cms_content.models import Page, Link
+from cms_content.routes import route_table
+
+logger = logging.getLogger(__name__)
+
+QUERY = 'query ($path: String!) { pageBySlug(path: $path) { title slug parent { title } } }'
+
+
+class RouteTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        cache.clear()
+        route_table.clear()
+        self.about = Page.objects.create(title="About", page_status='published')
+        self.team = Page.objects.create(title="Team", parent=self.about, page_status='published')
+        Page.objects.create(title="Draft", parent=self.about)
+        Link.objects.create(label="Shop", url='https://shop.example.com', status='published')
+
+    def get_page(self, path):
+        response = self.query(QUERY, variables={'path': path})
+        self.assertResponseNoErrors(response)
+        return json.loads(response.content)['data']['pageBySlug']
+
+    def test_page_by_slug(self):
+        logger.debug("Starting page_by_slug")
+        route_table.get('')
+        # Version check, page with its parent joined
+        with self.assertNumQueries(1):
+            page = self.get_page('/about/team/')
+        self.assertEqual(page, {'title': "Team", 'slug': "about/team", 'parent': {'title': "About"}})
+        self.assertIsNone(self.get_page('about/draft'))
+        self.assertIsNone(self.get_page('shop'))
+        logger.debug("Finished page_by_slug")
+
+    def test_route_endpoint(self):
+        logger.debug("Starting route_endpoint")
+        response = self.client.get('/routes/about/team/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'type': 'page', 'id': self.team.pk, 'slug': "about/team",
+                                           'title': "Team", 'url': None})
+        shop = self.client.get('/routes/shop').json()
+        self.assertEqual((shop['type'], shop['url']), ('link', 'https://shop.example.com'))
+        self.assertEqual(self.client.get('/routes/about/draft').status_code, 404)
+        logger.debug("Finished route_endpoint")
+
+    def test_etag_revalidation(self):
+        logger.debug("Starting etag_revalidation")
+        etag = self.client.get('/routes/about').headers['ETag']
+        response = self.client.get('/routes/about', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        # Another page changing leaves this route's ETag alone
+        self.team.content = "New"
+        self.team.save()
+        self.assertEqual(self.client.get('/routes/about', headers={'If-None-Match': etag}).status_code, 304)
+        self.about.title = "Company"
+        self.about.save()
+        self.assertEqual(self.client.get('/routes/about').status_code, 404)
+        response = self.client.get('/routes/company', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/routes/company/team').json()['slug'], "company/team")
+        logger.debug("Finished etag_revalidation")
@@ -0,0 +1,229 @@
+import base64
+import datetime
+import json
+import logging
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from graphene_django.utils.testing import GraphQLTestCase
+from cms_content.models import Page, Link, Post
+
+logger = logging.getLogger(__name__)
+
+
+def get_nodes(response, field):
+    return [edge['node'] for edge in json.loads(response.content)['data'][field]['edges']]
+
+
+class SchemaBatchingTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def create_pages(self, count):
+        parent = Page.objects.create(title=f"Parent {count}")
+        for i in range(count):
+            Page.objects.create(title=f"Page {count} {i}", parent=parent, order=i)
+
+    def create_posts(self, count):
+        for i in range(count):
+            author = User.objects.create(username=f'author-{count}-{i}')
+            Post.objects.create(title=f"Post {count} {i}", content="Test Content", author=author)
+
+    def assertQueryCount(self, query, field, num, sizes=(3, 20)):
+        # The query count must not grow with the number of rows
+        for size in sizes:
+            self.create_pages(size)
+            self.create_posts(size)
+            with self.assertNumQueries(num):
+                response = self.query(query)
+            self.assertResponseNoErrors(response)
+        return get_nodes(response, field)
+
+    def test_link_page_parent_is_batched(self):
+        logger.debug("Starting link_page_parent_is_batched")
+        nodes = self.assertQueryCount(
+            '{ allLinks { edges { node { label page { title parent { title } } } } } }', 'allLinks', 1)
+        labels = {link['label']: link['page']['parent'] for link in nodes}
+        self.assertEqual(labels["Page 20 0"], {'title': "Parent 20"})
+        self.assertIsNone(labels["Parent 20"])
+        logger.debug("Finished link_page_parent_is_batched")
+
+    def test_page_children_and_link_are_batched(self):
+        logger.debug("Starting page_children_and_link_are_batched")
+        nodes = self.assertQueryCount(
+            '{ allPages { edges { node { title children { title } link { slug } } } } }', 'allPages', 3)
+        pages = {page['title']: page for page in nodes}
+        self.assertEqual(len(pages["Parent 3"]['children']), 3)
+        self.assertEqual(pages["Page 3 1"]['link']['slug'], "parent-3/page-3-1")
+        logger.debug("Finished page_children_and_link_are_batched")
+
+    def test_page_tree_fields_are_batched(self):
+        logger.debug("Starting page_tree_fields_are_batched")
+        # Pages, ancestors, descendants
+        nodes = self.assertQueryCount(
+            '{ allPages { edges { node { title breadcrumbs { slug } ancestors { title } descendants { title } } } } }',
+            'allPages', 3)
+        pages = {page['title']: page for page in nodes}
+        self.assertEqual(pages["Page 3 1"]['breadcrumbs'], [{'slug': "parent-3"}, {'slug': "parent-3/page-3-1"}])
+        self.assertEqual(pages["Page 3 1"]['ancestors'], [{'title': "Parent 3"}])
+        self.assertEqual([page['title'] for page in pages["Parent 3"]['descendants']],
+                         ["Page 3 0", "Page 3 1", "Page 3 2"])
+        self.assertEqual(pages["Parent 20"]['ancestors'], [])
+        logger.debug("Finished page_tree_fields_are_batched")
+
+    def test_post_author_is_batched(self):
+        logger.debug("Starting post_author_is_batched")
+        nodes = self.assertQueryCount(
+            '{ allPosts { edges { node { title author { username } } } } }', 'allPosts', 1)
+        authors = {post['title']: post['author']['username'] for post in nodes}
+        self.assertEqual(authors["Post 20 5"], 'author-20-5')
+        logger.debug("Finished post_author_is_batched")
+
+
+class SchemaOptimizerTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        self.author = User.objects.create(username='testuser')
+        parent = Page.objects.create(title="Parent Page")
+        for i in range(5):
+            Page.objects.create(title=f"Child Page {i}", parent=parent, order=i)
+            Post.objects.create(title=f"Post {i}", content="Test Content", meta_description="Meta",
+                                author=self.author)
+
+    def test_unselected_columns_are_not_loaded(self):
+        logger.debug("Starting unselected_columns_are_not_loaded")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.query('{ allPosts { edges { node { title slug } } } }')
+        self.assertResponseNoErrors(response)
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('"slug"', sql)
+        self.assertNotIn('"content"', sql)
+        self.assertNotIn('"meta_description"', sql)
+        logger.debug("Finished unselected_columns_are_not_loaded")
+
+    def test_forward_relations_are_joined(self):
+        logger.debug("Starting forward_relations_are_joined")
+        # `page.link` leads back to the link itself, so everything fits in one join
+        with self.assertNumQueries(1):
+            response = self.query(
+                '{ allLinks { edges { node { label page { title parent { slug } link { slug } } } } } }')
+        self.assertResponseNoErrors(response)
+        links = {link['label']: link['page'] for link in get_nodes(response, 'allLinks')}
+        self.assertEqual(links["Child Page 2"]['parent'], {'slug': "parent-page"})
+        self.assertEqual(links["Child Page 2"]['link'], {'slug': "parent-page/child-page-2"})
+        logger.debug("Finished forward_relations_are_joined")
+
+    def test_reverse_relations_are_prefetched(self):
+        logger.debug("Starting reverse_relations_are_prefetched")
+        query = '''
+            query { allPages { edges { node { ...PageFields } } } }
+            fragment PageFields on PageType { title children { title path: slug } }
+        '''
+        with self.assertNumQueries(2):
+            response = self.query(query)
+        self.assertResponseNoErrors(response)
+        pages = {page['title']: page for page in get_nodes(response, 'allPages')}
+        self.assertEqual(len(pages["Parent Page"]['children']), 5)
+        logger.debug("Finished reverse_relations_are_prefetched")
+
+
+class SchemaPaginationTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        author = User.objects.create(username='testuser')
+        for i in range(5):
+            # Two pages per order value, so the id tie-breaker matters
+            Page.objects.create(title=f"Page {i}", order=i // 2)
+            Post.objects.create(title=f"Post {i}", author=author)
+        # Posts sharing a timestamp must still page in a stable order
+        Post.objects.update(created=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+
+    def query_page(self, field, arguments):
+        arguments = f'({arguments})' if arguments else ''
+        response = self.query(f'''{{ {field}{arguments} {{
+            edges {{ cursor node {{ title }} }}
+            pageInfo {{ hasNextPage hasPreviousPage startCursor endCursor }}
+        }} }}''')
+        self.assertResponseNoErrors(response)
+        return json.loads(response.content)['data'][field]
+
+    def walk(self, field, size):
+        titles, after = [], None
+        while True:
+            arguments = f'first: {size}' + (f', after: "{after}"' if after else '')
+            data = self.query_page(field, arguments)
+            titles.extend(edge['node']['title'] for edge in data['edges'])
+            if not data['pageInfo']['hasNextPage']:
+                return titles
+            after = data['pageInfo']['endCursor']
+
+    def test_forward_pagination_visits_every_row_once(self):
+        logger.debug("Starting forward_pagination_visits_every_row_once")
+        pages = list(Page.objects.order_by('order', 'id').values_list('title', flat=True))
+        self.assertEqual(self.walk('allPages', 2), pages)
+        posts = list(Post.objects.order_by('-created', '-id').values_list('title', flat=True))
+        self.assertEqual(self.walk('allPosts', 2), posts)
+        logger.debug("Finished forward_pagination_visits_every_row_once")
+
+    def test_backward_pagination(self):
+        logger.debug("Starting backward_pagination")
+        first = self.query_page('allPages', 'first: 4')
+        data = self.query_page('allPages', f'last: 2, before: "{first["pageInfo"]["endCursor"]}"')
+        self.assertEqual([edge['node']['title'] for edge in data['edges']], ["Page 1", "Page 2"])
+        self.assertTrue(data['pageInfo']['hasPreviousPage'])
+        self.assertTrue(data['pageInfo']['hasNextPage'])
+        logger.debug("Finished backward_pagination")
+
+    def test_page_size_is_capped(self):
+        logger.debug("Starting page_size_is_capped")
+        with override_settings(GRAPHENE={'SCHEMA': 'cms_content.schema.schema', 'RELAY_CONNECTION_MAX_LIMIT': 2}):
+            data = self.query_page('allPosts', 'first: 100')
+            self.assertEqual(len(data['edges']), 2)
+            self.assertTrue(data['pageInfo']['hasNextPage'])
+            self.assertEqual(len(self.query_page('allPages', '')['edges']), 2)
+        logger.debug("Finished page_size_is_capped")
+
+    def test_page_is_a_single_limited_query(self):
+        logger.debug("Starting page_is_a_single_limited_query")
+        after = self.query_page('allPosts', 'first: 2')['pageInfo']['endCursor']
+        with CaptureQueriesContext(connection) as queries:
+            self.query_page('allPosts', f'first: 2, after: "{after}"')
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 3', queries[0]['sql'])
+        logger.debug("Finished page_is_a_single_limited_query")
+
+    def test_links_order_by_column(self):
+        logger.debug("Starting links_order_by_column")
+        titles = [edge['node']['title'] for edge in self.query_page('allPages', '')['edges']]
+        response = self.query('{ allLinks(orderBy: LABEL_DESC) { edges { node { label } } } }')
+        self.assertResponseNoErrors(response)
+        self.assertEqual([link['label'] for link in get_nodes(response, 'allLinks')], sorted(titles, reverse=True))
+        response = self.query('{ allLinks(orderBy: ID_DESC, first: 2) { edges { node { label } } } }')
+        self.assertEqual([link['label'] for link in get_nodes(response, 'allLinks')], ["Page 4", "Page 3"])
+        logger.debug("Finished links_order_by_column")
+
+    def test_invalid_arguments_are_rejected(self):
+        logger.debug("Starting invalid_arguments_are_rejected")
+        for query in ('{ allPosts(after: "not a cursor") { edges { cursor } } }',
+                      '{ allPosts(first: -1) { edges { cursor } } }',
+                      '{ allPosts(first: 1, last: 1) { edges { cursor } } }',
+                      '{ allLinks(orderBy: "page__content") { edges { cursor } } }',
+                      '{ allLinks(orderBy: PAGE_CONTENT) { edges { cursor } } }'):
+            self.assertResponseHasErrors(self.query(query))
+        logger.debug("Finished invalid_arguments_are_rejected")
+
+    def test_cursors_with_invalid_values_are_rejected(self):
+        logger.debug("Starting cursors_with_invalid_values_are_rejected")
+        # Decode to values neither connection's columns can hold
+        for values in (["x", "y"], [float('inf'), 1], [1, float('nan')]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            for field in ('allPosts', 'allPages'):
+                for argument in ('after', 'before'):
+                    response = self.query(f'{{ {field}({argument}: "{cursor}") {{ edges {{ cursor }} }} }}')
+                    self.assertResponseHasErrors(response)
+                    self.assertEqual(response.json()['errors'][0]['message'], f"Invalid cursor: {cursor}")
+        logger.debug("Finished cursors_with_invalid_values_are_rejected")
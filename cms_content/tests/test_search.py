@@ -0,0 +1,80 @@
+import json
+import logging
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from graphene_django.utils.testing import GraphQLTestCase
+from cms_content import search
+from cms_content.bulk import import_rows
+from cms_content.models import Page, Post
+
+logger = logging.getLogger(__name__)
+
+QUERY = '''query ($query: String!, $first: Int) {
+    search(query: $query, first: $first) { kind snippet page { title } post { title author { username } } }
+}'''
+
+
+class SearchTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        self.author = User.objects.create(username='ada')
+        self.about = Page.objects.create(title="About", content="We build gardening tools.", page_status='published')
+        Page.objects.create(title="Gardening", content="Everything about plants.", page_status='published')
+        Page.objects.create(title="Secret garden", content="Not published yet.")
+        self.post = Post.objects.create(title="Spring", content="Notes on gardens and seeds.", author=self.author,
+                                        status='published')
+
+    def get_results(self, query, first=None):
+        response = self.query(QUERY, variables={'query': query, 'first': first})
+        self.assertResponseNoErrors(response)
+        return json.loads(response.content)['data']['search']
+
+    def test_ranked_results_with_snippets(self):
+        logger.debug("Starting ranked_results_with_snippets")
+        results = self.get_results("garden")
+        # A title match ranks first, stemming finds "gardening", drafts are left out
+        titles = [(result['kind'], (result['page'] or result['post'])['title']) for result in results]
+        self.assertEqual(titles[0], ('page', "Gardening"))
+        self.assertEqual(set(titles[1:]), {('post', "Spring"), ('page', "About")})
+        post = next(result for result in results if result['kind'] == 'post')
+        self.assertIn('<mark>gardens</mark>', post['snippet'])
+        self.assertEqual(post['post']['author'], {'username': 'ada'})
+        self.assertEqual(len(self.get_results("garden", first=1)), 1)
+        self.assertEqual(self.get_results('" OR ('), [])
+        logger.debug("Finished ranked_results_with_snippets")
+
+    def test_index_follows_saves_and_deletes(self):
+        logger.debug("Starting index_follows_saves_and_deletes")
+        self.about.content = "We sell bicycles."
+        self.about.save()
+        self.assertEqual([hit.object_id for hit in search.search("bicycles")], [self.about.pk])
+        self.assertEqual(search.search("tools"), [])
+        self.post.delete()
+        self.assertEqual([hit.kind for hit in search.search("seeds")], [])
+        self.author.username = 'grace'
+        self.author.save()
+        self.assertEqual(search.search("ada"), [])
+        logger.debug("Finished index_follows_saves_and_deletes")
+
+    def test_bulk_import_and_rebuild(self):
+        logger.debug("Starting bulk_import_and_rebuild")
+        import_rows('posts', [{'title': "Compost", 'content': "Worms", 'author': 'ada', 'status': 'published'}])
+        self.assertEqual(len(search.search("worms")), 1)
+        call_command('rebuild_search_index', stdout=open('/dev/null', 'w'))
+        self.assertEqual(len(search.search("worms")), 1)
+        self.assertEqual(len(search.search("published", published=False)), 1)
+        logger.debug("Finished bulk_import_and_rebuild")
+
+    def test_admin_search_uses_the_index(self):
+        logger.debug("Starting admin_search_uses_the_index")
+        admin = User.objects.create_superuser(username='admin', password='secret')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/cms_content/page/', {'q': 'gardening'})
+        # Unlike the API, the admin finds drafts too
+        self.assertEqual({page.title for page in response.context['cl'].result_list},
+                         {"Gardening", "About", "Secret garden"})
+        response = self.client.get('/admin/cms_content/post/', {'q': 'ada'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.post])
+        logger.debug("Finished admin_search_uses_the_index")
@@ -0,0 +1,64 @@
+import logging
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import TestCase
+from cms_content import slugs
+from cms_content.models import Link, Post
+from cms_content.slugs import allocate_slug, allocate_slugs
+
+logger = logging.getLogger(__name__)
+
+
+class SlugAllocatorTests(TestCase):
+    def test_lowest_free_suffix_is_used(self):
+        logger.debug("Starting lowest_free_suffix_is_used")
+        for slug in ("contact", "contact-2", "contact-4", "contact-us", "contacts"):
+            Link.objects.create(label=slug, slug=slug)
+        with self.assertNumQueries(1):
+            self.assertEqual(allocate_slug(Link, "contact"), "contact-3")
+        self.assertEqual(allocate_slug(Link, "contact-us"), "contact-us-2")
+        self.assertEqual(allocate_slug(Link, "contacts"), "contacts-2")
+        self.assertEqual(allocate_slug(Link, "about"), "about")
+        logger.debug("Finished lowest_free_suffix_is_used")
+
+    def test_batch_allocation(self):
+        logger.debug("Starting batch_allocation")
+        for slug in ("news", "blog-2"):
+            Link.objects.create(label=slug, slug=slug)
+        # Exact matches, then the ranges of the clashing and repeated bases
+        with self.assertNumQueries(2):
+            allocated = allocate_slugs(Link, ["news", "blog", "blog", "about", "news"])
+        self.assertEqual(allocated, ["news-2", "blog", "blog-3", "about", "news-3"])
+        logger.debug("Finished batch_allocation")
+
+    def test_slugs_fit_the_column(self):
+        logger.debug("Starting slugs_fit_the_column")
+        base = "a" * 200
+        Link.objects.create(label="Long", slug=base)
+        slug = allocate_slug(Link, base)
+        self.assertEqual((len(slug), slug[-2:]), (200, "-2"))
+        self.assertEqual(allocate_slug(Link, ""), "link")
+        logger.debug("Finished slugs_fit_the_column")
+
+    def test_models_save_with_numbered_slugs(self):
+        logger.debug("Starting models_save_with_numbered_slugs")
+        author = User.objects.create(username='testuser')
+        Post.objects.create(title="Hello", author=author)
+        self.assertEqual(Post.objects.create(title="Hello!", author=author).slug, "hello-2")
+        Link.objects.create(label="Contact")
+        self.assertEqual(Link.objects.create(label="Contact").slug, "contact-2")
+        logger.debug("Finished models_save_with_numbered_slugs")
+
+    def test_lost_race_is_retried(self):
+        logger.debug("Starting lost_race_is_retried")
+        Link.objects.create(label="Contact")
+        # Another writer took "contact" after it was picked
+        with mock.patch.object(slugs, 'allocate_slug', side_effect=["contact", "contact-2"]) as allocate:
+            link = Link.objects.create(label="Contact")
+        self.assertEqual((link.slug, allocate.call_count), ("contact-2", 2))
+        with mock.patch.object(slugs, 'allocate_slug', return_value="contact"):
+            with self.assertRaises(IntegrityError):
+                Link.objects.create(label="Contact")
+        logger.debug("Finished lost_race_is_retried")
@@ -0,0 +1,169 @@
+import json
+import logging
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from cms_content import snapshots
+from cms_content.models import Page, Link, Post
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        settings = override_settings(CMS_SNAPSHOT_ROOT=directory.name, CMS_SNAPSHOT_PAGE_SIZE=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.about = Page.objects.create(title="About", page_status='published', page_link_location='navbar')
+        self.team = Page.objects.create(title="Team", parent=self.about, page_status='published', order=1)
+        Page.objects.create(title="Draft", parent=self.about)
+        self.author = User.objects.create(username='ada')
+        self.posts = [Post.objects.create(title=f"Post {i}", author=self.author, status='published')
+                      for i in range(3)]
+        snapshots.build()
+
+    def read(self, path):
+        return json.loads((self.root / path).read_bytes())
+
+    def files(self):
+        return sorted(path.relative_to(self.root).as_posix() for path in self.root.rglob('*.json'))
+
+    def updates(self, callbacks):
+        return [callback for callback in callbacks if getattr(callback, 'func', None) is snapshots.update]
+
+    def save(self, instance, **values):
+        """Save `instance` with `values` and return the snapshot files written."""
+        for name, value in values.items():
+            setattr(instance, name, value)
+        with mock.patch.object(snapshots, 'write_atomic', wraps=snapshots.write_atomic) as write:
+            with self.captureOnCommitCallbacks(execute=True):
+                instance.save()
+        return sorted(call.args[0].relative_to(self.root).as_posix() for call in write.call_args_list)
+
+    def test_build_writes_the_published_content(self):
+        logger.debug("Starting build_writes_the_published_content")
+        self.assertEqual(self.files(), [
+            'manifest.json',
+            *(f'navigation/{location}.json' for location in sorted(snapshots.LINK_LOCATIONS)),
+            'pages/about.json', 'pages/about/team.json', 'posts/1.json', 'posts/2.json', 'posts/latest.json',
+        ])
+        team = self.read('pages/about/team.json')
+        self.assertEqual(team['data']['parent'], 'about')
+        self.assertEqual([crumb['slug'] for crumb in team['data']['breadcrumbs']], ['about', 'about/team'])
+        # The draft page is left out of its parent's children
+        self.assertEqual(self.read('pages/about.json')['data']['children'], [{'title': "Team", 'slug': 'about/team'}])
+        self.assertEqual(self.read('navigation/navbar.json')['data'][0]['slug'], 'about')
+
+        # Numbered from the oldest post, newest first within a file
+        listing = self.read('posts/latest.json')['data']
+        self.assertEqual((listing['number'], [post['title'] for post in listing['posts']]), (2, ["Post 2"]))
+        self.assertEqual((listing['posts'][0]['author'], listing['next'], listing['previous']), ('ada', 1, None))
+        listing = self.read('posts/1.json')['data']
+        self.assertEqual([post['title'] for post in listing['posts']], ["Post 1", "Post 0"])
+        self.assertEqual((listing['next'], listing['previous']), (None, 2))
+
+        manifest = self.read('manifest.json')
+        self.assertEqual(manifest['files']['pages/about.json'], self.read('pages/about.json')['version'])
+        logger.debug("Finished build_writes_the_published_content")
+
+    def test_saves_rewrite_only_the_files_they_change(self):
+        logger.debug("Starting saves_rewrite_only_the_files_they_change")
+        version = self.read('pages/about/team.json')['version']
+        self.assertEqual(self.save(self.team, content="We are hiring"), ['manifest.json', 'pages/about/team.json'])
+        self.assertNotEqual(self.read('pages/about/team.json')['version'], version)
+        self.assertEqual(self.read('manifest.json')['files']['pages/about/team.json'],
+                         self.read('pages/about/team.json')['version'])
+        # Unchanged data is not written again
+        self.assertEqual(self.save(self.team), ['manifest.json'])
+
+        self.assertEqual(self.save(self.posts[0], excerpt="First"), ['manifest.json', 'posts/1.json'])
+        self.assertEqual(self.save(Link.objects.get(page=self.about), url='/about/'),
+                         ['manifest.json', 'navigation/navbar.json'])
+        logger.debug("Finished saves_rewrite_only_the_files_they_change")
+
+    def test_page_saves_schedule_one_update(self):
+        logger.debug("Starting page_saves_schedule_one_update")
+        # A new title also saves the page's link, a new location only the link
+        for name, value in (('title', "Company"), ('page_link_location', 'footer')):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                setattr(self.about, name, value)
+                self.about.save()
+            self.assertEqual(len(self.updates(callbacks)), 1)
+        self.assertEqual(self.read('navigation/navbar.json')['data'], [])
+        self.assertEqual(self.read('navigation/footer.json')['data'][0]['slug'], 'company')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.team.refresh_from_db()
+            self.team.delete()
+        self.assertEqual(len(self.updates(callbacks)), 1)
+        self.assertNotIn('pages/company/team.json', self.files())
+        logger.debug("Finished page_saves_schedule_one_update")
+
+    def test_moving_a_page_moves_its_subtree(self):
+        logger.debug("Starting moving_a_page_moves_its_subtree")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.about.title = "Company"
+            self.about.save()
+        self.assertIn('pages/company.json', self.files())
+        self.assertIn('pages/company/team.json', self.files())
+        self.assertFalse(any(path.startswith('pages/about') for path in self.files()))
+        self.assertEqual(self.read('pages/company/team.json')['data']['parent'], 'company')
+        self.assertNotIn('pages/about.json', self.read('manifest.json')['files'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.refresh_from_db()
+            self.team.page_status = 'draft'
+            self.team.save()
+        self.assertNotIn('pages/company/team.json', self.files())
+        self.assertEqual(self.read('pages/company.json')['data']['children'], [])
+        logger.debug("Finished moving_a_page_moves_its_subtree")
+
+    def test_publishing_a_post_shifts_the_listing(self):
+        logger.debug("Starting publishing_a_post_shifts_the_listing")
+        self.assertEqual(self.save(Post(title="Post 3", author=self.author, status='published')),
+                         ['manifest.json', 'posts/2.json', 'posts/latest.json'])
+        self.assertEqual([post['title'] for post in self.read('posts/2.json')['data']['posts']], ["Post 3", "Post 2"])
+        self.assertEqual([post['title'] for post in self.read('posts/1.json')['data']['posts']], ["Post 1", "Post 0"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for post in Post.objects.order_by('created')[:2]:
+                post.delete()
+        self.assertNotIn('posts/2.json', self.files())
+        listing = self.read('posts/latest.json')['data']
+        self.assertEqual((listing['number'], listing['next'], listing['previous']), (1, None, None))
+        self.assertEqual([post['title'] for post in listing['posts']], ["Post 3", "Post 2"])
+        logger.debug("Finished publishing_a_post_shifts_the_listing")
+
+    def test_publishing_rewrites_a_bounded_number_of_listings(self):
+        logger.debug("Starting publishing_rewrites_a_bounded_number_of_listings")
+        for i in range(3, 40):
+            Post.objects.create(title=f"Post {i}", author=self.author, status='published')
+        snapshots.build()
+        # A new file, and the link to it from the one before
+        self.assertEqual(self.save(Post(title="Post 40", author=self.author, status='published')),
+                         ['manifest.json', 'posts/20.json', 'posts/21.json', 'posts/latest.json'])
+        self.assertEqual(self.save(Post(title="Post 41", author=self.author, status='published')),
+                         ['manifest.json', 'posts/21.json', 'posts/latest.json'])
+        self.assertEqual(self.read('posts/latest.json')['data']['number'], 21)
+        logger.debug("Finished publishing_rewrites_a_bounded_number_of_listings")
+
+    def test_failed_writes_keep_the_old_file(self):
+        logger.debug("Starting failed_writes_keep_the_old_file")
+        before = (self.root / 'pages/about.json').read_bytes()
+        # Saved without running the commit hooks, then written with a failing rename
+        self.about.content = "Changed"
+        self.about.save()
+        with mock.patch('os.replace', side_effect=OSError("Disk full")):
+            with self.assertRaises(OSError):
+                snapshots.update(self.root, pages={self.about.pk})
+        self.assertEqual((self.root / 'pages/about.json').read_bytes(), before)
+        self.assertFalse(list(self.root.rglob('*.tmp')))
+        logger.debug("Finished failed_writes_keep_the_old_file")
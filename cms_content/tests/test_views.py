@@ -0,0 +1,282 @@
+import hashlib
+import json
+import logging
+from unittest import mock
+
+import graphql
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import override_settings
+from graphene_django.utils.testing import GraphQLTestCase
+from cms_content.loaders import Loaders
+from cms_content.models import Page, Post
+from cms_content.views import document_cache
+
+logger = logging.getLogger(__name__)
+
+QUERY = '{ allPages { edges { node { title } } } }'
+QUERY_HASH = hashlib.sha256(QUERY.encode()).hexdigest()
+
+STREAMED_QUERY = '''{
+    navigation(location: "navbar") { label }
+    allPosts(first: 4) { pageInfo { hasNextPage endCursor } edges { cursor node { title author { username } } } }
+}'''
+
+
+class PersistedQueryTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        cache.clear()
+        document_cache.clear()
+        Page.objects.create(title="Test Page")
+
+    def persisted_query(self, query=None, sha256_hash=QUERY_HASH):
+        body = {'extensions': {'persistedQuery': {'version': 1, 'sha256Hash': sha256_hash}}}
+        if query is not None:
+            body['query'] = query
+        return self.client.post(self.GRAPHQL_URL, json.dumps(body), content_type='application/json')
+
+    def test_unknown_hash_asks_for_the_query(self):
+        logger.debug("Starting unknown_hash_asks_for_the_query")
+        response = self.persisted_query()
+        error = json.loads(response.content)['errors'][0]
+        self.assertEqual(error['message'], "PersistedQueryNotFound")
+        self.assertEqual(error['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+        logger.debug("Finished unknown_hash_asks_for_the_query")
+
+    def test_registered_hash_runs_the_query(self):
+        logger.debug("Starting registered_hash_runs_the_query")
+        self.assertResponseNoErrors(self.persisted_query(QUERY))
+        response = self.persisted_query()
+        self.assertResponseNoErrors(response)
+        data = json.loads(response.content)['data']
+        self.assertEqual(data['allPages']['edges'][0]['node']['title'], "Test Page")
+        logger.debug("Finished registered_hash_runs_the_query")
+
+    def test_registered_hash_works_over_get(self):
+        logger.debug("Starting registered_hash_works_over_get")
+        self.persisted_query(QUERY)
+        extensions = json.dumps({'persistedQuery': {'version': 1, 'sha256Hash': QUERY_HASH}})
+        response = self.client.get(self.GRAPHQL_URL, {'extensions': extensions}, HTTP_ACCEPT='application/json')
+        self.assertResponseNoErrors(response)
+        logger.debug("Finished registered_hash_works_over_get")
+
+    def test_mismatched_hash_is_rejected(self):
+        logger.debug("Starting mismatched_hash_is_rejected")
+        response = self.persisted_query(QUERY, sha256_hash='0' * 64)
+        self.assertResponseHasErrors(response)
+        self.assertIsNone(cache.get(f'cms_graphql:persisted_query:{"0" * 64}'))
+        logger.debug("Finished mismatched_hash_is_rejected")
+
+    @override_settings(CMS_GRAPHQL_PERSISTED_QUERIES=False)
+    def test_persisted_queries_can_be_disabled(self):
+        logger.debug("Starting persisted_queries_can_be_disabled")
+        self.persisted_query(QUERY)
+        self.assertEqual(self.persisted_query().status_code, 400)
+        logger.debug("Finished persisted_queries_can_be_disabled")
+
+
+class DocumentCacheTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        document_cache.clear()
+
+    def test_documents_are_parsed_once(self):
+        logger.debug("Starting documents_are_parsed_once")
+        with mock.patch('cms_content.views.parse', wraps=graphql.parse) as parse:
+            for _ in range(3):
+                self.assertResponseNoErrors(self.query(QUERY))
+        self.assertEqual(parse.call_count, 1)
+        logger.debug("Finished documents_are_parsed_once")
+
+    def test_invalid_documents_stay_invalid(self):
+        logger.debug("Starting invalid_documents_stay_invalid")
+        for _ in range(2):
+            self.assertResponseHasErrors(self.query('{ allPages { nope } }'))
+            self.assertResponseHasErrors(self.query('{ allPages {'))
+        logger.debug("Finished invalid_documents_stay_invalid")
+
+    @override_settings(CMS_GRAPHQL_DOCUMENT_CACHE_SIZE=2)
+    def test_cache_is_bounded(self):
+        logger.debug("Starting cache_is_bounded")
+        for i in range(5):
+            self.query(f'query Q{i} {{ allPages {{ edges {{ cursor }} }} }}')
+        self.assertEqual(len(document_cache._documents), 2)
+        logger.debug("Finished cache_is_bounded")
+
+
+class ResponseCacheTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        cache.clear()
+        self.page = Page.objects.create(title="Test Page", page_link_location='navbar')
+
+    def get_titles(self, response):
+        self.assertResponseNoErrors(response)
+        return [edge['node']['title'] for edge in json.loads(response.content)['data']['allPages']['edges']]
+
+    def test_repeated_query_skips_the_database(self):
+        logger.debug("Starting repeated_query_skips_the_database")
+        self.assertEqual(self.get_titles(self.query(QUERY)), ["Test Page"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_titles(self.query(QUERY)), ["Test Page"])
+        logger.debug("Finished repeated_query_skips_the_database")
+
+    def test_saving_a_model_invalidates_its_queries(self):
+        logger.debug("Starting saving_a_model_invalidates_its_queries")
+        self.query(QUERY)
+        self.page.title = "Renamed Page"
+        self.page.save()
+        self.assertEqual(self.get_titles(self.query(QUERY)), ["Renamed Page"])
+        Page.objects.create(title="Second Page")
+        self.assertEqual(len(self.get_titles(self.query(QUERY))), 2)
+        self.page.delete()
+        self.assertEqual(self.get_titles(self.query(QUERY)), ["Second Page"])
+        logger.debug("Finished saving_a_model_invalidates_its_queries")
+
+    def test_unrelated_models_do_not_invalidate(self):
+        logger.debug("Starting unrelated_models_do_not_invalidate")
+        self.query(QUERY)
+        User.objects.create(username='testuser')
+        with self.assertNumQueries(0):
+            self.query(QUERY)
+        logger.debug("Finished unrelated_models_do_not_invalidate")
+
+    def test_variables_are_part_of_the_key(self):
+        logger.debug("Starting variables_are_part_of_the_key")
+        query = 'query ($location: String) { allLinks(location: $location) { edges { node { label } } } }'
+        navbar = self.query(query, variables={'location': 'navbar'})
+        footer = self.query(query, variables={'location': 'footer'})
+        self.assertNotEqual(navbar.content, footer.content)
+        logger.debug("Finished variables_are_part_of_the_key")
+
+    def test_authenticated_users_are_not_cached(self):
+        logger.debug("Starting authenticated_users_are_not_cached")
+        self.client.force_login(User.objects.create(username='editor'))
+        self.query(QUERY)
+        with self.assertNumQueries(3):
+            # Session, user and the query itself
+            self.query(QUERY)
+        logger.debug("Finished authenticated_users_are_not_cached")
+
+    def test_errors_are_not_cached(self):
+        logger.debug("Starting errors_are_not_cached")
+        query = '{ allPosts(first: -1) { edges { cursor } } }'
+        self.assertResponseHasErrors(self.query(query))
+        with mock.patch('cms_content.views.cache.set') as cache_set:
+            self.assertResponseHasErrors(self.query(query))
+        cache_set.assert_not_called()
+        logger.debug("Finished errors_are_not_cached")
+
+
+@override_settings(CMS_GRAPHQL_PROFILE=False)
+class ConditionalGetTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        cache.clear()
+        self.page = Page.objects.create(title="Test Page")
+
+    def get(self, query=QUERY, **headers):
+        return self.client.get(self.GRAPHQL_URL, {'query': query}, HTTP_ACCEPT='application/json', **headers)
+
+    def test_get_queries_carry_validators(self):
+        logger.debug("Starting get_queries_carry_validators")
+        response = self.get()
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(response.content).hexdigest()}"')
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0')
+        self.assertIn('Accept', response['Vary'])
+        # Cached response and matching ETag: no query, no body
+        with self.assertNumQueries(0):
+            not_modified = self.get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((not_modified.status_code, not_modified.content), (304, b''))
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        logger.debug("Finished get_queries_carry_validators")
+
+    def test_changes_make_validators_stale(self):
+        logger.debug("Starting changes_make_validators_stale")
+        response = self.get()
+        self.page.title = "Renamed Page"
+        self.page.save()
+        changed = self.get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        with mock.patch('cms_content.versions.time.time', return_value=4102444800.0):
+            Page.objects.create(title="Second Page")
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=changed['Last-Modified']).status_code, 200)
+        logger.debug("Finished changes_make_validators_stale")
+
+    def test_only_clean_anonymous_get_queries_are_conditional(self):
+        logger.debug("Starting only_clean_anonymous_get_queries_are_conditional")
+        self.assertNotIn('ETag', self.query(QUERY))
+        self.assertNotIn('ETag', self.get('{ allPosts(first: -1) { edges { cursor } } }'))
+        with override_settings(CMS_GRAPHQL_CONDITIONAL_GET=False):
+            self.assertNotIn('ETag', self.get())
+        self.client.force_login(User.objects.create(username='editor'))
+        self.assertNotIn('ETag', self.get())
+        logger.debug("Finished only_clean_anonymous_get_queries_are_conditional")
+
+
+@override_settings(CMS_GRAPHQL_PROFILE=False, CMS_GRAPHQL_STREAM_CHUNK_SIZE=2)
+class StreamingTests(GraphQLTestCase):
+    GRAPHQL_URL = '/graphql/'
+
+    def setUp(self):
+        cache.clear()
+        Page.objects.create(title="Test Page", page_status='published', page_link_location='navbar')
+        author = User.objects.create(username='ada')
+        for i in range(5):
+            Post.objects.create(title=f"Post {i}", author=author)
+
+    def stream(self, query):
+        response = self.client.post(f'{self.GRAPHQL_URL}?stream=1', json.dumps({'query': query}),
+                                    content_type='application/json')
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_streamed_responses_match_the_usual_ones(self):
+        logger.debug("Starting streamed_responses_match_the_usual_ones")
+        streamed = self.stream(STREAMED_QUERY)
+        self.assertEqual(streamed, json.loads(self.query(STREAMED_QUERY).content))
+        self.assertEqual(len(streamed['data']['allPosts']['edges']), 4)
+        # Backward pages are walked in reverse, and still streamed in order
+        cursor = streamed['data']['allPosts']['pageInfo']['endCursor']
+        query = (f'{{ allPosts(last: 2, before: "{cursor}") '
+                 '{ pageInfo { hasPreviousPage startCursor } edges { node { title } } } }')
+        self.assertEqual(self.stream(query), json.loads(self.query(query).content))
+        logger.debug("Finished streamed_responses_match_the_usual_ones")
+
+    def test_rows_are_read_a_chunk_at_a_time(self):
+        logger.debug("Starting rows_are_read_a_chunk_at_a_time")
+        with mock.patch.object(Loaders, 'register', autospec=True, side_effect=lambda loaders, rows: rows) as register:
+            # The page's cursors, then its rows
+            with self.assertNumQueries(2):
+                self.stream('{ allPosts { edges { node { title } } } }')
+        self.assertEqual([len(call.args[1]) for call in register.call_args_list], [2, 2, 1])
+        # Each chunk with loaders of its own
+        self.assertEqual(len({id(call.args[0]) for call in register.call_args_list}), 3)
+        with override_settings(CMS_GRAPHQL_PROFILE=True):
+            response = self.client.post(f'{self.GRAPHQL_URL}?stream=1', json.dumps({'query': STREAMED_QUERY}),
+                                        content_type='application/json')
+        self.assertFalse(response.streaming)
+        logger.debug("Finished rows_are_read_a_chunk_at_a_time")
+
+    def test_errors_while_streaming_follow_the_data(self):
+        logger.debug("Starting errors_while_streaming_follow_the_data")
+        with mock.patch('django.db.models.query.QuerySet.iterator', side_effect=DatabaseError("Disk I/O error")):
+            body = self.stream(STREAMED_QUERY)
+        self.assertEqual(list(body), ['data', 'errors'])
+        # The list is cut short, the rest of the result is whole
+        self.assertEqual(body['data']['allPosts']['edges'], [])
+        self.assertTrue(body['data']['allPosts']['pageInfo']['hasNextPage'])
+        self.assertEqual(body['data']['navigation'], [{'label': "Test Page"}])
+        self.assertEqual([(error['message'], error['path']) for error in body['errors']],
+                         [("Disk I/O error", ['allPosts', 'edges'])])
+        logger.debug("Finished errors_while_streaming_follow_the_data")
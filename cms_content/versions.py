@@ -0,0 +1,68 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+
+# Version stamps for the content models.
+#
+# Every model has a random token in the `versions` cache which is replaced
+# whenever one of its rows changes. Anything cached from that model's data
+# includes the token in its key, so a change makes the old entries unreachable
+# and they expire on their own. Tokens are random rather than counters so a
+# stamp evicted from the cache can never come back as an older value.
+#
+# A token starts with the time it was made, which is when the model last
+# changed as far as anything cached is concerned, and what Last-Modified
+# headers are made from. A token made because the old one was evicted counts
+# as a change then, as the real time of the last change is lost with it.
+#
+# Signals cover saves and deletes; code writing with update()/bulk_create()
+# must call bump_version() itself. The `versions` cache has to be shared by
+# every process (a file or database cache, not the per-process LocMemCache),
+# or a change made in one process never retires what the others cached.
+
+# The cache alias holding the tokens, the default cache if it is not configured
+VERSION_CACHE_ALIAS = 'versions'
+
+
+def get_version_cache():
+    return caches[VERSION_CACHE_ALIAS if VERSION_CACHE_ALIAS in settings.CACHES else DEFAULT_CACHE_ALIAS]
+
+
+def get_version_key(model):
+    return f'cms_graphql:version:{model._meta.label_lower}'
+
+
+def make_version():
+    return f'{time.time():.6f}-{uuid.uuid4().hex}'
+
+
+def get_changed(versions):
+    """Return the time, in seconds since the epoch, of the latest change behind `versions`.
+
+    None when a token does not carry its time.
+    """
+    try:
+        return max(float(version.partition('-')[0]) for version in versions)
+    except ValueError:
+        return None
+
+
+def get_versions(models):
+    """Return the current version token of each model, in order."""
+    cache = get_version_cache()
+    keys = [get_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() keeps a token another process set in the meantime
+            cache.add(key, make_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*models):
+    """Invalidate everything cached from the given models."""
+    get_version_cache().set_many({get_version_key(model): make_version() for model in models}, timeout=None)
@@ -1,3 +1,489 @@
-from django.shortcuts import render
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_POST
+from graphene.relay import Connection
+from graphene_django import DjangoObjectType
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    ExecutionResult, GraphQLError, OperationType, TypeInfo, TypeInfoVisitor, Visitor, execute, get_named_type,
+    get_operation_ast, parse, validate_schema, visit,
+)
+from graphql.execution.middleware import MiddlewareManager
+from graphql.validation import specified_rules, validate
+
+from . import encoders, profiling, streaming
+from .complexity import QueryComplexityRule
+from .counters import view_counter
+from .models import Page, Post
+from .routes import route_payload, route_table
+from .versions import get_changed, get_versions
+
 
 # Create your views here.
+def get_type_models(graphql_type):
+    """Return the Django models behind a GraphQL object or connection type.
+
+    Types not generated from a model can list theirs in `source_models`.
+    """
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+    if isinstance(graphene_type, type) and issubclass(graphene_type, Connection):
+        graphene_type = graphene_type._meta.node
+    if isinstance(graphene_type, type) and issubclass(graphene_type, DjangoObjectType):
+        return (graphene_type._meta.model,)
+    return tuple(getattr(graphene_type, 'source_models', ()))
+
+
+class ModelCollector(Visitor):
+    def __init__(self, type_info):
+        super().__init__()
+        self.type_info = type_info
+        self.models = set()
+
+    def enter_field(self, node, *args):
+        for graphql_type in (self.type_info.get_parent_type(), get_named_type(self.type_info.get_type())):
+            self.models.update(get_type_models(graphql_type))
+
+
+def get_document_models(schema, document):
+    """Return the models whose rows a query can read, sorted by label."""
+    type_info = TypeInfo(schema)
+    collector = ModelCollector(type_info)
+    visit(document, TypeInfoVisitor(type_info, collector))
+    return tuple(sorted(collector.models, key=lambda model: model._meta.label_lower))
+
+
+# A parsed query with its validation errors and the models it reads
+CachedDocument = namedtuple('CachedDocument', ('document', 'errors', 'models'))
+
+# An anonymous query whose response can be cached, by the view and over HTTP
+CacheableQuery = namedtuple('CacheableQuery', ('query', 'variables', 'operation_name', 'models'))
+
+
+class DocumentCache:
+    """A bounded LRU cache of parsed and validated GraphQL documents."""
+
+    def __init__(self):
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        return getattr(settings, 'CMS_GRAPHQL_DOCUMENT_CACHE_SIZE', 256)
+
+    def get(self, schema, query, validation_rules=None):
+        """Return the CachedDocument for `query`, parsing and validating it once."""
+        key = (id(schema), query, tuple(validation_rules or ()))
+        with self._lock:
+            if key in self._documents:
+                self._documents.move_to_end(key)
+                return self._documents[key]
+
+        try:
+            document = parse(query)
+        except GraphQLError as error:
+            entry = CachedDocument(None, [error], ())
+        else:
+            errors = validate(schema, document, validation_rules, graphene_settings.MAX_VALIDATION_ERRORS)
+            entry = CachedDocument(document, errors, () if errors else get_document_models(schema, document))
+
+        with self._lock:
+            self._documents[key] = entry
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+
+document_cache = DocumentCache()
+
+
+class PersistedQueryError(GraphQLError):
+    def __init__(self, message, code):
+        super().__init__(message, extensions={'code': code})
+
+
+def get_persisted_query_hash(request, data):
+    """Return the sha256Hash of an automatic persisted query, if one was sent."""
+    extensions = request.GET.get('extensions') or data.get('extensions')
+    if not extensions:
+        return None
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+    persisted_query = extensions.get('persistedQuery') if isinstance(extensions, dict) else None
+    if not isinstance(persisted_query, dict):
+        return None
+    if persisted_query.get('version') != 1:
+        raise PersistedQueryError("Unsupported persisted query version.", 'PERSISTED_QUERY_NOT_SUPPORTED')
+    return persisted_query.get('sha256Hash')
+
+
+def get_persisted_query_key(sha256_hash):
+    return f'cms_graphql:persisted_query:{sha256_hash}'
+
+
+class CMSGraphQLView(GraphQLView):
+    """GraphQLView with persisted queries, a parsed-document cache and a response cache.
+
+    Clients following the Apollo automatic persisted query protocol send only
+    `extensions.persistedQuery.sha256Hash`. An unknown hash is answered with
+    PersistedQueryNotFound, and the client then retries with the full query,
+    which is stored under its hash. Either way the document is parsed and
+    validated once per process and served from `document_cache` afterwards.
+
+    Successful anonymous queries are cached whole, keyed on the query,
+    variables and the version stamps of the models the query reads, so saving
+    a model retires every cached response that could include it.
+
+    The same anonymous queries sent with GET are answered with an ETag, a hash
+    of the body, a Last-Modified time read off the version stamps before the
+    query runs, and Cache-Control: public, so browsers and proxies can keep
+    them and revalidate with If-None-Match / If-Modified-Since. A matching
+    request gets a 304, without a body; with the response cached, without
+    running the query either.
+
+    Queries sent with `stream` (`?stream=1`, or `"stream": true` in a JSON
+    body) get a StreamingHttpResponse instead, their connection pages read and
+    written a chunk of rows at a time (see `streaming`). They skip the response
+    cache and conditional GET, and profiled requests are not streamed.
+
+    Queries nested too deeply or able to load too many rows fail validation
+    (see `complexity`), before any of their SQL runs.
+
+    Responses are encoded with orjson when it is installed, or with the
+    encoder named in CMS_GRAPHQL_JSON_ENCODER (see `encoders`).
+
+    With CMS_GRAPHQL_PROFILE each operation's queries and resolver timings are
+    logged, and with CMS_GRAPHQL_PROFILE_EXTENSIONS also returned in the
+    response `extensions` (see `profiling`).
+    """
+
+    validation_rules = (*specified_rules, QueryComplexityRule)
+
+    def dispatch(self, request, *args, **kwargs):
+        response = self.get_streaming_response(request)
+        if response is not None:
+            return response
+        self.prepare_conditional(request)
+        return self.make_conditional(request, super().dispatch(request, *args, **kwargs))
+
+    def wants_stream(self, request, data):
+        """Whether a request asks for a streamed response, and may have one."""
+        if self.batch or not streaming.is_enabled() or profiling.is_enabled():
+            return False
+        return request.GET.get('stream') in ('1', 'true') or data.get('stream') in (True, '1', 'true')
+
+    def get_streaming_response(self, request):
+        """Run a query asking for `stream` and return its StreamingHttpResponse, None for other requests."""
+        if request.method not in ('GET', 'POST'):
+            return None
+        try:
+            data = self.parse_body(request)
+            if not self.wants_stream(request, data) or (self.graphiql and self.can_display_graphiql(request, data)):
+                return None
+            query, variables, operation_name, _ = self.get_graphql_params(request, data)
+            # Read by the connection resolvers while the query runs
+            request.graphql_stream = True
+            try:
+                result = self.execute_cached_document(request, data, query, variables, operation_name,
+                                                      execution_context_class=streaming.StreamingExecutionContext)
+            finally:
+                request.graphql_stream = False
+        except HttpError:
+            # Reported by dispatch
+            return None
+        if result.errors and any(not getattr(error, 'path', None) for error in result.errors):
+            content = self.json_encode(request, {'errors': [self.format_error(error) for error in result.errors]})
+            return HttpResponse(status=400, content=content, content_type='application/json')
+        parts = streaming.iter_response(result, self.format_error, self.get_json_encoder(request))
+        return StreamingHttpResponse(parts, content_type='application/json')
+
+    def get_cacheable_query(self, request, data):
+        """Return the CacheableQuery of an anonymous, valid query operation, None for anything else."""
+        if self.batch:
+            return None
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return None
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+        try:
+            query = self.resolve_query(request, data, query)
+        except PersistedQueryError:
+            return None
+        if not query:
+            return None
+        schema = self.schema.graphql_schema
+        cached = document_cache.get(schema, query, self.validation_rules)
+        if cached.document is None or cached.errors:
+            return None
+        operation_ast = get_operation_ast(cached.document, operation_name)
+        if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+            return None
+        self.name_operation(request, operation_ast)
+        return CacheableQuery(query, variables, operation_name, cached.models)
+
+    def get_query_versions(self, request, models):
+        # Read once per request, so the response cache key and Last-Modified agree
+        if getattr(request, 'graphql_versions', None) is None:
+            request.graphql_versions = get_versions(models)
+        return request.graphql_versions
+
+    def get_response_cache_key(self, request, data):
+        if not getattr(settings, 'CMS_GRAPHQL_RESPONSE_CACHE', True):
+            return None
+        operation = self.get_cacheable_query(request, data)
+        if operation is None:
+            return None
+        versions = self.get_query_versions(request, operation.models)
+        key = json.dumps([operation.query, operation.variables, operation.operation_name, versions],
+                         sort_keys=True, default=str)
+        return f'cms_graphql:response:{hashlib.sha256(key.encode()).hexdigest()}'
+
+    def prepare_conditional(self, request, data=None):
+        """Note when the content read by an anonymous GET query last changed, before the query runs."""
+        request.graphql_last_modified = None
+        if request.method != 'GET' or not getattr(settings, 'CMS_GRAPHQL_CONDITIONAL_GET', True):
+            return
+        # Profiles make every body different
+        if profiling.is_enabled() and profiling.exposes_extensions():
+            return
+        try:
+            data = self.parse_body(request) if data is None else data
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return
+            operation = self.get_cacheable_query(request, data)
+        except HttpError:
+            # Reported by dispatch
+            return
+        if operation is not None:
+            request.graphql_last_modified = get_changed(self.get_query_versions(request, operation.models))
+
+    def make_conditional(self, request, response):
+        """Add validators and Cache-Control to a cacheable response, or turn it into a 304 if they match."""
+        last_modified = getattr(request, 'graphql_last_modified', None)
+        if last_modified is None or response.status_code != 200 or getattr(request, 'graphql_errors', False):
+            return response
+        etag = quote_etag(hashlib.sha256(response.content).hexdigest())
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'CMS_GRAPHQL_HTTP_MAX_AGE', 0))
+        # Browsers asking for HTML get GraphiQL from the same URL
+        patch_vary_headers(response, ('Accept',))
+        return get_conditional_response(request, etag=etag, last_modified=int(last_modified), response=response)
+
+    def get_response(self, request, data, show_graphiql=False):
+        if show_graphiql or not profiling.is_enabled():
+            return self.get_cached_response(request, data, show_graphiql)
+        _, _, operation_name, _ = self.get_graphql_params(request, data)
+        profile = request.graphql_profile = profiling.OperationProfile(operation_name)
+        try:
+            with profile.capture():
+                result, status_code = self.get_cached_response(request, data)
+        finally:
+            del request.graphql_profile
+        summary = profile.summary()
+        profile.log(summary)
+        if result is not None and profiling.exposes_extensions():
+            # Added to the encoded result, so cached responses stay free of
+            # the profile of the request that stored them
+            extensions = self.json_encode(request, {'profile': summary})
+            result = f'{result[:-1]},"extensions":{extensions}}}'
+        return result, status_code
+
+    def get_json_encoder(self, request, pretty=False):
+        """Return a function encoding a value as JSON, pretty-printed if the view or the request asks for it."""
+        pretty = self.pretty or pretty or bool(request.GET.get('pretty'))
+        return partial(encoders.get_encoder(), pretty=pretty)
+
+    def json_encode(self, request, d, pretty=False):
+        return self.get_json_encoder(request, pretty)(d)
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        if getattr(request, 'graphql_profile', None) is None:
+            return middleware
+        if isinstance(middleware, MiddlewareManager):
+            middleware = middleware.middlewares
+        return [*(middleware or ()), profiling.ProfilingMiddleware()]
+
+    def name_operation(self, request, operation_ast):
+        # Profiles are labelled with the operation run, when the client did not name it
+        profile = getattr(request, 'graphql_profile', None)
+        if profile is not None and profile.operation_name is None and operation_ast and operation_ast.name:
+            profile.operation_name = operation_ast.name.value
+
+    def get_cached_response(self, request, data, show_graphiql=False):
+        key, response = self.lookup_response(request, data, show_graphiql)
+        if response is not None:
+            return response
+        result, status_code = super().get_response(request, data, show_graphiql)
+        self.store_response(request, key, result, status_code)
+        return result, status_code
+
+    def lookup_response(self, request, data, show_graphiql=False):
+        """Return the response cache key of a request and the response cached under it."""
+        key = None if show_graphiql else self.get_response_cache_key(request, data)
+        if key is None:
+            return None, None
+        response = cache.get(key)
+        if response is not None and hasattr(request, 'graphql_profile'):
+            request.graphql_profile.cached = True
+        return key, response
+
+    def store_response(self, request, key, result, status_code):
+        if key is not None and status_code == 200 and not getattr(request, 'graphql_errors', True):
+            cache.set(key, (result, status_code), getattr(settings, 'CMS_GRAPHQL_RESPONSE_CACHE_TIMEOUT', 300))
+
+    def resolve_query(self, request, data, query):
+        if not getattr(settings, 'CMS_GRAPHQL_PERSISTED_QUERIES', True):
+            return query
+        sha256_hash = get_persisted_query_hash(request, data)
+        if sha256_hash is None:
+            return query
+        key = get_persisted_query_key(sha256_hash)
+        if not query:
+            query = cache.get(key)
+            if query is None:
+                raise PersistedQueryError("PersistedQueryNotFound", 'PERSISTED_QUERY_NOT_FOUND')
+            return query
+        if hashlib.sha256(query.encode()).hexdigest() != sha256_hash:
+            raise PersistedQueryError("Provided sha256Hash does not match query.", 'INTERNAL_SERVER_ERROR')
+        cache.set(key, query, timeout=None)
+        return query
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        result = self.execute_cached_document(request, data, query, variables, operation_name, show_graphiql)
+        # Remembered so only clean results end up in the response cache
+        request.graphql_errors = bool(result is None or result.errors)
+        return result
+
+    def execute_cached_document(self, request, data, query, variables, operation_name, show_graphiql=False,
+                                execution_context_class=None):
+        # Mirrors GraphQLView.execute_graphql_request, with parse and validate
+        # going through the document cache
+        try:
+            query = self.resolve_query(request, data, query)
+        except PersistedQueryError as error:
+            return ExecutionResult(data=None, errors=[error])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        document, validation_errors, _ = document_cache.get(schema, query, self.validation_rules)
+        if document is None:
+            return ExecutionResult(errors=validation_errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        self.name_operation(request, operation_ast)
+
+        if (
+            request.method.lower() == 'get'
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ['POST'],
+                    f"Can only perform a {operation_ast.operation.value} operation from a POST request.",
+                )
+            )
+
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        try:
+            execute_options = {
+                'root_value': self.get_root_value(request),
+                'context_value': self.get_context(request),
+                'variable_values': variables,
+                'operation_name': operation_name,
+                'middleware': self.get_middleware(request),
+            }
+            execution_context_class = execution_context_class or self.execution_context_class
+            if execution_context_class:
+                execute_options['execution_context_class'] = execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+
+def route_etag(request, path):
+    route = route_table.get(path)
+    return route.etag if route is not None else None
+
+
+@require_GET
+@condition(etag_func=route_etag)
+def route_view(request, path):
+    """Resolve a URL path to the published page or link it belongs to."""
+    route = route_table.get(path)
+    if route is None:
+        return JsonResponse({'error': f"No published page or link at '{path}'."}, status=404)
+    return JsonResponse(route_payload(route))
+
+
+VIEW_COUNTED_MODELS = {'pages': Page, 'posts': Post}
+
+
+@csrf_exempt
+@require_POST
+def record_view(request, kind, pk):
+    """Count one view of a page or post, e.g. from navigator.sendBeacon()."""
+    model = VIEW_COUNTED_MODELS.get(kind)
+    if model is None:
+        raise Http404(f"Views are not counted for '{kind}'.")
+    try:
+        pk = model._meta.pk.to_python(pk)
+    except ValidationError:
+        raise Http404(f"Invalid id '{pk}'.")
+    # Buffered and written later, so the hit costs no query
+    view_counter.hit(model, pk)
+    return HttpResponse(status=202)